@@ -7,10 +7,56 @@ for profitable backing opportunities against exchange lay prices.
 
 import json
 import requests
+import threading
 import time
 import cloudscraper
+import oddsmatcha
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+from team_names import team_name_matches
+
+# Concurrent Sky Bet fetching (replaces the fixed 2s sleep between matches)
+SKYBET_WORKERS = int(os.getenv("ACCAFREEZE_SKYBET_WORKERS", "6"))
+# Minimum seconds between requests to the same host, across all worker threads
+HOST_MIN_INTERVAL = {
+    'www.oddschecker.com': 1.0,   # match pages (subevent id lookup)
+    'api.oddschecker.com': 0.3,   # mobile odds API
+}
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least `intervals[host]` seconds apart across threads."""
+
+    def __init__(self, intervals, default_interval=0.5):
+        self.intervals = dict(intervals)
+        self.default_interval = default_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        interval = self.intervals.get(host, self.default_interval)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = HostRateLimiter(HOST_MIN_INTERVAL)
+_scraper_local = threading.local()
+# oddschecker slug -> numeric subevent id (fixed per match, so kept for the process lifetime)
+_SUBEVENT_IDS = {}
+
+
+def _get_scraper():
+    """One cloudscraper per worker thread, reused across matches."""
+    scraper = getattr(_scraper_local, 'scraper', None)
+    if scraper is None:
+        scraper = cloudscraper.create_scraper()
+        _scraper_local.scraper = scraper
+    return scraper
 
 # Load configuration
 def load_config():
@@ -49,50 +95,147 @@ def load_config():
         print(f"[ERROR] Failed to parse accafreeze.json: {e}")
         return None
 
-def load_seen_matches():
-    """Load seen matches from tracking file"""
-    seen_file = 'accafreeze_seen.json'
-    if not os.path.exists(seen_file):
-        return {}
-    
+# ========= SEEN MATCHES =========
+# Alerts already sent, keyed by (match_id, outcome, channel_id). Stored as an
+# append-only JSON-lines log: each alert appends one record, later records win,
+# and the log is rewritten without expired entries once it has grown well past
+# the number of live entries.
+SEEN_FILE = 'accafreeze_seen.jsonl'
+LEGACY_SEEN_FILE = 'accafreeze_seen.json'
+SEEN_KEEP_AFTER_KO_HOURS = 24   # Forget alerts this long after kickoff
+SEEN_MAX_AGE_DAYS = 7           # ...or this long after sending when kickoff is unknown
+
+
+def _parse_iso(value):
+    if not value:
+        return None
     try:
-        with open(seen_file, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class SeenMatchesStore:
+    """Indexed, expiring store of sent alerts with incremental (append-only) writes."""
+
+    def __init__(self, path=SEEN_FILE):
+        self.path = path
+        self._entries = {}    # (match_id, outcome, channel_id) -> record
+        self._log_lines = 0
+
+    @staticmethod
+    def _key(match_id, outcome_name, channel_id):
+        return (str(match_id), outcome_name, str(channel_id))
+
+    @staticmethod
+    def _expires_at(record):
+        kickoff = _parse_iso(record.get('kickoff'))
+        if kickoff:
+            return kickoff + timedelta(hours=SEEN_KEEP_AFTER_KO_HOURS)
+        sent = _parse_iso(record.get('timestamp')) or datetime.now(timezone.utc)
+        return sent + timedelta(days=SEEN_MAX_AGE_DAYS)
+
+    def _add(self, record):
+        self._entries[self._key(record.get('match_id'), record.get('outcome'), record.get('channel_id'))] = record
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._add(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # torn final line from an interrupted write
+                    self._log_lines += 1
+        elif os.path.exists(LEGACY_SEEN_FILE):
+            try:
+                with open(LEGACY_SEEN_FILE, 'r') as f:
+                    for record in json.load(f).values():
+                        self._add(record)
+                print(f"[TRACKING] Migrated {len(self._entries)} entries from {LEGACY_SEEN_FILE}")
+            except (json.JSONDecodeError, OSError, AttributeError):
+                pass
+            self._log_lines = len(self._entries) + 1  # force a compaction into the new format
+        expired = self.prune()
+        if expired or self._log_lines > 2 * len(self._entries) + 100:
+            self.compact()
+        return self
+
+    def prune(self, now=None):
+        """Drop expired entries; returns how many were removed."""
+        now = now or datetime.now(timezone.utc)
+        expired = [key for key, record in self._entries.items() if self._expires_at(record) <= now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def compact(self):
+        """Rewrite the log with only the live entries."""
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for record in self._entries.values():
+                    f.write(json.dumps(record) + '\n')
+            os.replace(tmp, self.path)
+            self._log_lines = len(self._entries)
+        except Exception as e:
+            print(f"[ERROR] Failed to save seen matches: {e}")
+
+    def get(self, match_id, outcome_name, channel_id):
+        return self._entries.get(self._key(match_id, outcome_name, channel_id))
+
+    def mark(self, match_id, outcome_name, channel_id, rating, kickoff=None):
+        if kickoff is None:
+            previous = self.get(match_id, outcome_name, channel_id)
+            kickoff = previous.get('kickoff') if previous else None
+        record = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'match_id': match_id,
+            'outcome': outcome_name,
+            'channel_id': channel_id,
+            'rating': rating,
+            'kickoff': kickoff,
+        }
+        self._add(record)
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self._log_lines += 1
+        except Exception as e:
+            print(f"[ERROR] Failed to save seen matches: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+def load_seen_matches():
+    """Load seen matches from the tracking log (expired entries are dropped)"""
+    return SeenMatchesStore().load()
 
 def save_seen_matches(seen_matches):
-    """Save seen matches to tracking file"""
-    seen_file = 'accafreeze_seen.json'
-    try:
-        with open(seen_file, 'w') as f:
-            json.dump(seen_matches, f, indent=2)
-    except Exception as e:
-        print(f"[ERROR] Failed to save seen matches: {e}")
+    """Rewrite the tracking log without expired entries (alerts are already appended as they are marked)"""
+    seen_matches.prune()
+    seen_matches.compact()
 
 def is_match_seen(match_id, outcome_name, channel_id, seen_matches):
     """Check if match + outcome combination has been alerted to specific channel"""
-    key = f"{match_id}_{outcome_name}_{channel_id}"
-    return key in seen_matches
-
-def mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches):
-    """Mark match + outcome as seen for specific channel with timestamp and rating"""
-    key = f"{match_id}_{outcome_name}_{channel_id}"
-    seen_matches[key] = {
-        'timestamp': datetime.now(timezone.utc).isoformat(),
-        'match_id': match_id,
-        'outcome': outcome_name,
-        'channel_id': channel_id,
-        'rating': rating
-    }
-    save_seen_matches(seen_matches)
+    return seen_matches.get(match_id, outcome_name, channel_id) is not None
+
+def mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches, kickoff=None):
+    """Mark match + outcome as seen for specific channel with timestamp, rating and kickoff (for expiry)"""
+    seen_matches.mark(match_id, outcome_name, channel_id, rating, kickoff)
 
 def get_previous_rating(match_id, outcome_name, channel_id, seen_matches):
     """Get previously saved rating for this match + outcome + channel"""
-    key = f"{match_id}_{outcome_name}_{channel_id}"
-    if key in seen_matches:
-        return seen_matches[key].get('rating', 0)
-    return 0
+    record = seen_matches.get(match_id, outcome_name, channel_id)
+    return record.get('rating', 0) if record else 0
 
 def fetch_accafreeze_data():
     """Fetch data from oddsmatcha accafreeze API"""
@@ -100,7 +243,7 @@ def fetch_accafreeze_data():
     
     try:
         print(f"[API] Fetching accafreeze data from {api_url}")
-        response = requests.get(api_url, timeout=30)
+        response = oddsmatcha.get(api_url, timeout=30)
         
         if response.status_code != 200:
             print(f"[ERROR] API returned status {response.status_code}")
@@ -173,8 +316,10 @@ def get_oddschecker_subevent_id(oddschecker_slug):
     """
     Extract the subevent ID from oddschecker slug by fetching the page.
     We need the numeric subevent ID to use with the mobile API.
-    Uses tls_client to avoid 403 errors.
+    Uses tls_client to avoid 403 errors. Found ids are cached per slug.
     """
+    if oddschecker_slug in _SUBEVENT_IDS:
+        return _SUBEVENT_IDS[oddschecker_slug]
     try:
         import tls_client
         
@@ -214,6 +359,7 @@ def get_oddschecker_subevent_id(oddschecker_slug):
         }
         
         print(f"[OC] Fetching page to extract subevent ID: {url}")
+        _rate_limiter.wait('www.oddschecker.com')
         response = session.get(url, headers=headers, cookies=cookies)
         
         if response.status_code != 200:
@@ -234,6 +380,7 @@ def get_oddschecker_subevent_id(oddschecker_slug):
             if match:
                 subevent_id = match.group(1)
                 print(f"[OC] Found subevent ID: {subevent_id}")
+                _SUBEVENT_IDS[oddschecker_slug] = subevent_id
                 return subevent_id
         
         print(f"[WARN] Could not find subevent ID in page")
@@ -264,7 +411,7 @@ def get_skybet_odds_for_match(oddschecker_slug, oddschecker_match_id=None, debug
                 return {}
         
         # Use mobile API to get odds
-        scraper = cloudscraper.create_scraper()
+        scraper = _get_scraper()
         
         # Mobile API headers (from B365 implementation)
         headers = {
@@ -287,6 +434,7 @@ def get_skybet_odds_for_match(oddschecker_slug, oddschecker_match_id=None, debug
         api_url = f'https://api.oddschecker.com/api/mobile-app/football/v1/subevent/{oddschecker_match_id}?t={cache_buster}'
         
         print(f"[OC] Fetching from mobile API: {api_url}")
+        _rate_limiter.wait('api.oddschecker.com')
         response = scraper.get(api_url, headers=headers, timeout=30)
         
         if response.status_code != 200:
@@ -366,6 +514,54 @@ def get_skybet_odds_for_match(oddschecker_slug, oddschecker_match_id=None, debug
         traceback.print_exc()
         return {}
 
+def fetch_skybet_odds_concurrent(matches, debug=False, workers=None):
+    """
+    Fetch Sky Bet odds for several matches concurrently (per-host rate limited).
+    
+    Args:
+        matches: iterable of accafreeze match dicts (duplicates by match_id are fetched once)
+        workers: thread count (default SKYBET_WORKERS)
+    
+    Returns dict of {match_id: get_skybet_odds_for_match result}.
+    """
+    unique = {}
+    for match in matches:
+        unique.setdefault(match.get('match_id'), match)
+    if not unique:
+        return {}
+    
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or SKYBET_WORKERS, len(unique)))) as pool:
+        futures = {
+            match_id: pool.submit(get_skybet_odds_for_match, match.get('oddschecker_slug', ''),
+                                  match.get('oddschecker_match_id'), debug)
+            for match_id, match in unique.items()
+        }
+        results = {}
+        for match_id, future in futures.items():
+            try:
+                results[match_id] = future.result()
+            except Exception as e:
+                print(f"[ERROR] Sky Bet fetch failed for match {match_id}: {e}")
+                results[match_id] = {}
+    
+    found = sum(1 for r in results.values() if r and r.get('odds'))
+    print(f"[SKYBET] Fetched odds for {found}/{len(unique)} matches in {time.time() - started:.1f}s")
+    return results
+
+def _find_outcome(target_team, outcome_names):
+    """First outcome matching target_team exactly, or by substring when both are longer than 3 chars."""
+    target_lower = target_team.lower().strip()
+    for oc_name in outcome_names:
+        oc_lower = oc_name.lower().strip()
+        if oc_lower == target_lower:
+            return oc_name
+        # Substring/alias match, but not just matching "Draw"
+        if len(target_lower) > 3 and len(oc_lower) > 3 and team_name_matches(target_team, oc_name):
+            return oc_name
+    return None
+
+
 def match_team_names(exchange_name, oddschecker_names, accafreeze_home, accafreeze_away, oc_home, oc_away):
     """
     Match team name from exchange to oddschecker outcome.
@@ -387,8 +583,8 @@ def match_team_names(exchange_name, oddschecker_names, accafreeze_home, accafree
     af_home_lower = accafreeze_home.lower().strip()
     af_away_lower = accafreeze_away.lower().strip()
     
-    is_home = af_home_lower in exchange_lower or exchange_lower in af_home_lower
-    is_away = af_away_lower in exchange_lower or exchange_lower in af_away_lower
+    is_home = team_name_matches(exchange_name, accafreeze_home)
+    is_away = team_name_matches(exchange_name, accafreeze_away)
     
     if not is_home and not is_away:
         # Try base name matching
@@ -413,22 +609,10 @@ def match_team_names(exchange_name, oddschecker_names, accafreeze_home, accafree
     print(f"[MATCH] Exchange '{exchange_name}' is {position} team, looking for OddsChecker {position} team '{target_team}'")
     
     # Find the outcome matching the OddsChecker fixture team
-    target_lower = target_team.lower().strip()
-    
-    for oc_name in oddschecker_names:
-        oc_lower = oc_name.lower().strip()
-        
-        # Direct match
-        if oc_lower == target_lower:
-            print(f"[MATCH] Matched to Sky Bet outcome '{oc_name}'")
-            return oc_name
-        
-        # Substring match (either direction)
-        if target_lower in oc_lower or oc_lower in target_lower:
-            # Make sure it's not just matching "Draw"
-            if len(target_lower) > 3 and len(oc_lower) > 3:
-                print(f"[MATCH] Matched to Sky Bet outcome '{oc_name}'")
-                return oc_name
+    oc_name = _find_outcome(target_team, oddschecker_names)
+    if oc_name:
+        print(f"[MATCH] Matched to Sky Bet outcome '{oc_name}'")
+        return oc_name
     
     print(f"[WARN] Could not find Sky Bet outcome for {position} team '{target_team}'")
     return None
@@ -682,14 +866,58 @@ def send_discord_summary(site, opportunities, include_seen=False):
         print(f"[SUMMARY] ❌ Error sending summary to {site.get('name', 'Unknown')}: {e}")
         return False
 
+def _team_lay_outcomes(match):
+    """Return (home_lay, away_lay) outcome dicts for a match, falling back to outcome order."""
+    home_team = match.get('home_team', '')
+    away_team = match.get('away_team', '')
+    match_outcomes = match.get('outcomes', [])
+    home_lay = None
+    away_lay = None
+    for o in match_outcomes:
+        o_name = o.get('outcome_name', '').lower()
+        if o_name == home_team.lower():
+            home_lay = o
+        elif o_name == away_team.lower():
+            away_lay = o
+
+    # If not found by exact name, fallback to first/second outcome
+    if not home_lay and len(match_outcomes) > 0:
+        home_lay = match_outcomes[0]
+    if not away_lay and len(match_outcomes) > 1:
+        away_lay = match_outcomes[1]
+    return home_lay, away_lay
+
+def _lay_meets_any_site(lay, sites):
+    if not lay:
+        return False
+    lay_odds = lay.get('lay_odds', 0)
+    lay_liquidity = lay.get('lay_liquidity', 0)
+    for site in sites:
+        if not site.get('enabled', True):
+            continue
+        min_lay = site.get('min_lay_odds', 1.5)
+        min_liquidity = site.get('min_liquidity', 50)
+        if lay_odds >= min_lay and lay_liquidity >= min_liquidity:
+            return True
+    return False
+
+def _match_meets_any_site(match, sites):
+    """True if either team's lay odds/liquidity meet any enabled site's filter."""
+    home_lay, away_lay = _team_lay_outcomes(match)
+    return _lay_meets_any_site(home_lay, sites) or _lay_meets_any_site(away_lay, sites)
+
 def check_opportunities(qualifying, sites, seen_matches, debug=False):
     """
     Check each qualifying match on OddsChecker and report opportunities.
+    Sky Bet odds for all candidate matches are fetched concurrently up front,
+    then each outcome is evaluated against them.
     Returns opportunities with list of sites they qualify for.
     Skips matches that have already been sent.
     """
     opportunities = []
-    skybet_odds_cache = {}  # Cache odds by match_id to avoid duplicate API calls
+    candidates = [item['match'] for item in qualifying
+                  if item['match'].get('oddschecker_slug') and _match_meets_any_site(item['match'], sites)]
+    skybet_odds_cache = fetch_skybet_odds_concurrent(candidates, debug=debug)
     
     for item in qualifying:
         match = item['match']
@@ -699,7 +927,6 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
         away_team = match.get('away_team', '')
         competition = match.get('competition', '')
         oddschecker_slug = match.get('oddschecker_slug', '')
-        oddschecker_match_id = match.get('oddschecker_match_id')  # Get numeric ID if available
         outcome_name = outcome.get('outcome_name', '')
         lay_odds = outcome.get('lay_odds', 0)
         lay_site = outcome.get('lay_site', '')
@@ -718,48 +945,12 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
             continue
 
         # Check if either team's lay odds meet any site's min_lay_odds and min_liquidity
-        match_outcomes = match.get('outcomes', [])
-        home_lay = None
-        away_lay = None
-        for o in match_outcomes:
-            o_name = o.get('outcome_name', '').lower()
-            if o_name == home_team.lower():
-                home_lay = o
-            elif o_name == away_team.lower():
-                away_lay = o
-
-        # If not found by exact name, fallback to first/second outcome
-        if not home_lay and len(match_outcomes) > 0:
-            home_lay = match_outcomes[0]
-        if not away_lay and len(match_outcomes) > 1:
-            away_lay = match_outcomes[1]
-
-        def meets_any_site_criteria(lay, sites):
-            if not lay:
-                return False
-            lay_odds = lay.get('lay_odds', 0)
-            lay_liquidity = lay.get('lay_liquidity', 0)
-            for site in sites:
-                if not site.get('enabled', True):
-                    continue
-                min_lay = site.get('min_lay_odds', 1.5)
-                min_liquidity = site.get('min_liquidity', 50)
-                if lay_odds >= min_lay and lay_liquidity >= min_liquidity:
-                    return True
-            return False
-
-        if not (meets_any_site_criteria(home_lay, sites) or meets_any_site_criteria(away_lay, sites)):
+        if not _match_meets_any_site(match, sites):
             print(f"[SKIP] Neither team lay odds/liquidity meet any site's filter for match {home_team} v {away_team}")
             continue
 
-        # Get Sky Bet odds (use cache to avoid duplicate API calls for same match)
-        if match_id not in skybet_odds_cache:
-            print(f"[CACHE] Fetching Sky Bet odds for match {match_id}")
-            skybet_data = get_skybet_odds_for_match(oddschecker_slug, oddschecker_match_id, debug)
-            skybet_odds_cache[match_id] = skybet_data
-        else:
-            print(f"[CACHE] Using cached Sky Bet odds for match {match_id}")
-            skybet_data = skybet_odds_cache[match_id]
+        # Sky Bet odds were prefetched concurrently for every match passing the filter above
+        skybet_data = skybet_odds_cache.get(match_id)
 
         if not skybet_data or not skybet_data.get('odds'):
             print(f"[SKIP] No Sky Bet odds available")
@@ -909,6 +1100,7 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
             'competition': competition,
             'hours_until_ko': hours_until_ko,
             'kickoff_display': kickoff_display,
+            'kick_off': match.get('kick_off'),
             'outcome': display_team_name,
             'back_odds': back_odds,
             'back_site': 'Sky Bet',
@@ -936,7 +1128,7 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
             for site in immediate_qualifying:
                 channel_id = site.get('channel_id')
                 if send_discord_alert(opportunity, [site], is_realert=False):
-                    mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches)
+                    mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches, kickoff=match.get('kick_off'))
                     print(f"[TRACKING] Marked as seen for {site.get('name', 'Unknown')}: {match_id}_{outcome_name} @ {rating:.2f}%")
 
         # Send immediate re-alerts
@@ -946,7 +1138,7 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
             for site in immediate_realert:
                 channel_id = site.get('channel_id')
                 if send_discord_alert(opportunity, [site], is_realert=True):
-                    mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches)
+                    mark_match_seen(match_id, outcome_name, channel_id, rating, seen_matches, kickoff=match.get('kick_off'))
                     print(f"[TRACKING] Updated rating for {site.get('name', 'Unknown')}: {match_id}_{outcome_name} @ {rating:.2f}%")
 
         # For summary-mode sites we only collect (no immediate sends)
@@ -955,9 +1147,6 @@ def check_opportunities(qualifying, sites, seen_matches, debug=False):
                 print(f"[SUMMARY] Collected for summary (site={site.get('name','Unknown')}): {opportunity['home_team']} v {opportunity['away_team']} - {opportunity['outcome']} ({opportunity['rating']:.2f}%)")
 
         opportunities.append(opportunity)
-        
-        # Rate limit between matches
-        time.sleep(2)
     
     return opportunities
 
@@ -1127,7 +1316,7 @@ def main():
                 save_summary_state(summary_state)
                 # Mark each included item as seen for that channel
                 for opp, site_obj, is_realert in items:
-                    mark_match_seen(opp['match_id'], opp['outcome_name'], channel_id, opp['rating'], seen_matches)
+                    mark_match_seen(opp['match_id'], opp['outcome_name'], channel_id, opp['rating'], seen_matches, kickoff=opp.get('kick_off'))
                     print(f"[TRACKING] Marked summary item as seen for {site_obj.get('name', 'Unknown')}: {opp['match_id']}_{opp['outcome_name']} @ {opp['rating']:.2f}%")
 
         # --- EXTRA LEGS SUMMARY ---
@@ -1275,7 +1464,7 @@ def main():
                         print(f"[EXTRA] ✅ Sent extra-legs summary to {site.get('name','Unknown')} (batch {bidx}/{len(batches)}) with {len(batch)} items")
                         # Mark each included item as seen for that channel
                         for it in batch:
-                            mark_match_seen(it['match_id'], it['outcome_name'], channel_id, it.get('rating', 0), seen_matches)
+                            mark_match_seen(it['match_id'], it['outcome_name'], channel_id, it.get('rating', 0), seen_matches, kickoff=it.get('kick_off'))
                             print(f"[TRACKING] Marked extra item as seen for {site.get('name','Unknown')}: {it['match_id']}_{it['outcome_name']}")
                         # Update summary state to reflect send time
                         summary_state[extra_key] = now_utc.isoformat()
@@ -5,6 +5,9 @@ Minimal JSON-producing version of AccaFreeze scanner intended for API consumptio
 - Built-in configuration at the top of this file.
 - Default behaviour: print ONLY JSON to stdout (suitable for piping to an API process).
 - Optionally: write JSON to a file via --out-file.
+- --serve: stay resident and answer GET /opportunities from memory. The accafreeze
+  feed, oddschecker subevent ids and Sky Bet odds (short TTL) are kept warm and
+  refreshed in the background; GET /stats reports p50/p99 request latency.
 
 This script reuses some helper functions from `accafreeze.py` (must be in same folder).
 Requires requests, cloudscraper and tls_client (same deps as the main script).
@@ -13,7 +16,11 @@ Requires requests, cloudscraper and tls_client (same deps as the main script).
 import argparse
 import json
 import sys
-from datetime import datetime, timezone
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import contextlib
 import os
 
@@ -21,7 +28,7 @@ import os
 from accafreeze import (
     fetch_accafreeze_data,
     filter_matches,
-    get_skybet_odds_for_match,
+    fetch_skybet_odds_concurrent,
     match_team_names,
     calculate_rating,
 )
@@ -45,6 +52,12 @@ CONFIG = {
         "output_mode": "stdout",  # 'stdout' (default) or 'file'
         "out_file": "accafreeze_api_opportunities.json",  # Default output file when using file mode
         "debug": False
+    },
+    "service": {
+        "host": "127.0.0.1",
+        "port": 8765,
+        "refresh_seconds": 60,    # Background refresh of the feed and stale Sky Bet odds
+        "skybet_ttl": 90          # Sky Bet odds older than this are refetched
     }
 }
 
@@ -119,16 +132,234 @@ def build_opportunity(match, outcome, skybet_odds, oc_home, oc_away, hours_until
     }
 
 
+def max_lookahead_hours(cfg_first, cfg_extra):
+    """Maximum of the first-leg and extra-leg lookahead windows."""
+    extra_hours = cfg_extra.get("hours_to_ko", cfg_first.get("hours_to_ko", 24))
+    return max(cfg_first.get("hours_to_ko", 24), extra_hours)
+
+
+def build_output(qualifying, sky_cache, cfg_first, cfg_extra):
+    """Classify qualifying outcomes against Sky Bet odds (sky_cache: match_id -> odds data)."""
+    results = []
+    extra_list = []
+
+    for item in qualifying:
+        match = item["match"]
+        outcome = item["outcome"]
+        hours_until_ko = item.get("hours_until_ko", 0)
+
+        sky = sky_cache.get(match.get("match_id"))
+        if not sky or not sky.get("odds"):
+            continue
+
+        sky_odds = sky.get("odds")
+        oc_home = sky.get("home_team")
+        oc_away = sky.get("away_team")
+
+        opp = build_opportunity(match, outcome, sky_odds, oc_home, oc_away, hours_until_ko)
+        if not opp:
+            continue
+
+        # Classification
+        classifications = []
+        if is_first_leg(opp["back_odds"], opp["lay_odds"], opp["rating"], opp["lay_liquidity"], opp["hours_until_ko"], cfg_first):
+            classifications.append("first_leg")
+        if is_extra_leg(opp["back_odds"], opp["hours_until_ko"], cfg_extra):
+            classifications.append("extra_leg")
+
+        if classifications:
+            opp["classifications"] = classifications
+            results.append(opp)
+
+            if "extra_leg" in classifications:
+                extra_list.append(opp)
+
+    # Optionally truncate extra_list per config
+    if len(extra_list) > cfg_extra.get("max_items", 100):
+        extra_list = extra_list[: cfg_extra.get("max_items", 100)]
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "counts": {"total": len(results), "first_leg": sum(1 for r in results if "first_leg" in r.get("classifications", [])), "extra_leg": sum(1 for r in results if "extra_leg" in r.get("classifications", []))},
+        "opportunities": results,
+        "extra_legs": extra_list
+    }
+
+
+# ---------------------- Service mode ----------------------
+class WarmState:
+    """Accafreeze feed and Sky Bet odds kept in memory and refreshed in the background."""
+
+    def __init__(self, cfg_first, cfg_extra, cfg_service):
+        self.cfg_first = cfg_first
+        self.cfg_extra = cfg_extra
+        self.refresh_seconds = float(cfg_service.get("refresh_seconds", 60))
+        self.skybet_ttl = float(cfg_service.get("skybet_ttl", 90))
+        self._lock = threading.Lock()
+        self.data = None
+        self.data_at = 0.0
+        self.sky = {}            # match_id -> (fetched_at, odds data)
+        self.ready = threading.Event()
+        self.refreshes = 0
+        self.last_refresh_seconds = None
+
+    def refresh(self):
+        started = time.time()
+        data = fetch_accafreeze_data()
+        if data:
+            with self._lock:
+                self.data = data
+                self.data_at = time.time()
+        with self._lock:
+            data = self.data
+        if not data:
+            return
+        qualifying = filter_matches(data, max_lookahead_hours(self.cfg_first, self.cfg_extra))
+        matches = {item["match"].get("match_id"): item["match"] for item in qualifying}
+        now = time.time()
+        with self._lock:
+            stale = [m for mid, m in matches.items() if now - self.sky.get(mid, (0, None))[0] >= self.skybet_ttl]
+        fetched = fetch_skybet_odds_concurrent(stale) if stale else {}
+        fetched_at = time.time()
+        with self._lock:
+            for mid, sky in fetched.items():
+                # A failed or empty refetch keeps the last good odds (and its age, so it is retried)
+                previous = self.sky.get(mid, (0, None))[1]
+                if not (sky and sky.get("odds")) and previous and previous.get("odds"):
+                    continue
+                self.sky[mid] = (fetched_at, sky)
+            # Drop odds for matches no longer in the feed window
+            for mid in [mid for mid in self.sky if mid not in matches]:
+                del self.sky[mid]
+            self.refreshes += 1
+            self.last_refresh_seconds = time.time() - started
+        self.ready.set()
+
+    def run_forever(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[SERVICE] Refresh failed: {e}", flush=True)
+            time.sleep(self.refresh_seconds)
+
+    def start(self):
+        threading.Thread(target=self.run_forever, name="accafreeze-refresh", daemon=True).start()
+        return self
+
+    def output(self):
+        """Build the API output from memory (hours to KO recomputed at query time)."""
+        with self._lock:
+            data = self.data
+            sky_cache = {mid: sky for mid, (_, sky) in self.sky.items()}
+        qualifying = filter_matches(data, max_lookahead_hours(self.cfg_first, self.cfg_extra)) if data else []
+        return build_output(qualifying, sky_cache, self.cfg_first, self.cfg_extra)
+
+    def status(self):
+        with self._lock:
+            return {
+                "feed_age_seconds": round(time.time() - self.data_at, 1) if self.data_at else None,
+                "feed_matches": len((self.data or {}).get("matches", [])),
+                "skybet_cached_matches": len(self.sky),
+                "refreshes": self.refreshes,
+                "last_refresh_seconds": round(self.last_refresh_seconds, 2) if self.last_refresh_seconds is not None else None,
+            }
+
+
+class LatencyTracker:
+    """Rolling window of request latencies with percentile reporting."""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+
+    def percentiles(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"requests": self.count, "p50_ms": None, "p99_ms": None}
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+        return {"requests": self.count, "p50_ms": round(pick(0.50), 2), "p99_ms": round(pick(0.99), 2)}
+
+
+def make_handler(state, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            started = time.perf_counter()
+            path = self.path.split("?", 1)[0]
+            if path in ("/", "/opportunities"):
+                if not state.ready.wait(timeout=60):
+                    self._send_json(503, {"error": "warming up"})
+                    return
+                try:
+                    self._send_json(200, state.output())
+                except Exception as e:
+                    self._send_json(500, {"generated_at": datetime.now(timezone.utc).isoformat(), "opportunities": [], "error": "exception", "exception": str(e)})
+                latency.add((time.perf_counter() - started) * 1000)
+            elif path == "/stats":
+                self._send_json(200, dict(state.status(), latency=latency.percentiles()))
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(cfg_first, cfg_extra, cfg_service, host=None, port=None):
+    """Run the resident HTTP service until interrupted."""
+    state = WarmState(cfg_first, cfg_extra, cfg_service).start()
+    latency = LatencyTracker()
+    host = host or cfg_service.get("host", "127.0.0.1")
+    port = port or int(cfg_service.get("port", 8765))
+    server = ThreadingHTTPServer((host, port), make_handler(state, latency))
+    print(f"[SERVICE] Listening on http://{host}:{port}/opportunities (refresh every {state.refresh_seconds:.0f}s)", flush=True)
+    threading.Thread(target=server.serve_forever, name="accafreeze-http", daemon=True).start()
+    try:
+        while True:
+            time.sleep(300)
+            stats = latency.percentiles()
+            if stats["requests"]:
+                print(f"[SERVICE] {stats['requests']} requests, p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(description="AccaFreeze JSON API generator")
     parser.add_argument("--out-file", dest="out_file", help="Write JSON to file instead of stdout")
     parser.add_argument("--debug", action="store_true", help="Enable debug output (prints to stderr)")
+    parser.add_argument("--serve", action="store_true", help="Run as a resident HTTP service with warm caches")
+    parser.add_argument("--host", help="Service bind address (default from CONFIG['service'])")
+    parser.add_argument("--port", type=int, help="Service port (default from CONFIG['service'])")
     args = parser.parse_args(argv)
 
     cfg_first = CONFIG["first_leg"]
     cfg_extra = CONFIG["extra_legs"]
     debug = args.debug or CONFIG["behaviour"].get("debug", False)
 
+    if args.serve:
+        serve(cfg_first, cfg_extra, CONFIG["service"], host=args.host, port=args.port)
+        return
+
 # Optionally suppress console output when running in stdout mode (no --out-file) and not in debug
     @contextlib.contextmanager
     def _maybe_suppress(suppress: bool):
@@ -148,72 +379,18 @@ def main(argv=None):
             data = fetch_accafreeze_data()
 
             # Filter matches by the maximum of the first-leg and extra-leg lookahead windows
-            extra_hours = cfg_extra.get("hours_to_ko", cfg_first.get("hours_to_ko", 24))
-            max_hours = max(cfg_first.get("hours_to_ko", 24), extra_hours)
-            qualifying = filter_matches(data, max_hours) if data else []
-
-            results = []
-            extra_list = []
-
-            sky_cache = {}
-
-            for item in qualifying:
-                match = item["match"]
-                outcome = item["outcome"]
-                hours_until_ko = item.get("hours_until_ko", 0)
-
-                oddschecker_slug = match.get("oddschecker_slug")
-                oddschecker_match_id = match.get("oddschecker_match_id")
-                match_id = match.get("match_id")
-
-                # Get Sky Bet odds (cached by match_id)
-                if match_id not in sky_cache:
-                    sky = get_skybet_odds_for_match(oddschecker_slug, oddschecker_match_id, debug=False)
-                    sky_cache[match_id] = sky
-                else:
-                    sky = sky_cache[match_id]
-
-                if not sky or not sky.get("odds"):
-                    continue
+            qualifying = filter_matches(data, max_lookahead_hours(cfg_first, cfg_extra)) if data else []
 
-                sky_odds = sky.get("odds")
-                oc_home = sky.get("home_team")
-                oc_away = sky.get("away_team")
+            # Sky Bet odds for every qualifying match, fetched concurrently (keyed by match_id)
+            sky_cache = fetch_skybet_odds_concurrent([item["match"] for item in qualifying], debug=False)
 
-                opp = build_opportunity(match, outcome, sky_odds, oc_home, oc_away, hours_until_ko)
-                if not opp:
-                    continue
-
-                # Classification
-                classifications = []
-                if is_first_leg(opp["back_odds"], opp["lay_odds"], opp["rating"], opp["lay_liquidity"], opp["hours_until_ko"], cfg_first):
-                    classifications.append("first_leg")
-                if is_extra_leg(opp["back_odds"], opp["hours_until_ko"], cfg_extra):
-                    classifications.append("extra_leg")
-
-                if classifications:
-                    opp["classifications"] = classifications
-                    results.append(opp)
-
-                    if "extra_leg" in classifications:
-                        extra_list.append(opp)
-
-            # Optionally truncate extra_list per config
-            if len(extra_list) > cfg_extra.get("max_items", 100):
-                extra_list = extra_list[: cfg_extra.get("max_items", 100)]
+            output = build_output(qualifying, sky_cache, cfg_first, cfg_extra)
     except Exception as e:
         # Ensure we output JSON (even when silent) describing the error
         err_output = {"generated_at": datetime.now(timezone.utc).isoformat(), "opportunities": [], "error": "exception", "exception": str(e)}
         sys.stdout.write(json.dumps(err_output, indent=2))
         return
 
-    output = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "counts": {"total": len(results), "first_leg": sum(1 for r in results if "first_leg" in r.get("classifications", [])), "extra_leg": sum(1 for r in results if "extra_leg" in r.get("classifications", []))},
-        "opportunities": results,
-        "extra_legs": extra_list
-    }
-
     # Output to file or stdout
     if args.out_file:
         with open(args.out_file, "w", encoding="utf-8") as f:
@@ -226,5 +403,4 @@ def main(argv=None):
 
 
 if __name__ == "__main__":
-    from datetime import timedelta
     main()
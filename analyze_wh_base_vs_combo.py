@@ -3,6 +3,8 @@ import os
 from collections import defaultdict
 from datetime import datetime
 
+from odds_history import OddsHistory, format_ts, np
+
 def load_tracking_data(match_id):
     """Load both combo and base odds tracking data for a match."""
     tracking_dir = 'wh_odds_tracking'
@@ -23,17 +25,12 @@ def load_tracking_data(match_id):
     
     return combo_data, base_data
 
-def analyze_changes(combo_data, base_data):
-    """Compare base odds changes with combo odds changes."""
-    
-    if not combo_data or not base_data:
-        print("Missing tracking data")
-        return
+def collect_changes(combo_data, base_data):
+    """Base and combo change events from the raw tracking JSON.
     
-    print(f"Match: {combo_data['match_name']}")
-    print(f"Combo records: {len(combo_data['records'])}")
-    print(f"Base odds snapshots: {len(base_data['records'])}")
-    print("=" * 80)
+    Returns:
+        (base_changes, combo_changes): {timestamp: [change dict, ...]}
+    """
     
     # Build a lookup for combo odds at any timestamp
     # Structure: {(player, market): [(timestamp, odds), ...]}
@@ -117,6 +114,49 @@ def analyze_changes(combo_data, base_data):
                     'change': curr['wh_odds'] - prev['wh_odds']
                 })
     
+    return base_changes, combo_changes
+
+def _change_rows(changed, old):
+    """(timestamp, player, market, old_odds, new_odds) per change, converted column-wise."""
+    stamps, inverse = np.unique(changed.ts, return_inverse=True)
+    stamps = [format_ts(t) for t in stamps.tolist()]
+    keys = changed.keys
+    return zip([stamps[i] for i in inverse.tolist()], [keys[k] for k in changed.key.tolist()],
+               old.tolist(), changed.price.tolist())
+
+def collect_changes_columnar(combo, base):
+    """Same change events as collect_changes, from odds_history frames."""
+    base_changes = defaultdict(list)
+    changed, old = base.changes()
+    before = combo.asof_join(changed).tolist()
+    after = combo.asof_join(changed, forward=True).tolist()
+    for (timestamp, (player_name, market_type), old_odds, new_odds), combo_before, combo_after in zip(
+            _change_rows(changed, old), before, after):
+        base_changes[timestamp].append({
+            'player': player_name,
+            'market': market_type,
+            'old_odds': old_odds,
+            'new_odds': new_odds,
+            'change': new_odds - old_odds,
+            'combo_before': None if combo_before != combo_before else combo_before,  # NaN -> no combo price
+            'combo_after': None if combo_after != combo_after else combo_after
+        })
+    
+    combo_changes = defaultdict(list)
+    for timestamp, (player_name, market_type), old_odds, new_odds in _change_rows(*combo.changes()):
+        combo_changes[timestamp].append({
+            'player': player_name,
+            'market': market_type,
+            'old_odds': old_odds,
+            'new_odds': new_odds,
+            'change': new_odds - old_odds
+        })
+    
+    return base_changes, combo_changes
+
+def report_changes(base_changes, combo_changes):
+    """Print base/combo change timelines and their correlation."""
+    
     # Analyze correlation
     print("\n" + "=" * 80)
     print("BASE ODDS CHANGES (with corresponding combo odds):")
@@ -205,6 +245,35 @@ def analyze_changes(combo_data, base_data):
             if len(combo_only_after_base) > 5:
                 print(f"  ... and {len(combo_only_after_base) - 5} more")
 
+def analyze_changes(combo_data, base_data):
+    """Compare base odds changes with combo odds changes."""
+    
+    if not combo_data or not base_data:
+        print("Missing tracking data")
+        return
+    
+    print(f"Match: {combo_data['match_name']}")
+    print(f"Combo records: {len(combo_data['records'])}")
+    print(f"Base odds snapshots: {len(base_data['records'])}")
+    print("=" * 80)
+    
+    report_changes(*collect_changes(combo_data, base_data))
+
+def analyze_match_columnar(history, match_id):
+    """analyze_changes over the cached odds_history columns."""
+    combo = history.load(match_id, 'wh_combo')
+    base = history.load(match_id, 'wh_base')
+    if combo is None or base is None:
+        print("Missing tracking data")
+        return
+    
+    print(f"Match: {combo.match_name}")
+    print(f"Combo records: {len(combo)}")
+    print(f"Base odds snapshots: {len(np.unique(base.ts))}")
+    print("=" * 80)
+    
+    report_changes(*collect_changes_columnar(combo, base))
+
 if __name__ == "__main__":
     # Find all match IDs with tracking data
     tracking_dir = 'wh_odds_tracking'
@@ -212,10 +281,15 @@ if __name__ == "__main__":
         print(f"Tracking directory not found: {tracking_dir}")
         exit(1)
     
+    # Columnar store when numpy is available (ANALYZE_JSON=1 forces the JSON path)
+    history = None
+    if np is not None and os.getenv("ANALYZE_JSON", "0") != "1":
+        history = OddsHistory(sources={'wh_combo': (tracking_dir, '.json'), 'wh_base': (tracking_dir, '_base.json')})
+    
     # Get all match IDs (files without _base suffix)
     match_ids = set()
     for filename in os.listdir(tracking_dir):
-        if filename.endswith('.json') and not filename.endswith('_base.json'):
+        if filename.endswith('.json') and not filename.endswith('_base.json') and filename != 'run_counter.json':
             match_id = filename.replace('.json', '')
             match_ids.add(match_id)
     
@@ -226,6 +300,9 @@ if __name__ == "__main__":
     print(f"Found {len(match_ids)} matches with tracking data\n")
     
     for match_id in sorted(match_ids):
-        combo_data, base_data = load_tracking_data(match_id)
-        analyze_changes(combo_data, base_data)
+        if history is not None:
+            analyze_match_columnar(history, match_id)
+        else:
+            combo_data, base_data = load_tracking_data(match_id)
+            analyze_changes(combo_data, base_data)
         print("\n" + "=" * 80 + "\n")
@@ -1,10 +1,13 @@
 import requests
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone, timedelta
 import json
 import os
 import csv
 
+from raw_archive import archive_response
+
 # Try to load local .env so BETFAIR_DEBUG_SAVE and other opts in .env are available
 try:
     from dotenv import load_dotenv
@@ -62,6 +65,20 @@ class Betfair():
         }
         self.AGS_MARKET_NAME = "TO_SCORE"
         self.FGS_MARKET_NAME = "FIRST_GOAL_SCORER"
+        # request timeout (seconds) and max market ids per bymarket request
+        try:
+            self.timeout = float(os.getenv('BETFAIR_TIMEOUT', '15') or 15)
+        except Exception:
+            self.timeout = 15.0
+        try:
+            self.market_chunk_size = max(1, int(os.getenv('BETFAIR_MARKET_CHUNK', '10') or 10))
+        except Exception:
+            self.market_chunk_size = 10
+        # pooled keep-alive session shared by all market/odds requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         # ensure the whitelist CSV exists (header written) so callers see the file immediately
         try:
             self.ensure_whitelist_exists()
@@ -345,7 +362,7 @@ class Betfair():
         }
 
         try:
-            r = requests.get(markets_url, headers=self.headers, params=markets_params, proxies=self.proxies, timeout=15)
+            r = self.session.get(markets_url, headers=self.headers, params=markets_params, proxies=self.proxies, timeout=self.timeout)
             r.raise_for_status()
             markets_data = r.json()
             
@@ -355,12 +372,8 @@ class Betfair():
                 except Exception:
                     pass
 
-            # cache raw response
-            cache_dir = os.path.join(os.path.dirname(__file__), "..", "cache")
-            os.makedirs(cache_dir, exist_ok=True)
-            cached_file = os.path.join(cache_dir, f"betfair_markets_{match_id}.json")
-            with open(cached_file, 'w', encoding='utf-8') as f:
-                json.dump(markets_data, f, indent=2, ensure_ascii=False)
+            # archive raw response (opt-in, written off the request path)
+            archive_response(f"betfair_markets_{match_id}", markets_data)
             
             # Extract market nodes for goalscorer markets
             market_nodes = []
@@ -407,7 +420,7 @@ class Betfair():
             "types": "MARKET_STATE,EVENT,MARKET_DESCRIPTION"
         }
 
-        r = requests.get(markets_url, headers=self.headers, params=markets_params, proxies=self.proxies)
+        r = self.session.get(markets_url, headers=self.headers, params=markets_params, proxies=self.proxies, timeout=self.timeout)
         r.raise_for_status()
         markets_data = r.json()
         if getattr(self, 'debug_save', False):
@@ -416,12 +429,8 @@ class Betfair():
             except Exception:
                 pass
 
-        # cache raw response
-        cache_dir = os.path.join(os.path.dirname(__file__), "..", "cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        cached_file = os.path.join(cache_dir, f"betfair_markets_{match_id}.json")
-        with open(cached_file, 'w', encoding='utf-8') as f:
-            json.dump(markets_data, f, indent=2, ensure_ascii=False)
+        # archive raw response (opt-in, written off the request path)
+        archive_response(f"betfair_markets_{match_id}", markets_data)
 
         supported_markets = {}
         for event_type in markets_data.get('eventTypes', []):
@@ -447,10 +456,10 @@ class Betfair():
             return []
 
         market_ids_to_fetch = [info['market_id'] for info in supported_markets.values()]
+        books = self.fetch_markets_odds(market_ids_to_fetch, match)
         all_odds = []
         for market_id in market_ids_to_fetch:
-            odds = self._fetch_market_odds(market_id, supported_markets, match)
-            all_odds.extend(odds)
+            all_odds.extend(books.get(str(market_id), []))
         return all_odds
 
     def _fetch_market_odds(self, market_id: str, supported_markets: Dict, match: Optional[Dict]) -> List[Dict[str, Any]]:
@@ -466,7 +475,7 @@ class Betfair():
         }
 
         try:
-            response = requests.get(url, headers=self.headers, params=params, proxies=self.proxies)
+            response = self.session.get(url, headers=self.headers, params=params, proxies=self.proxies, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
             if getattr(self, 'debug_save', False):
@@ -477,14 +486,9 @@ class Betfair():
         except requests.RequestException:
             return []
 
-        # cache market response
-        cache_dir = os.path.join(os.path.dirname(__file__), "..", "cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        cached_file = os.path.join(cache_dir, f"betfair_market_{market_id}.json")
-        with open(cached_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # archive market response (opt-in, written off the request path)
+        archive_response(f"betfair_market_{market_id}", data)
 
-        odds_list = []
         market_type = None
         internal_market_name = None
         for mtype, minfo in supported_markets.items():
@@ -496,19 +500,93 @@ class Betfair():
         if not market_type:
             return []
 
+        for market_node in self._iter_market_nodes(data):
+            if market_node.get('marketId') != market_id:
+                continue
+            return self._parse_market_node(market_node, market_type, internal_market_name, match)
+        return []
+
+    def fetch_markets_odds(self, market_ids: List[str], match: Optional[Dict] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch best-lay odds for many goalscorer markets in as few requests as possible.
+
+        Market ids are de-duplicated and sent `market_chunk_size` at a time to the
+        `bymarket` endpoint over the pooled session. The market type of each book is
+        read from its own description, so no `supported_markets` mapping is needed.
+
+        Args:
+            market_ids: Betfair market ids (e.g. FGS and AGS markets of several matches)
+            match: optional match dict passed through to outcome extraction
+
+        Returns:
+            Dict of market_id -> list of odds dicts (same shape as `_fetch_market_odds`).
+            Ids from chunks that were fetched are present (markets that are not FGS/AGS
+            map to []); ids from a failed chunk are left out so callers can fall back to
+            `_fetch_market_odds` for them.
+        """
+        ids: List[str] = []
+        for mid in market_ids:
+            mid = str(mid)
+            if mid and mid not in ids:
+                ids.append(mid)
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        if not ids:
+            return results
+
+        url = f"{self.api_url}bymarket"
+        internal_names = {self.FGS_MARKET_NAME: 'FGS', self.AGS_MARKET_NAME: 'AGS'}
+        for start in range(0, len(ids), self.market_chunk_size):
+            chunk = ids[start:start + self.market_chunk_size]
+            params = {
+                'alt': 'json',
+                'currencyCode': 'GBP',
+                'locale': 'en_GB',
+                'marketIds': ','.join(chunk),
+                'rollupLimit': '10',
+                'rollupModel': 'STAKE',
+                'types': 'MARKET_STATE,MARKET_RATES,MARKET_DESCRIPTION,EVENT,RUNNER_DESCRIPTION,RUNNER_STATE,RUNNER_EXCHANGE_PRICES_BEST,RUNNER_METADATA,MARKET_LICENCE,MARKET_LINE_RANGE_INFO'
+            }
+            try:
+                response = self.session.get(url, headers=self.headers, params=params, proxies=self.proxies, timeout=self.timeout)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                print(f"[BETFAIR] Error fetching markets {','.join(chunk)}: {e}")
+                continue
+            if getattr(self, 'debug_save', False):
+                try:
+                    self._maybe_save_debug(f"markets_{chunk[0]}_{len(chunk)}", data)
+                except Exception:
+                    pass
+            archive_response(f"betfair_markets_{chunk[0]}_{len(chunk)}", data)
+
+            results.update((mid, []) for mid in chunk)
+            for market_node in self._iter_market_nodes(data):
+                mid = str(market_node.get('marketId', ''))
+                if mid not in results:
+                    continue
+                market_type = market_node.get('description', {}).get('marketType', '')
+                if market_type not in internal_names:
+                    continue
+                results[mid] = self._parse_market_node(market_node, market_type, internal_names[market_type], match)
+        return results
+
+    @staticmethod
+    def _iter_market_nodes(data: Dict):
+        """Yield every market node in a readonly `byevent`/`bymarket` response."""
         for event_type in data.get('eventTypes', []):
             for event_node in event_type.get('eventNodes', []):
                 for market_node in event_node.get('marketNodes', []):
-                    if market_node.get('marketId') != market_id:
-                        continue
-                    runners = market_node.get('runners', [])
-                    for runner in runners:
-                        outcome = self._extract_outcome_name(runner, market_type, match)
-                        if not outcome:
-                            continue
-                        price, size = self._extract_best_lay(runner)
-                        if price > 0 and size >= getattr(self, 'min_lay_size', 0.0):
-                            odds_list.append({'market': internal_market_name, 'market_type': market_type, 'outcome': outcome, 'odds': price, 'size': size})
+                    yield market_node
+
+    def _parse_market_node(self, market_node: Dict, market_type: str, internal_market_name: str, match: Optional[Dict]) -> List[Dict[str, Any]]:
+        odds_list = []
+        for runner in market_node.get('runners', []):
+            outcome = self._extract_outcome_name(runner, market_type, match)
+            if not outcome:
+                continue
+            price, size = self._extract_best_lay(runner)
+            if price > 0 and size >= getattr(self, 'min_lay_size', 0.0):
+                odds_list.append({'market': internal_market_name, 'market_type': market_type, 'outcome': outcome, 'odds': price, 'size': size})
         return odds_list
 
     def _extract_outcome_name(self, runner: Dict, market_type: str, match: Optional[Dict]) -> str:
@@ -15,7 +15,24 @@ import os
 # Add parent directory to path to import virgin_goose
 sys.path.insert(0, os.path.dirname(__file__))
 
-from virgin_goose import consolidate_player_tracking
+from virgin_goose import consolidate_player_tracking, normalize_name
+from player_names import USE_SQLITE
+
+
+def consolidate_player_tracking_sqlite():
+    """Merge tracking rows of every mapped variant into its preferred key in one batch."""
+    from player_db import get_db
+    
+    db = get_db()
+    pairs = []
+    for variant, preferred in db.get_all_mappings().items():
+        target = normalize_name(preferred)
+        if target and target != variant:
+            pairs.append((variant, target))
+    
+    merged = db.merge_many(pairs)
+    return {'merged_count': merged, 'total_entries': db.get_stats()['player_tracking']}
+
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -23,7 +40,7 @@ if __name__ == '__main__':
     print("=" * 60)
     print()
     
-    result = consolidate_player_tracking()
+    result = consolidate_player_tracking_sqlite() if USE_SQLITE else consolidate_player_tracking()
     
     print()
     print("=" * 60)
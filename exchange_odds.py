@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Shared exchange-odds snapshots from the OddsMatcha markets endpoint.
+
+virgin_goose and kwiff/server/generate_combos.py both need the lay odds
+OddsMatcha has for a match. A snapshot is fetched at most once per
+EXCHANGE_ODDS_TTL seconds per match, reduced to compact per-site records
+(site, lay odds, parsed update time, liquidity, original timestamp string)
+and written to cache/exchange_odds/<match_id>.json, so other processes
+reuse it instead of fetching again.
+
+Freshness filtering and the websocket-feed preference are applied when a
+view is read, in one pass over each outcome's records.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import oddsmatcha
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXCHANGE_ODDS_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'exchange_odds')
+EXCHANGE_ODDS_TTL = float(os.getenv("EXCHANGE_ODDS_TTL", "30"))
+EXCHANGE_ODDS_MAX_AGE = 300  # odds last updated more than 5 minutes ago are ignored
+
+MARKETS_PATH = "matches/{match_id}/markets/"
+GOALSCORER_MARKETS = ('Anytime Goalscorer', 'First Goalscorer', 'Two or More Goals', 'Hat-trick')
+
+# Record fields (lists so snapshots round-trip through JSON unchanged)
+SITE, LAY_ODDS, UPDATED, LIQUIDITY, LAST_UPDATED = range(5)
+
+_snapshots = {}  # match_id -> (fetched_at, markets)
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16384)
+def parse_timestamp(value):
+    """OddsMatcha last_updated -> epoch seconds, or None if unparseable.
+
+    ISO strings without an offset are UTC; a trailing 'Z' is accepted;
+    numbers are taken as epoch seconds already. The feed repeats the same
+    timestamp across many odds, so results are cached.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _runner_market(name):
+    if 'Anytime Goalscorer' in name or 'Anytime Goal Scorer' in name:
+        return 'Anytime Goalscorer'
+    return None
+
+
+def compact_markets(data):
+    """Reduce a markets API response to {market: {outcome: [record, ...]}}.
+
+    Accepts the per-odd layout ({'market_name', 'odds': [...]}) and the older
+    per-runner layout ({'name', 'runners': [{'name', '<site>': {...}}]}).
+    Betfair is dropped (its odds come from the Betfair feed), as are odds
+    without a price or with an unparseable timestamp.
+    """
+    markets = {}
+    for market in data or []:
+        if 'odds' in market:
+            market_name = market.get('market_name', '')
+            if market_name not in GOALSCORER_MARKETS:
+                continue
+            outcomes = markets.setdefault(market_name, {})
+            for odd in market.get('odds') or []:
+                lay_odds = odd.get('lay_odds')
+                outcome_name = odd.get('outcome_name')
+                site = (odd.get('site_name') or '').lower()
+                if not lay_odds or not outcome_name or site == 'betfair':
+                    continue
+                last_updated = odd.get('last_updated')
+                updated = None
+                if last_updated:
+                    updated = parse_timestamp(last_updated)
+                    if updated is None:
+                        continue
+                outcomes.setdefault(outcome_name, []).append(
+                    [site, float(lay_odds), updated, _float_or_none(odd.get('lay_liquidity')), last_updated])
+        else:
+            market_name = _runner_market(market.get('name', ''))
+            if market_name is None:
+                continue
+            outcomes = markets.setdefault(market_name, {})
+            for runner in market.get('runners') or []:
+                player_name = runner.get('name', '')
+                if not player_name:
+                    continue
+                for site, site_data in runner.items():
+                    if site in ('name', 'id') or not isinstance(site_data, dict) or site.lower() == 'betfair':
+                        continue
+                    lay_price = site_data.get('lay_price')
+                    if not lay_price:
+                        continue
+                    last_updated = site_data.get('last_updated', 0)
+                    outcomes.setdefault(player_name, []).append(
+                        [site.lower(), float(lay_price), parse_timestamp(last_updated) or 0.0, None, last_updated])
+    return markets
+
+
+def _cache_file(match_id):
+    return os.path.join(EXCHANGE_ODDS_CACHE_DIR, f"{match_id}.json")
+
+
+def _read_cache(match_id, now, ttl):
+    try:
+        with open(_cache_file(match_id), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        fetched_at = float(cached.get('ts', 0))
+        if now - fetched_at <= ttl:
+            return fetched_at, cached.get('markets') or {}
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def _write_cache(match_id, fetched_at, markets):
+    try:
+        os.makedirs(EXCHANGE_ODDS_CACHE_DIR, exist_ok=True)
+        path = _cache_file(match_id)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'ts': fetched_at, 'markets': markets}, f, separators=(',', ':'))
+        os.replace(tmp_file, path)
+    except OSError as e:
+        print(f"[WARN] Failed to write exchange odds cache for match {match_id}: {e}")
+
+
+def get_snapshot(match_id, ttl=None, session=None):
+    """Compact markets for a match, fetched at most once per `ttl` seconds.
+
+    Looks in memory, then in the shared cache file, then fetches. Raises on
+    HTTP/parse errors so callers keep their own error reporting.
+    """
+    ttl = EXCHANGE_ODDS_TTL if ttl is None else ttl
+    key = str(match_id)
+    now = time.time()
+    with _lock:
+        cached = _snapshots.get(key)
+    if cached and now - cached[0] <= ttl:
+        return cached[1]
+    cached = _read_cache(key, now, ttl) if ttl > 0 else None
+    if cached is None:
+        data = oddsmatcha.get_json(MARKETS_PATH.format(match_id=match_id), ttl=0, session=session)
+        cached = (time.time(), compact_markets(data))
+        if ttl > 0:
+            _write_cache(key, *cached)
+    with _lock:
+        _snapshots[key] = cached
+    return cached[1]
+
+
+def _select(records, now, max_age, prefer_websocket, sites):
+    """Fresh records as entries; with prefer_websocket, one per base site with '<site>_ws' winning."""
+    if not prefer_websocket:
+        return [_entry(r, r[SITE].capitalize() if r[SITE] else None, None) for r in records
+                if (r[UPDATED] is None or now - r[UPDATED] <= max_age)
+                and (sites is None or r[SITE] in sites)]
+    chosen = {}  # base site -> [ws record, regular record], in first-seen order
+    for r in records:
+        site = r[SITE]
+        if not site or (r[UPDATED] is not None and now - r[UPDATED] > max_age):
+            continue
+        base_site = site.replace('_ws', '')
+        if sites is not None and base_site not in sites:
+            continue
+        slot = chosen.setdefault(base_site, [None, None])
+        slot[0 if site.endswith('_ws') else 1] = r
+    return [_entry(ws, base_site.capitalize(), True) if ws else _entry(regular, regular[SITE].capitalize(), False)
+            for base_site, (ws, regular) in chosen.items()]
+
+
+def _entry(record, site_name, is_websocket):
+    entry = {
+        'site_name': site_name,
+        'lay_odds': record[LAY_ODDS],
+        'last_updated': record[LAST_UPDATED],
+        'liquidity': record[LIQUIDITY],
+    }
+    if is_websocket is not None:
+        entry['is_websocket'] = is_websocket
+    return entry
+
+
+def exchange_odds_view(markets, prefer_websocket=True, normalize=None, sites=None,
+                       market_names=None, max_age=EXCHANGE_ODDS_MAX_AGE, now=None):
+    """{market: {outcome: [entry, ...]}} from a snapshot, keeping only fresh odds.
+
+    Args:
+        markets: snapshot from get_snapshot()
+        prefer_websocket: replace '<site>' with '<site>_ws' odds when both exist
+        normalize: optional name normalizer; adds 'norm' to every entry
+        sites: optional set of lower-case site names to keep
+        market_names: optional iterable of markets to keep
+        max_age: seconds after which odds are stale
+    """
+    now = time.time() if now is None else now
+    result = {}
+    for market_name, outcomes in markets.items():
+        if market_names is not None and market_name not in market_names:
+            continue
+        view = result[market_name] = {}
+        for outcome_name, records in outcomes.items():
+            entries = _select(records, now, max_age, prefer_websocket, sites)
+            if not entries:
+                continue
+            if normalize is not None:
+                norm = normalize(outcome_name)
+                for entry in entries:
+                    entry['norm'] = norm
+            view[outcome_name] = entries
+    return result
@@ -8,10 +8,20 @@ Automatically updates event_mappings.json with new mappings.
 import json
 import os
 import sys
+import time
 from datetime import datetime, timedelta
 import requests
 from pathlib import Path
 
+# Shared modules at the repo root (appended, so this directory's own betfair.py
+# still takes precedence over the root one)
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+import oddsmatcha
+from team_names import match_teams, TeamNameIndex, kickoff_bucket, kickoffs_compatible
+
 # Fix encoding for Windows terminals that don't support UTF-8
 if sys.platform == 'win32':
     try:
@@ -102,7 +112,7 @@ def fetch_oddsmatcha_matches():
     """Fetch matches from Oddsmatcha API."""
     try:
         url = "https://api.oddsmatcha.uk/matches/?next_days=1"
-        response = requests.get(url, timeout=10)
+        response = oddsmatcha.get(url)
         response.raise_for_status()
         data = response.json()
         print(f"  API Response type: {type(data)}")
@@ -156,51 +166,28 @@ def extract_ids(match):
     return ids
 
 
-def normalize_team_name(name):
-    """Normalize team name for comparison."""
-    if not name:
-        return ""
-    return name.lower().strip()
+def build_api_match_index(api_matches):
+    """TeamNameIndex over both teams of each API match; values are match positions."""
+    index = TeamNameIndex()
+    for position, api_match in enumerate(api_matches):
+        api_home = api_match.get('home_team') or api_match.get('homeTeam')
+        api_away = api_match.get('away_team') or api_match.get('awayTeam')
+        if not api_home or not api_away:
+            continue
+        index.add(api_home, position)
+        index.add(api_away, position)
+    return index
 
 
-def team_name_matches(team1, team2):
-    """Check if two team names match.
-    
-    Returns True if:
-    - One name is entirely contained in the other
-    - They are identical after normalization
+def find_api_match_candidates(index, api_kickoffs, local_home, local_away, local_kickoff=None):
     """
-    t1 = normalize_team_name(team1)
-    t2 = normalize_team_name(team2)
-    
-    if not t1 or not t2:
-        return False
-    
-    # Exact match
-    if t1 == t2:
-        return True
-    
-    # One contained in the other (e.g., "Chelsea" in "Chelsea FC")
-    if t1 in t2 or t2 in t1:
-        return True
-    
-    return False
-
-
-def match_teams(local_home, local_away, api_home, api_away):
-    """Check if teams match between local events and API data.
-    
-    Returns True if AT LEAST ONE team name matches.
-    This allows flexibility in match identification.
+    API match positions that match_teams() would accept for a local event,
+    in API order, minus those whose kickoff is clearly a different fixture.
     """
-    # Check if local home matches either API team
-    home_matches = team_name_matches(local_home, api_home) or team_name_matches(local_home, api_away)
-    
-    # Check if local away matches either API team
-    away_matches = team_name_matches(local_away, api_home) or team_name_matches(local_away, api_away)
-    
-    # Return true if at least one team matches
-    return home_matches or away_matches
+    positions = set(index.lookup(local_home))
+    positions.update(index.lookup(local_away))
+    local_bucket = kickoff_bucket(local_kickoff)
+    return [p for p in sorted(positions) if kickoffs_compatible(local_bucket, api_kickoffs[p])]
 
 
 def auto_map_events(dry_run=False):
@@ -272,6 +259,12 @@ def auto_map_events(dry_run=False):
     matched_events = []
     no_match_count = 0
     
+    # Index API matches once; each local event then only checks plausible candidates
+    match_started = time.perf_counter()
+    api_index = build_api_match_index(api_matches)
+    api_kickoffs = [kickoff_bucket(m.get('kick_off') or m.get('kickOff'))
+                    for m in api_matches]
+    
     for local_event in local_events:
         # Try 'id' first, fallback to 'eventId'
         local_id = local_event.get('id') or local_event.get('eventId')
@@ -303,57 +296,54 @@ def auto_map_events(dry_run=False):
             continue
         
         found_match = False
-        # Try to find matching API event
-        for api_match in api_matches:
-            api_home = api_match.get('home_team') or api_match.get('homeTeam')
-            api_away = api_match.get('away_team') or api_match.get('awayTeam')
-            
-            if not api_home or not api_away:
-                continue
-            
-            if match_teams(local_home, local_away, api_home, api_away):
-                ids = extract_ids(api_match)
+        # Try to find matching API event among the indexed candidates
+        for position in find_api_match_candidates(api_index, api_kickoffs, local_home, local_away,
+                                                  local_event.get('startDate')):
+            api_match = api_matches[position]
+            ids = extract_ids(api_match)
+            if ids['betfair_id']:
+                # Get match details
+                competition = local_event.get('competition', 'Unknown')
+                start_date = local_event.get('startDate', '')
                 
-                if ids['betfair_id']:
-                    # Get match details
-                    competition = local_event.get('competition', 'Unknown')
-                    start_date = local_event.get('startDate', '')
-                    
-                    # Preserve existing description if updating a TODO
-                    if local_id in mappings['events'] and 'description' in mappings['events'][local_id]:
-                        mapping_entry = mappings['events'][local_id]
-                        mapping_entry['betfair_id'] = str(ids['betfair_id'])
-                    else:
-                        mapping_entry = {
-                            "betfair_id": str(ids['betfair_id']),
-                            "description": f"{local_home} vs {local_away} - {competition} - {start_date}"
-                        }
-                    
-                    # Add optional fields
-                    if ids['oddsmatcha_id']:
-                        mapping_entry['oddsmatcha_id'] = str(ids['oddsmatcha_id'])
-                    if ids['smarkets_id']:
-                        mapping_entry['smarkets_id'] = str(ids['smarkets_id'])
-                    
-                    mappings['events'][local_id] = mapping_entry
-                    matched_events.append({
-                        'kwiff_id': local_id,
-                        'betfair_id': ids['betfair_id'],
-                        'oddsmatcha_id': ids['oddsmatcha_id'],
-                        'smarkets_id': ids['smarkets_id'],
-                        'home': local_home,
-                        'away': local_away,
-                        'competition': competition
-                    })
-                    new_mappings += 1
-                    found_match = True
-                    break
+                # Preserve existing description if updating a TODO
+                if local_id in mappings['events'] and 'description' in mappings['events'][local_id]:
+                    mapping_entry = mappings['events'][local_id]
+                    mapping_entry['betfair_id'] = str(ids['betfair_id'])
+                else:
+                    mapping_entry = {
+                        "betfair_id": str(ids['betfair_id']),
+                        "description": f"{local_home} vs {local_away} - {competition} - {start_date}"
+                    }
+                
+                # Add optional fields
+                if ids['oddsmatcha_id']:
+                    mapping_entry['oddsmatcha_id'] = str(ids['oddsmatcha_id'])
+                if ids['smarkets_id']:
+                    mapping_entry['smarkets_id'] = str(ids['smarkets_id'])
+                
+                mappings['events'][local_id] = mapping_entry
+                matched_events.append({
+                    'kwiff_id': local_id,
+                    'betfair_id': ids['betfair_id'],
+                    'oddsmatcha_id': ids['oddsmatcha_id'],
+                    'smarkets_id': ids['smarkets_id'],
+                    'home': local_home,
+                    'away': local_away,
+                    'competition': competition
+                })
+                new_mappings += 1
+                found_match = True
+                break
         
         if not found_match:
             no_match_count += 1
     
+    match_ms = (time.perf_counter() - match_started) * 1000
+    
     # Display results
     print(f"\n[*] RESULTS:")
+    print(f"  Matched {len(local_events)} local events against {len(api_matches)} API matches in {match_ms:.1f}ms")
     print(f"  New mappings found: {new_mappings}")
     print(f"  Events without matches: {no_match_count}")
     
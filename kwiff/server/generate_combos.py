@@ -9,10 +9,18 @@ import os
 import sys
 import argparse
 import time
-import requests
 from datetime import datetime
+from pathlib import Path
 from betfair import Betfair
 
+# Shared modules at the repo root (appended, so this directory's own betfair.py
+# still takes precedence over the root one)
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+from exchange_odds import get_snapshot, exchange_odds_view
+
 # Load event mappings
 def load_event_mappings():
     """Load Kwiff to Betfair/OddsMatcha event mappings from config file."""
@@ -77,54 +85,93 @@ def flip_name_format(name: str) -> str:
     return ' '.join(parts[1:]) + ' ' + parts[0]
 
 
-def find_best_name_match(kwiff_name: str, betfair_map: dict) -> tuple:
+def unflip_name_format(name: str) -> str:
+    """Convert 'Firstname Surname' to 'Surname Firstname' (inverse of flip_name_format)."""
+    parts = name.split()
+    if len(parts) < 2:
+        return name
+    return parts[-1] + ' ' + ' '.join(parts[:-1])
+
+
+class NameIndex:
     """
-    Find the best match for a Kwiff player name in the Betfair map.
-    Returns (matched_key, match_type) or (None, None) if no match found.
+    Lookup index over the normalized player keys of one event's Betfair map.
     
-    Tries multiple strategies:
-    1. Exact match (normalized)
-    2. Flipped name (Surname Firstname <-> Firstname Surname)
-    3. Partial match (at least 2 name parts match)
+    Built once per event so each Kwiff player costs a couple of dict lookups
+    plus a scan of only the keys that share a name part with it:
+    - exact: the normalized keys themselves
+    - flipped: 'Surname Firstname' form of each key -> key
+    - tokens: name part -> keys containing it, in map order
     """
-    kwiff_normalized = normalize_name(kwiff_name)
-    kwiff_parts = set(kwiff_normalized.split())
     
-    # Strategy 1: Exact match
-    if kwiff_normalized in betfair_map:
-        return (kwiff_normalized, "exact")
+    def __init__(self, betfair_map: dict):
+        self.exact = set()
+        self.flipped = {}
+        self.tokens = {}
+        self.order = {}
+        for position, bf_key in enumerate(betfair_map):
+            self.exact.add(bf_key)
+            self.flipped.setdefault(unflip_name_format(bf_key), bf_key)
+            self.order[bf_key] = position
+            for token in set(bf_key.split()):
+                self.tokens.setdefault(token, []).append(bf_key)
     
-    # Strategy 2: Flipped name
-    flipped = flip_name_format(kwiff_name)
-    flipped_normalized = normalize_name(flipped)
-    if flipped_normalized in betfair_map:
-        return (flipped_normalized, "flipped")
-    
-    # Strategy 3: Partial match (at least 2 name parts match)
-    if len(kwiff_parts) >= 2:
-        best_match = None
-        best_match_count = 0
+    def match(self, kwiff_name: str) -> tuple:
+        """Same contract and strategies as find_best_name_match."""
+        kwiff_normalized = normalize_name(kwiff_name)
+        
+        # Strategy 1: Exact match
+        if kwiff_normalized in self.exact:
+            return (kwiff_normalized, "exact")
         
-        for bf_key in betfair_map.keys():
-            bf_parts = set(bf_key.split())
-            common_parts = kwiff_parts & bf_parts
+        # Strategy 2: Flipped name
+        bf_key = self.flipped.get(kwiff_normalized)
+        if bf_key is not None:
+            return (bf_key, "flipped")
+        
+        # Strategy 3: Partial match (at least 2 name parts match), only over
+        # keys sharing a name part; ties go to the earliest key in the map
+        kwiff_parts = set(kwiff_normalized.split())
+        if len(kwiff_parts) >= 2:
+            common_counts = {}
+            for token in kwiff_parts:
+                for candidate in self.tokens.get(token, ()):
+                    common_counts[candidate] = common_counts.get(candidate, 0) + 1
             
-            # Require at least 2 matching parts
-            if len(common_parts) >= 2:
-                if len(common_parts) > best_match_count:
-                    best_match = bf_key
-                    best_match_count = len(common_parts)
+            if common_counts:
+                best_match = max(common_counts, key=lambda k: (common_counts[k], -self.order[k]))
+                best_match_count = common_counts[best_match]
+                if best_match_count >= 2:
+                    return (best_match, f"partial_{best_match_count}_parts")
         
-        if best_match:
-            return (best_match, f"partial_{best_match_count}_parts")
+        return (None, None)
+
+
+def find_best_name_match(kwiff_name: str, betfair_map) -> tuple:
+    """
+    Find the best match for a Kwiff player name in the Betfair map.
+    Returns (matched_key, match_type) or (None, None) if no match found.
+    
+    Tries multiple strategies:
+    1. Exact match (normalized)
+    2. Flipped name (Surname Firstname <-> Firstname Surname)
+    3. Partial match (at least 2 name parts match)
     
-    return (None, None)
+    Pass a NameIndex when matching many players against the same map; a
+    plain dict is indexed on every call.
+    """
+    if not isinstance(betfair_map, NameIndex):
+        betfair_map = NameIndex(betfair_map)
+    return betfair_map.match(kwiff_name)
 
 
 def fetch_exchange_odds(oddsmatcha_match_id):
     """
     Fetch Smarkets lay odds from OddsMatcha API.
     
+    Uses the snapshot shared with virgin_goose (exchange_odds.py), so a
+    match is fetched once per TTL across both processes.
+    
     Args:
         oddsmatcha_match_id: OddsMatcha match ID (different from Betfair ID)
     
@@ -139,63 +186,10 @@ def fetch_exchange_odds(oddsmatcha_match_id):
         }
     """
     try:
-        url = f"https://api.oddsmatcha.uk/matches/{oddsmatcha_match_id}/markets/"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Only keep fresh odds (< 5 minutes old)
-        FRESHNESS_THRESHOLD = 300  # 5 minutes in seconds
-        current_time = time.time()
-        
-        result = {}
-        
-        for market in data:
-            market_name = market.get('name', '')
-            
-            # Map OddsMatcha market names to our format (we only use Anytime Goalscorer)
-            if 'Anytime Goalscorer' in market_name or 'Anytime Goal Scorer' in market_name:
-                market_key = 'Anytime Goalscorer'
-            else:
-                continue
-            
-            if market_key not in result:
-                result[market_key] = {}
-            
-            runners = market.get('runners', [])
-            for runner in runners:
-                player_name = runner.get('name', '')
-                if not player_name:
-                    continue
-                
-                if player_name not in result[market_key]:
-                    result[market_key][player_name] = []
-                
-                # Process each site's odds
-                for site_name, site_data in runner.items():
-                    if site_name in ['name', 'id']:
-                        continue
-                    
-                    if not isinstance(site_data, dict):
-                        continue
-                    
-                    # Only include Smarkets (ignore Betfair from OddsMatcha - we fetch that directly)
-                    if site_name.lower() != 'smarkets':
-                        continue
-                    
-                    lay_price = site_data.get('lay_price')
-                    last_updated = site_data.get('last_updated', 0)
-                    
-                    # Check freshness
-                    if lay_price and (current_time - last_updated) <= FRESHNESS_THRESHOLD:
-                        result[market_key][player_name].append({
-                            'site_name': 'Smarkets',
-                            'lay_odds': float(lay_price)
-                        })
-        
-        return result
-        
-    except Exception as e:
+        markets = get_snapshot(oddsmatcha_match_id)
+        return exchange_odds_view(markets, prefer_websocket=False, sites={'smarkets'},
+                                  market_names=('Anytime Goalscorer',))
+    except Exception:
         # Silent fallback - return empty dict
         return {}
 
@@ -294,239 +288,274 @@ def load_all_events_for_today():
     return []
 
 
-def main():
-    # Acquire lock before proceeding
-    acquire_lock()
+def get_source_mtime():
+    """Latest modification time of the inputs generate_combos() reads (today's events file, mappings)."""
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    paths = [
+        os.path.join(data_dir, f"events_{datetime.now().strftime('%Y%m%d')}.json"),
+        os.path.join(os.path.dirname(__file__), 'event_mappings.json'),
+    ]
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+def generate_combos(min_size: float = DEFAULT_MIN_SIZE, bf=None) -> dict:
+    """
+    Build the combos response for all of today's events.
     
-    try:
-        # Parse command line arguments
-        parser = argparse.ArgumentParser(description="Generate combo JSON for all events from today's batch")
-        parser.add_argument('--min-size', type=float, default=DEFAULT_MIN_SIZE,
-                            help=f'Minimum lay size in GBP (default: {DEFAULT_MIN_SIZE})')
-        args = parser.parse_args()
-        
-        min_size = args.min_size
-        
-        # Load all events from today's batch file
-        all_events = load_all_events_for_today()
-        
-        if not all_events:
-            print(json.dumps({"error": f"No events file found for today"}))
-            return
-        
-        # Initialize Betfair client
+    Args:
+        min_size: Minimum lay size in GBP
+        bf: Betfair client to reuse (a new one is created if None)
+    
+    Returns:
+        Response dict ({'events': [...], 'summary': {...}}) or {'error': ...}
+    """
+    # Load all events from today's batch file
+    all_events = load_all_events_for_today()
+    
+    if not all_events:
+        return {"error": f"No events file found for today"}
+    
+    # Re-read mappings so long-running callers pick up new events
+    event_mappings = load_event_mappings()
+    
+    # Initialize Betfair client
+    if bf is None:
         try:
             bf = Betfair()
         except Exception as e:
-            print(json.dumps({"error": f"Failed to initialize Betfair client: {str(e)}"}))
-            return
+            return {"error": f"Failed to initialize Betfair client: {str(e)}"}
+    
+    # Process all events
+    all_events_data = []
+    log_entries = []
+    match_seconds = 0.0
+    players_checked = 0
+    
+    for kwiff_event in all_events:
+        kwiff_event_id = str(kwiff_event.get('eventId'))
+        event_mapping = event_mappings.get(kwiff_event_id, {})
+        betfair_event_id = event_mapping.get('betfair_id')
+        oddsmatcha_match_id = event_mapping.get('oddsmatcha_id')
         
-        # Process all events
-        all_events_data = []
-        log_entries = []
+        home_team = kwiff_event.get('homeTeam', 'Unknown')
+        away_team = kwiff_event.get('awayTeam', 'Unknown')
+        start_date = kwiff_event.get('startDate')
         
-        for kwiff_event in all_events:
-            kwiff_event_id = str(kwiff_event.get('eventId'))
-            event_mapping = EVENT_MAPPINGS.get(kwiff_event_id, {})
-            betfair_event_id = event_mapping.get('betfair_id')
-            oddsmatcha_match_id = event_mapping.get('oddsmatcha_id')
-            
-            home_team = kwiff_event.get('homeTeam', 'Unknown')
-            away_team = kwiff_event.get('awayTeam', 'Unknown')
-            start_date = kwiff_event.get('startDate')
-            
-            if not betfair_event_id:
-                log_entries.append({
-                    "event_id": kwiff_event_id,
-                    "fixture": f"{home_team} vs {away_team}",
-                    "reason": "NO_BETFAIR_MAPPING",
-                    "details": "Event ID not found in event_mappings.json"
-                })
-                continue
-            
-            # Check if match is within 90 minutes of kickoff
-            if start_date:
-                try:
-                    ko_time = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    now = datetime.now(ko_time.tzinfo)
-                    time_to_ko = (ko_time - now).total_seconds() / 60  # minutes
-                    
-                    if time_to_ko > 90:  # More than 90 minutes to KO
-                        log_entries.append({
-                            "event_id": kwiff_event_id,
-                            "fixture": f"{home_team} vs {away_team}",
-                            "betfair_id": betfair_event_id,
-                            "reason": "TOO_FAR_FROM_KO",
-                            "details": f"Match starts in {time_to_ko:.0f} minutes (> 90 min threshold)"
-                        })
-                        continue
-                except Exception as e:
-                    # If we can't parse the time, log but continue processing
-                    pass
-            
-            kwiff_players = kwiff_event.get('players', [])
-            over_half_goals_id = kwiff_event.get('overHalfGoalsId')
-            
-            # Fetch Betfair odds
+        if not betfair_event_id:
+            log_entries.append({
+                "event_id": kwiff_event_id,
+                "fixture": f"{home_team} vs {away_team}",
+                "reason": "NO_BETFAIR_MAPPING",
+                "details": "Event ID not found in event_mappings.json"
+            })
+            continue
+        
+        # Check if match is within 90 minutes of kickoff
+        if start_date:
             try:
-                betfair_odds = bf.fetch_odds_for_match(betfair_event_id)
+                ko_time = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+                now = datetime.now(ko_time.tzinfo)
+                time_to_ko = (ko_time - now).total_seconds() / 60  # minutes
+                
+                if time_to_ko > 90:  # More than 90 minutes to KO
+                    log_entries.append({
+                        "event_id": kwiff_event_id,
+                        "fixture": f"{home_team} vs {away_team}",
+                        "betfair_id": betfair_event_id,
+                        "reason": "TOO_FAR_FROM_KO",
+                        "details": f"Match starts in {time_to_ko:.0f} minutes (> 90 min threshold)"
+                    })
+                    continue
             except Exception as e:
+                # If we can't parse the time, log but continue processing
+                pass
+        
+        kwiff_players = kwiff_event.get('players', [])
+        over_half_goals_id = kwiff_event.get('overHalfGoalsId')
+        
+        # Fetch Betfair odds
+        try:
+            betfair_odds = bf.fetch_odds_for_match(betfair_event_id)
+        except Exception as e:
+            log_entries.append({
+                "event_id": kwiff_event_id,
+                "fixture": f"{home_team} vs {away_team}",
+                "betfair_id": betfair_event_id,
+                "reason": "BETFAIR_API_ERROR",
+                "details": str(e)
+            })
+            continue
+        
+        # Fetch exchange odds from OddsMatcha (Smarkets/Matchbook)
+        exchange_odds = {}
+        if oddsmatcha_match_id:
+            exchange_odds = fetch_exchange_odds(oddsmatcha_match_id)
+            if exchange_odds:
+                total_exchange_players = sum(len(players) for players in exchange_odds.values())
                 log_entries.append({
                     "event_id": kwiff_event_id,
                     "fixture": f"{home_team} vs {away_team}",
-                    "betfair_id": betfair_event_id,
-                    "reason": "BETFAIR_API_ERROR",
-                    "details": str(e)
+                    "reason": "EXCHANGE_ODDS_FETCHED",
+                    "exchange_players": total_exchange_players
                 })
-                continue
-            
-            # Fetch exchange odds from OddsMatcha (Smarkets/Matchbook)
-            exchange_odds = {}
-            if oddsmatcha_match_id:
-                exchange_odds = fetch_exchange_odds(oddsmatcha_match_id)
-                if exchange_odds:
-                    total_exchange_players = sum(len(players) for players in exchange_odds.values())
-                    log_entries.append({
-                        "event_id": kwiff_event_id,
-                        "fixture": f"{home_team} vs {away_team}",
-                        "reason": "EXCHANGE_ODDS_FETCHED",
-                        "exchange_players": total_exchange_players
-                    })
+        
+        # Combine Betfair and exchange odds
+        combined_odds_map = combine_betfair_and_exchange_odds(betfair_odds, exchange_odds)
+        
+        # Create map by normalized name for matching
+        player_odds_lookup = {}
+        for player_name, exchange_list in combined_odds_map.items():
+            normalized = normalize_name(flip_name_format(player_name))
+            player_odds_lookup[normalized] = (player_name, exchange_list)
+        
+        match_started = time.perf_counter()
+        name_index = NameIndex(player_odds_lookup)
+        match_seconds += time.perf_counter() - match_started
+        
+        # Build combos array for this event
+        combos = []
+        players_skipped = []
+        
+        for kwiff_player in kwiff_players:
+            kwiff_name = kwiff_player.get('name', '')
+            scorer_id = kwiff_player.get('scorerId')
+            sot_id = kwiff_player.get('SoTId')
             
-            # Combine Betfair and exchange odds
-            combined_odds_map = combine_betfair_and_exchange_odds(betfair_odds, exchange_odds)
+            # Determine id_two: use overHalfGoalsId if available, otherwise use SoTId
+            id_two = over_half_goals_id if over_half_goals_id else sot_id
             
-            # Create map by normalized name for matching
-            player_odds_lookup = {}
-            for player_name, exchange_list in combined_odds_map.items():
-                normalized = normalize_name(flip_name_format(player_name))
-                player_odds_lookup[normalized] = (player_name, exchange_list)
+            # Try to find in combined odds data using smart matching
+            matched = False
+            skip_reason = None
+            match_type = None
             
-            # Build combos array for this event
-            combos = []
-            players_skipped = []
+            match_started = time.perf_counter()
+            matched_key, match_type = name_index.match(kwiff_name)
+            match_seconds += time.perf_counter() - match_started
+            players_checked += 1
             
-            for kwiff_player in kwiff_players:
-                kwiff_name = kwiff_player.get('name', '')
-                kwiff_normalized = normalize_name(kwiff_name)
-                scorer_id = kwiff_player.get('scorerId')
-                sot_id = kwiff_player.get('SoTId')
-                
-                # Determine id_two: use overHalfGoalsId if available, otherwise use SoTId
-                id_two = over_half_goals_id if over_half_goals_id else sot_id
+            if matched_key:
+                player_name, exchange_list = player_odds_lookup[matched_key]
                 
-                # Try to find in combined odds data using smart matching
-                matched = False
-                skip_reason = None
-                match_type = None
+                # Find best (lowest) lay odds across all exchanges
+                best_exchange = min(exchange_list, key=lambda x: x['lay_odds'])
+                best_odds = best_exchange['lay_odds']
+                best_site = best_exchange['site']
+                has_size = best_exchange['has_size']
+                lay_size = best_exchange['lay_size']
                 
-                matched_key, match_type = find_best_name_match(kwiff_name, player_odds_lookup)
+                # Build display text with all available exchanges (without liquidity)
+                all_exchanges_text = []
+                for ex in exchange_list:
+                    all_exchanges_text.append(f"{ex['site']} @ {ex['lay_odds']}")
+                lay_prices_display = " | ".join(all_exchanges_text)
                 
-                if matched_key:
-                    player_name, exchange_list = player_odds_lookup[matched_key]
-                    
-                    # Find best (lowest) lay odds across all exchanges
-                    best_exchange = min(exchange_list, key=lambda x: x['lay_odds'])
-                    best_odds = best_exchange['lay_odds']
-                    best_site = best_exchange['site']
-                    has_size = best_exchange['has_size']
-                    lay_size = best_exchange['lay_size']
-                    
-                    # Build display text with all available exchanges (without liquidity)
-                    all_exchanges_text = []
-                    for ex in exchange_list:
-                        all_exchanges_text.append(f"{ex['site']} @ {ex['lay_odds']}")
-                    lay_prices_display = " | ".join(all_exchanges_text)
-                    
-                    # Check if size meets minimum threshold (only for Betfair, exchange odds have no size)
-                    if not has_size or (lay_size and lay_size >= min_size):
-                        combos.append({
-                            'name': kwiff_name,
-                            'id_one': scorer_id,
-                            'id_two': id_two,
-                            'lay_odds': best_odds,
-                            'lay_size': lay_size if has_size else None,
-                            'best_exchange': best_site,
-                            'all_exchanges': lay_prices_display
+                # Check if size meets minimum threshold (only for Betfair, exchange odds have no size)
+                if not has_size or (lay_size and lay_size >= min_size):
+                    combos.append({
+                        'name': kwiff_name,
+                        'id_one': scorer_id,
+                        'id_two': id_two,
+                        'lay_odds': best_odds,
+                        'lay_size': lay_size if has_size else None,
+                        'best_exchange': best_site,
+                        'all_exchanges': lay_prices_display
+                    })
+                    matched = True
+                    # Log successful match type in debug if needed
+                    if match_type and match_type != "exact":
+                        log_entries.append({
+                            "player": kwiff_name,
+                            "matched_as": matched_key,
+                            "match_type": match_type,
+                            "best_exchange": best_site
                         })
-                        matched = True
-                        # Log successful match type in debug if needed
-                        if match_type and match_type != "exact":
-                            log_entries.append({
-                                "player": kwiff_name,
-                                "matched_as": matched_key,
-                                "match_type": match_type,
-                                "best_exchange": best_site
-                            })
-                    else:
-                        skip_reason = f"SIZE_TOO_SMALL (£{lay_size:.2f} < £{min_size})"
                 else:
-                    skip_reason = "NO_EXCHANGE_MATCH"
-                
-                if not matched:
-                    players_skipped.append({
-                        "name": kwiff_name,
-                        "reason": skip_reason
-                    })
+                    skip_reason = f"SIZE_TOO_SMALL (£{lay_size:.2f} < £{min_size})"
+            else:
+                skip_reason = "NO_EXCHANGE_MATCH"
             
-            # Log skipped players if any
-            if players_skipped:
-                log_entries.append({
-                    "event_id": kwiff_event_id,
-                    "fixture": f"{home_team} vs {away_team}",
-                    "betfair_id": betfair_event_id,
-                    "reason": "PLAYERS_FILTERED",
-                    "players_total": len(kwiff_players),
-                    "players_matched": len(combos),
-                    "players_skipped": len(players_skipped),
-                    "skipped_details": players_skipped[:5]  # First 5 for brevity
+            if not matched:
+                players_skipped.append({
+                    "name": kwiff_name,
+                    "reason": skip_reason
                 })
-            
-            # Add this event's data to the collection
-            event_data = {
-                'combos': combos,
-                'metadata': {
-                    'fixture': {
-                        'event_id': kwiff_event.get('eventId'),
-                        'match_id': kwiff_event.get('matchId'),
-                        'home_team': kwiff_event.get('homeTeam'),
-                        'away_team': kwiff_event.get('awayTeam'),
-                        'start_date': kwiff_event.get('startDate'),
-                        'competition': kwiff_event.get('competition')
-                    },
-                    'kwiff_event_id': kwiff_event_id,
-                    'betfair_event_id': betfair_event_id,
-                    'min_size': min_size,
-                    'total_players': len(kwiff_players),
-                    'matched_players': len(combos)
-                }
-            }
-            all_events_data.append(event_data)
         
-        # Write log file
-        if log_entries:
-            log_dir = os.path.join(os.path.dirname(__file__), 'data', 'logs')
-            os.makedirs(log_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file = os.path.join(log_dir, f"{timestamp}_generation_log.json")
-            with open(log_file, 'w') as f:
-                json.dump({
-                    "timestamp": timestamp,
-                    "total_events_in_file": len(all_events),
-                    "events_processed": len(all_events_data),
-                    "events_skipped": len(all_events) - len(all_events_data),
-                    "min_size": min_size,
-                    "log_entries": log_entries
-                }, f, indent=2)
+        # Log skipped players if any
+        if players_skipped:
+            log_entries.append({
+                "event_id": kwiff_event_id,
+                "fixture": f"{home_team} vs {away_team}",
+                "betfair_id": betfair_event_id,
+                "reason": "PLAYERS_FILTERED",
+                "players_total": len(kwiff_players),
+                "players_matched": len(combos),
+                "players_skipped": len(players_skipped),
+                "skipped_details": players_skipped[:5]  # First 5 for brevity
+            })
         
-        # Create response with all events
-        response = {
-            'events': all_events_data,
-            'summary': {
-                'total_events': len(all_events_data),
-                'min_size': min_size
+        # Add this event's data to the collection
+        event_data = {
+            'combos': combos,
+            'metadata': {
+                'fixture': {
+                    'event_id': kwiff_event.get('eventId'),
+                    'match_id': kwiff_event.get('matchId'),
+                    'home_team': kwiff_event.get('homeTeam'),
+                    'away_team': kwiff_event.get('awayTeam'),
+                    'start_date': kwiff_event.get('startDate'),
+                    'competition': kwiff_event.get('competition')
+                },
+                'kwiff_event_id': kwiff_event_id,
+                'betfair_event_id': betfair_event_id,
+                'min_size': min_size,
+                'total_players': len(kwiff_players),
+                'matched_players': len(combos)
             }
         }
+        all_events_data.append(event_data)
+    
+    # Write log file
+    if log_entries:
+        log_dir = os.path.join(os.path.dirname(__file__), 'data', 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_file = os.path.join(log_dir, f"{timestamp}_generation_log.json")
+        with open(log_file, 'w') as f:
+            json.dump({
+                "timestamp": timestamp,
+                "total_events_in_file": len(all_events),
+                "events_processed": len(all_events_data),
+                "events_skipped": len(all_events) - len(all_events_data),
+                "min_size": min_size,
+                "log_entries": log_entries
+            }, f, indent=2)
+    
+    # Create response with all events
+    response = {
+        'events': all_events_data,
+        'summary': {
+            'total_events': len(all_events_data),
+            'min_size': min_size,
+            'players_checked': players_checked,
+            'match_time_ms': round(match_seconds * 1000, 2)
+        }
+    }
+    return response
+
+
+def main():
+    # Acquire lock before proceeding
+    acquire_lock()
+    
+    try:
+        # Parse command line arguments
+        parser = argparse.ArgumentParser(description="Generate combo JSON for all events from today's batch")
+        parser.add_argument('--min-size', type=float, default=DEFAULT_MIN_SIZE,
+                            help=f'Minimum lay size in GBP (default: {DEFAULT_MIN_SIZE})')
+        args = parser.parse_args()
+        
+        response = generate_combos(args.min_size)
         
         # Output as JSON
         print(json.dumps(response, indent=2))
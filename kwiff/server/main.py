@@ -3,11 +3,17 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
-import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from betfair import Betfair
+from generate_combos import generate_combos, get_source_mtime
+
 app = FastAPI()
 
 # Enable CORS
@@ -112,6 +118,80 @@ def read_root():
     return {"message": "FastAPI JSON Storage Server", "endpoint": "/submit (POST)"}
 
 
+# ========= COMBOS CACHE =========
+# Combos are generated in-process and cached per min_size. A fresh entry is served
+# as-is; a stale one (older than COMBOS_FRESH_SECONDS, or built before the events /
+# mappings files last changed) is served immediately while a background refresh
+# runs. Concurrent requests share one in-flight generation.
+COMBOS_FRESH_SECONDS = float(os.getenv("COMBOS_FRESH_SECONDS", "30"))
+COMBOS_TIMEOUT = 300  # seconds a caller without a cached result waits for generation
+
+_combos_lock = threading.Lock()
+_combos_cache = {}      # min_size -> {'data': dict, 'generated_at': float, 'source_mtime': float}
+_combos_inflight = {}   # min_size -> Future
+_combos_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="combos")    # one generation at a time
+_debug_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="combos-debug")
+_betfair_client = None
+
+
+def _get_betfair():
+    global _betfair_client
+    if _betfair_client is None:
+        _betfair_client = Betfair()
+    return _betfair_client
+
+
+def _write_debug_dump(combo_data):
+    try:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        debug_dir = os.path.join(script_dir, DATA_FOLDER, "debug")
+        Path(debug_dir).mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        debug_filepath = os.path.join(debug_dir, f"{timestamp}_combos_response.json")
+        with open(debug_filepath, 'w') as f:
+            json.dump(combo_data, f, indent=2)
+    except Exception as e:
+        print(f"Failed to write combos debug dump: {e}")
+
+
+def _generate(min_size):
+    started = time.time()
+    source_mtime = get_source_mtime()
+    try:
+        combo_data = generate_combos(min_size, bf=_get_betfair())
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if 'error' in combo_data:
+            print(f"[{timestamp}] Combo generation error: {combo_data['error']}")
+            return combo_data
+        total_combos = sum(len(event.get('combos', [])) for event in combo_data.get('events', []))
+        print(f"[{timestamp}] Generated {total_combos} combos across {len(combo_data.get('events', []))} events "
+              f"(min_size={min_size}) in {time.time() - started:.1f}s, "
+              f"name matching {combo_data.get('summary', {}).get('match_time_ms', 0):.1f}ms")
+        with _combos_lock:
+            _combos_cache[min_size] = {'data': combo_data, 'generated_at': time.time(), 'source_mtime': source_mtime}
+        _debug_pool.submit(_write_debug_dump, combo_data)
+        return combo_data
+    finally:
+        # Cleared only after the cache is updated, so no request can start a duplicate run
+        with _combos_lock:
+            _combos_inflight.pop(min_size, None)
+
+
+def _generation_future(min_size):
+    """Return the in-flight generation for min_size, starting one if none is running."""
+    with _combos_lock:
+        future = _combos_inflight.get(min_size)
+        if future is None:
+            future = _combos_pool.submit(_generate, min_size)
+            _combos_inflight[min_size] = future
+        return future
+
+
+def _is_fresh(entry):
+    return (time.time() - entry['generated_at'] < COMBOS_FRESH_SECONDS
+            and entry['source_mtime'] >= get_source_mtime())
+
+
 @app.get("/combos")
 def get_combos(min_size: float = 10.0):
     """
@@ -121,65 +201,26 @@ def get_combos(min_size: float = 10.0):
     - min_size: Minimum lay size in GBP (default: 10.0)
     
     Returns:
-    - JSON with all matched player combos grouped by event
+    - JSON with all matched player combos grouped by event (served from cache
+      when available; stale entries are refreshed in the background)
     """
     try:
-        # Get the directory of this file
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        generate_script = os.path.join(script_dir, "generate_combos.py")
-        
-        # Get the Python executable from the venv
-        if sys.platform == "win32":
-            python_exe = os.path.join(script_dir, ".venv", "Scripts", "python.exe")
-        else:
-            python_exe = os.path.join(script_dir, ".venv", "bin", "python")
+        with _combos_lock:
+            entry = _combos_cache.get(min_size)
+        if entry is not None:
+            if not _is_fresh(entry):
+                _generation_future(min_size)
+            return entry['data']
         
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"[{timestamp}] Running combo generation: min_size={min_size}")
+        return _generation_future(min_size).result(timeout=COMBOS_TIMEOUT)
         
-        # Run the generate_combos script with longer timeout (300 seconds = 5 minutes for API calls)
-        result = subprocess.run(
-            [python_exe, generate_script, "--min-size", str(min_size)],
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
-        
-        if result.returncode != 0:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] Script error: {result.stderr}")
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Script error: {result.stderr}"}
-            )
-        
-        # Parse and return the JSON output
-        combo_data = json.loads(result.stdout)
-        total_combos = sum(len(event.get('combos', [])) for event in combo_data.get('events', []))
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] Successfully generated {total_combos} combos across {len(combo_data.get('events', []))} events")
-        
-        # Debug: Save the response
-        debug_dir = os.path.join(script_dir, DATA_FOLDER, "debug")
-        Path(debug_dir).mkdir(exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        debug_filepath = os.path.join(debug_dir, f"{timestamp}_combos_response.json")
-        with open(debug_filepath, 'w') as f:
-            json.dump(combo_data, f, indent=2)
-        
-        return combo_data
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Invalid JSON from script: {str(e)}"}
-        )
-    except subprocess.TimeoutExpired:
-        print(f"Script timeout after 300 seconds")
+    except FutureTimeoutError:
+        print(f"Combo generation timeout after {COMBOS_TIMEOUT} seconds")
         return JSONResponse(
             status_code=504,
-            content={"error": "Script execution timeout - Betfair API calls may be slow"}
+            content={"error": "Combo generation timeout - Betfair API calls may be slow"}
         )
     except Exception as e:
         print(f"Unexpected error: {e}")
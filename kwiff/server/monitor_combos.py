@@ -9,13 +9,18 @@ import os
 import sys
 import argparse
 import time
-import hashlib
+import fnmatch
 import requests
 import random
 import subprocess
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
 # Discord webhook URL
 DISCORD_WEBHOOK_URL = "https://discord.com/api/webhooks/1447536804478717984/YPoFdLyu987B4Tp35Toa_WK6mH3bRPDKUTnFrQqcw0DBfT1bjdR5JUu2TakaU_wqyfoH"
 
@@ -24,28 +29,32 @@ DATA_FOLDER = os.path.join(os.path.dirname(__file__), 'data')
 STATE_FOLDER = os.path.join(os.path.dirname(__file__), 'state')
 os.makedirs(STATE_FOLDER, exist_ok=True)
 
-# Track processed files (hash -> timestamp)
-PROCESSED_FILES = {}
+# Combos already handled per combos file (filename -> set of combo keys), so a
+# rewritten file only has its new or changed combos processed
+PROCESSED_COMBOS = {}
 
-# Track sent players to avoid duplicates (player_name -> event_id)
-SENT_PLAYERS = {}
+# Track sent players to avoid duplicates ("{player_name}_{event_id}" keys)
+SENT_PLAYERS = set()
 
 # Track last sent GIF to avoid repeats
 LAST_GIF_SENT = None
 
-# Track events file hash for auto-mapping
-EVENTS_FILE_HASH = None
+# Track events file signature (mtime, size) for auto-mapping
+EVENTS_FILE_SIGNATURE = None
+
+# Polling interval when inotify is unavailable
+POLL_INTERVAL = 2.0
 
 
 def get_state_filepath():
     """Get today's state file path."""
     today = datetime.now().strftime("%Y%m%d")
-    return os.path.join(STATE_FOLDER, f"sent_players_{today}.json")
+    return os.path.join(STATE_FOLDER, f"sent_players_{today}.jsonl")
 
 
 def check_events_file_updated():
     """Check if events_{date}.json has been updated and run auto_map_events if needed."""
-    global EVENTS_FILE_HASH
+    global EVENTS_FILE_SIGNATURE
     
     today = datetime.now().strftime("%Y%m%d")
     events_file = os.path.join(DATA_FOLDER, f"events_{today}.json")
@@ -54,15 +63,15 @@ def check_events_file_updated():
         return
     
     try:
-        current_hash = get_file_hash(events_file)
+        current_signature = get_file_signature(events_file)
         
-        if EVENTS_FILE_HASH is None:
-            # First check - just store the hash
-            EVENTS_FILE_HASH = current_hash
-        elif EVENTS_FILE_HASH != current_hash:
+        if EVENTS_FILE_SIGNATURE is None:
+            # First check - just store the signature
+            EVENTS_FILE_SIGNATURE = current_signature
+        elif EVENTS_FILE_SIGNATURE != current_signature:
             # File has changed - run auto_map_events
             print(f"\n🔄 events_{today}.json was updated - running auto_map_events.py...")
-            EVENTS_FILE_HASH = current_hash
+            EVENTS_FILE_SIGNATURE = current_signature
             
             try:
                 script_path = os.path.join(os.path.dirname(__file__), 'auto_map_events.py')
@@ -92,38 +101,109 @@ def check_events_file_updated():
 
 
 def load_sent_players():
-    """Load sent players from today's state file."""
+    """Load sent players from today's state log (plus a legacy .json state file if present)."""
     global SENT_PLAYERS
+    SENT_PLAYERS = set()
     filepath = get_state_filepath()
-    if os.path.exists(filepath):
-        try:
+    legacy_filepath = filepath[:-len('.jsonl')] + '.json'
+    try:
+        if os.path.exists(legacy_filepath):
+            with open(legacy_filepath, 'r', encoding='utf-8') as f:
+                SENT_PLAYERS.update(json.load(f).keys())
+        if os.path.exists(filepath):
             with open(filepath, 'r', encoding='utf-8') as f:
-                SENT_PLAYERS = json.load(f)
-                print(f"Loaded {len(SENT_PLAYERS)} sent players from state file")
-        except Exception as e:
-            print(f"Error loading state file: {e}")
-            SENT_PLAYERS = {}
-    else:
-        SENT_PLAYERS = {}
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        SENT_PLAYERS.add(json.loads(line)['key'])
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue  # torn line from an interrupted write
+        if SENT_PLAYERS:
+            print(f"Loaded {len(SENT_PLAYERS)} sent players from state file")
+    except Exception as e:
+        print(f"Error loading state file: {e}")
 
 
-def save_sent_players():
-    """Save sent players to today's state file."""
-    filepath = get_state_filepath()
+def save_sent_player(player_key):
+    """Record one sent player: add to the in-memory set and append it to today's state log."""
+    SENT_PLAYERS.add(player_key)
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(SENT_PLAYERS, f, indent=2, ensure_ascii=False)
+        with open(get_state_filepath(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': player_key, 'sent_at': datetime.now().isoformat()}, ensure_ascii=False) + '\n')
     except Exception as e:
         print(f"Error saving state file: {e}")
 
 
-def get_file_hash(filepath):
-    """Get SHA256 hash of file contents."""
-    sha256_hash = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+def get_file_signature(filepath):
+    """Cheap change detection: (mtime_ns, size) from a single stat call."""
+    st = os.stat(filepath)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def combo_key(combo, metadata):
+    """Identity of a combo within a file; odds are included so a price change counts as new."""
+    event_id = metadata.get('fixture', {}).get('event_id', 'unknown')
+    return (str(event_id), combo.get('name'), combo.get('lay_odds'), combo.get('kwiff_odds'))
+
+
+class FolderWatcher:
+    """Report new or changed files matching `patterns` in a folder.
+
+    Uses inotify (inotify_simple) when available, so waiting costs no CPU and
+    changes are seen within milliseconds; otherwise falls back to polling
+    os.stat signatures every POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, path, patterns, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.patterns = patterns
+        self.poll_interval = poll_interval
+        self.signatures = {}
+        self.inotify = None
+        if INotify is not None:
+            try:
+                self.inotify = INotify()
+                self.inotify.add_watch(path, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+            except OSError as e:
+                print(f"[!] inotify unavailable ({e}), falling back to polling")
+                self.inotify = None
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify else f"polling every {self.poll_interval:g}s"
+
+    def _matches(self, name):
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+    def _changed(self, names):
+        changed = []
+        for name in sorted(set(names)):
+            try:
+                signature = get_file_signature(os.path.join(self.path, name))
+            except OSError:
+                continue
+            if self.signatures.get(name) != signature:
+                self.signatures[name] = signature
+                changed.append(name)
+        return changed
+
+    def scan(self):
+        """Check every matching file (used at startup and by the polling fallback)."""
+        try:
+            names = [n for n in os.listdir(self.path) if self._matches(n)]
+        except OSError:
+            return []
+        return self._changed(names)
+
+    def wait(self, timeout=None):
+        """Block until matching files change; returns the changed file names."""
+        if self.inotify is None:
+            time.sleep(self.poll_interval)
+            return self.scan()
+        events = self.inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+        return self._changed(e.name for e in events if e.name and self._matches(e.name))
 
 
 def get_random_gif():
@@ -252,9 +332,8 @@ def send_discord_embed(combo, metadata, include_gifs=False):
             response = requests.post(DISCORD_WEBHOOK_URL, json=payload, timeout=10)
         
         if response.status_code in (200, 204):
-            # Mark player as sent
-            SENT_PLAYERS[player_key] = datetime.now().isoformat()
-            save_sent_players()  # Persist to file
+            # Mark player as sent (persisted incrementally)
+            save_sent_player(player_key)
             return True
         else:
             print(f"  ✗ Discord error: {response.status_code}")
@@ -264,14 +343,28 @@ def send_discord_embed(combo, metadata, include_gifs=False):
         return False
 
 
-def process_combos_file(filepath, test_mode=False, include_gifs=False):
+def process_combos_file(filepath, test_mode=False, include_gifs=False, only_new=False):
     """Process a combos JSON file (supports both single-event and multi-event formats).
     If test_mode=True, sends one test message regardless of filter.
+    If only_new=True, combos already handled in an earlier version of this file are skipped.
+    A combo counts as handled once it was sent or deliberately filtered out; combos whose
+    Discord post failed are tried again the next time the file changes.
     """
+    filename = os.path.basename(filepath)
+    current = None
+    unsent = set()  # keys of combos picked for sending that were not (yet) sent
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
+        # Skip the combos handled in the previous version of this file
+        previous = PROCESSED_COMBOS.get(filename, set()) if only_new else set()
+        event_list = data.get('events', []) if 'events' in data else [data]
+        current = {
+            combo_key(combo, event.get('metadata', {}))
+            for event in event_list for combo in event.get('combos', [])
+        }
+        
         # Handle multi-event format: { "events": [...], "summary": {...} }
         if 'events' in data:
             events = data.get('events', [])
@@ -285,8 +378,8 @@ def process_combos_file(filepath, test_mode=False, include_gifs=False):
             
             # Process each event
             for event in events:
-                combos = event.get('combos', [])
                 metadata = event.get('metadata', {})
+                combos = [c for c in event.get('combos', []) if combo_key(c, metadata) not in previous]
                 
                 if not combos:
                     continue
@@ -333,9 +426,11 @@ def process_combos_file(filepath, test_mode=False, include_gifs=False):
                     print(f"  [TEST MODE] Sending first combo regardless of filter")
                 
                 # Send a separate message for each combo
+                unsent.update(combo_key(c, metadata) for c in combos_to_send)
                 for i, combo in enumerate(combos_to_send, 1):
                     if send_discord_embed(combo, metadata, include_gifs=include_gifs):
                         success_count += 1
+                        unsent.discard(combo_key(combo, metadata))
                     # Small delay between messages to avoid rate limiting
                     if i < len(combos_to_send) or event != events[-1]:
                         time.sleep(0.5)
@@ -350,11 +445,11 @@ def process_combos_file(filepath, test_mode=False, include_gifs=False):
         
         # Handle legacy single-event format: { "combos": [...], "metadata": {...} }
         else:
-            combos = data.get('combos', [])
             metadata = data.get('metadata', {})
+            combos = [c for c in data.get('combos', []) if combo_key(c, metadata) not in previous]
             
             if not combos:
-                print(f"  No combos found in file")
+                print(f"  No {'new ' if previous else ''}combos found in file")
                 return False
             
             # Check if event is in the past
@@ -396,9 +491,11 @@ def process_combos_file(filepath, test_mode=False, include_gifs=False):
             
             # Send a separate message for each filtered combo
             success_count = 0
+            unsent.update(combo_key(c, metadata) for c in filtered_combos)
             for i, combo in enumerate(filtered_combos, 1):
                 if send_discord_embed(combo, metadata):
                     success_count += 1
+                    unsent.discard(combo_key(combo, metadata))
                 # Small delay between messages to avoid rate limiting
                 if i < len(filtered_combos):
                     time.sleep(0.5)
@@ -412,72 +509,56 @@ def process_combos_file(filepath, test_mode=False, include_gifs=False):
     except Exception as e:
         print(f"  Error processing file: {e}")
         return False
+    finally:
+        if current is not None:
+            PROCESSED_COMBOS[filename] = current - unsent
 
 
 def monitor_folder(watch_path=None, test_mode=False, include_gifs=False):
-    """Monitor the data folder for new/changed {eventid}_combos.json files."""
+    """Watch the data folder and process new/changed combos_*.json files as they are written."""
     if watch_path is None:
         watch_path = DATA_FOLDER
     
     print(f"Monitoring folder: {watch_path}")
     print(f"Looking for: combos_*.json files")
+    
     if test_mode:
         print(f"[TEST MODE] Test messages will bypass filter")
         print(f"[TEST MODE] Will process files once and exit")
-    else:
-        print(f"Checking every 5 seconds...")
-        print(f"Press Ctrl+C to stop\n")
+        combos_files = sorted(Path(watch_path).glob('combos_*.json'))
+        if not combos_files:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No combos files found in {watch_path}")
+            return
+        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Processing: {combos_files[0].name}")
+        process_combos_file(str(combos_files[0]), test_mode=True, include_gifs=include_gifs)
+        print("\n[TEST MODE] Test complete. Exiting.")
+        return
+    
+    watcher = FolderWatcher(watch_path, ('combos_*.json', 'events_*.json'))
+    print(f"Watching with {watcher.mode}...")
+    print(f"Press Ctrl+C to stop\n")
     
-    test_mode_processed = False
+    # Existing files count as new on startup (the events file only records its signature)
+    check_events_file_updated()
+    changed = watcher.scan()
     
     while True:
         try:
-            # Check if events file was updated and run auto-mapping if needed
-            check_events_file_updated()
-            
-            # Find all combos_*.json files
-            combos_files = sorted(Path(watch_path).glob('combos_*.json'))
-            
-            if not combos_files:
-                if test_mode and not test_mode_processed:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No combos files found in {watch_path}")
-                    test_mode_processed = True
-            
-            for filepath in combos_files:
-                filename = filepath.name
-                filepath_str = str(filepath)
+            for filename in changed:
+                if filename.startswith('events_'):
+                    # Run auto-mapping if today's events file was updated
+                    check_events_file_updated()
+                    continue
                 
-                # Get current file hash
+                filepath = os.path.join(watch_path, filename)
                 try:
-                    current_hash = get_file_hash(filepath_str)
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
+                    lag_ms = (time.time() - os.path.getmtime(filepath)) * 1000
+                except OSError:
                     continue
-                
-                # Check if file is new or changed (force processing in test mode once)
-                if test_mode:
-                    if not test_mode_processed:
-                        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Processing: {filename}")
-                        process_combos_file(filepath_str, test_mode=test_mode, include_gifs=include_gifs)
-                        test_mode_processed = True
-                        print("\n[TEST MODE] Test complete. Exiting.")
-                        return
-                else:
-                    if filename not in PROCESSED_FILES or PROCESSED_FILES[filename] != current_hash:
-                        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Processing: {filename}")
-                        
-                        # Process the file
-                        if process_combos_file(filepath_str, test_mode=test_mode, include_gifs=include_gifs):
-                            PROCESSED_FILES[filename] = current_hash
-                        else:
-                            # Still track the hash even if processing failed
-                            PROCESSED_FILES[filename] = current_hash
+                print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Processing: {filename} (written {lag_ms:.0f}ms ago)")
+                process_combos_file(filepath, include_gifs=include_gifs, only_new=True)
             
-            # Check every 5 seconds (skip in test mode)
-            if not test_mode:
-                time.sleep(5)
-            else:
-                time.sleep(1)  # Brief pause before checking again in test mode
+            changed = watcher.wait(timeout=60)
         
         except KeyboardInterrupt:
             print("\n\nMonitoring stopped.")
@@ -485,6 +566,7 @@ def monitor_folder(watch_path=None, test_mode=False, include_gifs=False):
         except Exception as e:
             print(f"Error in monitor loop: {e}")
             time.sleep(5)
+            changed = watcher.scan()
 
 
 def main():
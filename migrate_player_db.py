@@ -7,7 +7,7 @@ import os
 import sys
 import json
 from pathlib import Path
-from player_db import PlayerDatabase
+from player_db import PlayerDatabase, TRACKING_RETENTION_DAYS
 
 
 def backup_json_files():
@@ -135,10 +135,33 @@ def show_stats():
     print(f"\nPlayer Mappings:    {stats['player_mappings']:>6} entries")
     print(f"Unique Players:     {stats['player_stats']:>6} players")
     print(f"Tracking Records:   {stats['player_tracking']:>6} sightings")
+    print(f"Rolled-up Rows:     {stats['player_tracking_rollup']:>6} player/site summaries")
     print(f"Skipped Pairs:      {stats['skipped_pairs']:>6} pairs")
     print()
 
 
+def run_maintenance():
+    """Roll up old sightings, then VACUUM and ANALYZE (ignores the schedule).
+
+    Unlike the scheduled runs, this converts an older database to incremental
+    auto-vacuum with a full VACUUM, so run it while nothing else is writing.
+    """
+    if not os.path.exists('data/player_names.db'):
+        print("❌ Database not found: data/player_names.db")
+        return
+    
+    db = PlayerDatabase('data/player_names.db')
+    print(f"\nRolling up sightings older than {TRACKING_RETENTION_DAYS} days and compacting...")
+    result = db.run_maintenance(force=True, max_rows=None, full_vacuum=True)
+    
+    print(f"✓ Rolled up {result['rolled_up']} tracking rows")
+    if result['full_vacuum']:
+        print("✓ Converted database to incremental auto-vacuum (one-off full VACUUM)")
+    else:
+        print(f"✓ Freed {result['freed_pages']} pages")
+    print(f"✓ Statistics refreshed ({result['seconds']}s total)")
+
+
 def main():
     """Main entry point."""
     import sys
@@ -148,6 +171,7 @@ def main():
         print("  python migrate_player_db.py migrate   - Migrate JSON → SQLite")
         print("  python migrate_player_db.py export    - Export SQLite → JSON")
         print("  python migrate_player_db.py stats     - Show database stats")
+        print("  python migrate_player_db.py maintain  - Roll up old sightings, VACUUM and ANALYZE")
         sys.exit(1)
     
     command = sys.argv[1].lower()
@@ -158,6 +182,8 @@ def main():
         export_from_sqlite()
     elif command == 'stats':
         show_stats()
+    elif command == 'maintain':
+        run_maintenance()
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
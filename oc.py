@@ -1,9 +1,11 @@
 import json
 import re
-import requests
+import oddsmatcha
 import os
+import threading
 import time
 import traceback
+from raw_archive import archive_response
 try:
     import tls_client
 except ImportError:
@@ -64,9 +66,14 @@ def _fuzzy_match_names(name1: str, name2: str) -> bool:
 
 # ========= CACHE =========
 CACHE_DIR = './cache'
-CACHE_HTML_SUBDIR = 'html'
+CACHE_META_SUBDIR = 'meta'  # parsed market metadata per match slug
 CACHE_ODDS_SUBDIR = 'odds'
 ODDS_CACHE_TTL = 60  # Cache odds for 60 seconds
+# Also keep per-market odds in cache/odds so other processes (whale / virgin_goose) can reuse them
+ODDS_DISK_CACHE = os.getenv("OC_ODDS_DISK_CACHE", "1") == "1"
+
+# Parsed market metadata per match slug (see get_oddschecker_market_meta)
+_MARKET_META = {}
 
 # ========= BOOKMAKER MAPPING =========
 BOOKMAKER_MAPPING = {
@@ -106,13 +113,135 @@ BOOKMAKER_MAPPING = {
 }
 
 # ========= SLUG CACHE =========
-# In-memory cache for Betfair ID -> OddsChecker slug mappings
+# Betfair ID -> OddsChecker slug mappings, persisted to data/oc_slugs.json so
+# warm restarts (and the other bot processes) resolve slugs without the API.
+# The store lives outside CACHE_DIR, which whale clears on start-up and at midnight.
+# Entries are {"slug": str|None, "ts": epoch}; None records an ID the API could
+# not convert, kept for a shorter TTL so it isn't re-requested every loop.
+SLUG_STORE_DIR = './data'
+SLUG_STORE_FILE = 'oc_slugs.json'
+SLUG_TTL = float(os.getenv("OC_SLUG_TTL_HOURS", "72")) * 3600
+SLUG_MISS_TTL = float(os.getenv("OC_SLUG_MISS_TTL", "600"))
+SLUG_API_TIMEOUT = float(os.getenv("OC_SLUG_API_TIMEOUT", "10"))
+SLUG_API_BATCH = 50  # IDs per convert request (keeps the URL short)
+
 _SLUG_CACHE = {}
+_slug_lock = threading.Lock()        # guards _SLUG_CACHE / _pending_slug_ids
+_slug_fetch_lock = threading.Lock()  # one convert request in flight per process
+_pending_slug_ids = set()
+_slug_store_mtime = None
+
+def _slug_store_path():
+    # Looked up on use, so OC_SLUG_STORE from a .env loaded after this import applies
+    return os.getenv("OC_SLUG_STORE") or os.path.join(SLUG_STORE_DIR, SLUG_STORE_FILE)
+
+def _fresh_slug_entry(betfair_id, now=None):
+    """Return the cached entry for betfair_id if it is within its TTL, else None."""
+    entry = _SLUG_CACHE.get(betfair_id)
+    if not entry:
+        return None
+    ttl = SLUG_TTL if entry.get('slug') else SLUG_MISS_TTL
+    if (now or time.time()) - entry.get('ts', 0) >= ttl:
+        return None
+    return entry
+
+def _load_slug_store():
+    """Merge the on-disk slug store into memory if another process (or a previous run) changed it."""
+    global _slug_store_mtime
+    path = _slug_store_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return
+    if mtime == _slug_store_mtime:
+        return
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except Exception as e:
+        print(f"[WARN] Failed to read slug store {path}: {e}", flush=True)
+        return
+    with _slug_lock:
+        for betfair_id, entry in stored.items():
+            current = _SLUG_CACHE.get(betfair_id)
+            if isinstance(entry, dict) and (current is None or entry.get('ts', 0) > current.get('ts', 0)):
+                _SLUG_CACHE[betfair_id] = entry
+    _slug_store_mtime = mtime
+
+def _save_slug_store():
+    """Write unexpired entries to disk (re-merging first so concurrent writers' entries survive)."""
+    global _slug_store_mtime
+    _slug_store_mtime = None
+    _load_slug_store()
+    now = time.time()
+    path = _slug_store_path()
+    with _slug_lock:
+        live = {bid: e for bid, e in _SLUG_CACHE.items() if _fresh_slug_entry(bid, now)}
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(live, f, separators=(',', ':'))
+        os.replace(tmp, path)
+        _slug_store_mtime = os.path.getmtime(path)
+    except Exception as e:
+        print(f"[WARN] Failed to write slug store {path}: {e}", flush=True)
+
+def _request_slugs(betfair_ids):
+    """One batched convert request. Returns {betfair_id: slug} for the IDs the API converted."""
+    api_url = f"https://api.oddsmatcha.uk/convert/betfair_to_oddschecker?betfair_ids={','.join(betfair_ids)}"
+    response = oddsmatcha.get(api_url, timeout=SLUG_API_TIMEOUT)
+    if response.status_code != 200:
+        print(f"[WARN] OddsChecker slug API returned status {response.status_code}: {response.text[:200]}", flush=True)
+        return None
+    response_data = response.json()
+    if not response_data.get('success') or not isinstance(response_data.get('conversions'), list):
+        print(f"[WARN] OddsChecker slug API returned unsuccessful response: {json.dumps(response_data)[:500]}", flush=True)
+        return None
+    slugs = {}
+    for conv in response_data['conversions']:
+        betfair_id = str(conv.get('betfair_id', ''))
+        page_slug = conv.get('page_slug')
+        if betfair_id and page_slug:
+            slugs[betfair_id] = page_slug
+    return slugs
+
+def _resolve_slugs(betfair_ids):
+    """Fetch slugs for IDs without a fresh entry, batched with misses queued by other threads."""
+    _load_slug_store()
+    with _slug_lock:
+        _pending_slug_ids.update(bid for bid in betfair_ids if not _fresh_slug_entry(bid))
+        if not _pending_slug_ids:
+            return
+    with _slug_fetch_lock:
+        # Another thread may have resolved our IDs while we waited for the lock
+        with _slug_lock:
+            batch = sorted(bid for bid in _pending_slug_ids if not _fresh_slug_entry(bid))
+            _pending_slug_ids.clear()
+        if not batch:
+            return
+        resolved = 0
+        for i in range(0, len(batch), SLUG_API_BATCH):
+            chunk = batch[i:i + SLUG_API_BATCH]
+            try:
+                slugs = _request_slugs(chunk)
+            except Exception as e:
+                print(f"[ERROR] Failed to fetch oddschecker slugs for {len(chunk)} Betfair IDs: {e}", flush=True)
+                continue
+            if slugs is None:
+                continue
+            now = time.time()
+            with _slug_lock:
+                for bid in chunk:
+                    _SLUG_CACHE[bid] = {'slug': slugs.get(bid), 'ts': now}
+            resolved += len(slugs)
+        print(f"[OC] Resolved {resolved}/{len(batch)} oddschecker slugs", flush=True)
+        _save_slug_store()
 
 def prefetch_oddschecker_slugs(betfair_ids):
     """
     Batch prefetch oddschecker slugs for multiple Betfair IDs.
-    This is more efficient than individual API calls per match.
+    IDs with a fresh entry in the persistent slug store cost no network.
     
     Args:
         betfair_ids: List of Betfair match IDs (strings or ints)
@@ -122,70 +251,15 @@ def prefetch_oddschecker_slugs(betfair_ids):
     """
     if not betfair_ids:
         return {}
-    
-    # Filter out IDs already in cache
-    uncached_ids = [str(bid) for bid in betfair_ids if str(bid) not in _SLUG_CACHE]
-    
-    if not uncached_ids:
-        _debug(f"[INFO] All {len(betfair_ids)} Betfair IDs already cached")
-        return _SLUG_CACHE
-    
-    # Batch API call (API supports comma-separated IDs)
-    betfair_ids_str = ','.join(uncached_ids)
-    api_url = f'https://api.oddsmatcha.uk/convert/betfair_to_oddschecker?betfair_ids={betfair_ids_str}'
-    
-    try:
-        _debug(f"[INFO] Prefetching oddschecker slugs for {len(uncached_ids)} Betfair IDs...")
-        response = requests.get(api_url, timeout=30)
-        
-        # Log the response for debugging
-        print(f"[OC] API Response Status: {response.status_code}")
-        if response.status_code != 200:
-            print(f"[WARN] Batch oddschecker prefetch API returned status {response.status_code}")
-            print(f"[DEBUG] Response content: {response.text[:500]}")  # First 500 chars
-            return _SLUG_CACHE
-        
-        response_data = response.json()
-        print(f"[DEBUG] API Response keys: {list(response_data.keys())}")
-        print(f"[DEBUG] Success field: {response_data.get('success')}")
-        print(f"[DEBUG] Conversions type: {type(response_data.get('conversions'))}")
-        
-        if response_data.get('success') and isinstance(response_data.get('conversions'), list):
-            conversions = response_data['conversions']
-            print(f"[DEBUG] Number of conversions returned: {len(conversions)}")
-            if conversions:
-                print(f"[DEBUG] Sample conversion: {conversions[0]}")
-            
-            success_count = 0
-            for conv in conversions:
-                betfair_id = str(conv.get('betfair_id', ''))
-                page_slug = conv.get('page_slug')
-                if betfair_id and page_slug:
-                    _SLUG_CACHE[betfair_id] = page_slug
-                    success_count += 1
-                else:
-                    print(f"[DEBUG] Missing data in conversion: betfair_id={betfair_id}, page_slug={page_slug}")
-            
-            print(f"[OC] Prefetched {success_count}/{len(uncached_ids)} oddschecker slugs")
-            if success_count < len(uncached_ids):
-                failed_count = len(uncached_ids) - success_count
-                print(f"[OC] {failed_count} Betfair IDs could not be converted to oddschecker slugs")
-        else:
-            print(f"[WARN] Batch oddschecker prefetch API returned unsuccessful response")
-            print(f"[DEBUG] Full response: {json.dumps(response_data, indent=2)[:1000]}")  # First 1000 chars
-    
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] Failed to parse JSON response from oddschecker API: {e}")
-        print(f"[DEBUG] Response text: {response.text[:500]}")
-    except Exception as e:
-        print(f"[ERROR] Failed to prefetch oddschecker slugs: {e}")
-        traceback.print_exc()
-    
-    return _SLUG_CACHE
+    ids = [str(bid) for bid in betfair_ids]
+    _resolve_slugs(ids)
+    with _slug_lock:
+        entries = {bid: _fresh_slug_entry(bid) for bid in ids}
+    return {bid: e['slug'] for bid, e in entries.items() if e and e.get('slug')}
 
 def _ensure_cache_dirs():
     """Create cache directories if they don't exist."""
-    os.makedirs(os.path.join(CACHE_DIR, CACHE_HTML_SUBDIR), exist_ok=True)
+    os.makedirs(os.path.join(CACHE_DIR, CACHE_META_SUBDIR), exist_ok=True)
     os.makedirs(os.path.join(CACHE_DIR, CACHE_ODDS_SUBDIR), exist_ok=True)
 
 def _debug(msg):
@@ -227,238 +301,263 @@ def _read_cache(cache_path):
         return None
 
 def _write_cache(cache_path, data):
-    """Write data to cache file as JSON."""
+    """Write data to cache file as JSON (atomically, other processes may be reading it)."""
     try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, cache_path)
         _debug(f"[INFO] Cached data to {cache_path}")
     except Exception as e:
         print(f"[WARN] Failed to write cache {cache_path}: {e}", flush=True)
 
-def _write_cache_text(cache_path, data):
-    """Write data to cache file as text."""
-    try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            f.write(data)
-        _debug(f"[INFO] Cached HTML to {cache_path}")
-    except Exception as e:
-        print(f"[WARN] Failed to write cache {cache_path}: {e}", flush=True)
-
-def _read_cache_text(cache_path):
-    """Read and return cache file content as text."""
-    try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        print(f"[WARN] Failed to read cache {cache_path}: {e}", flush=True)
-        return None
-
 def get_oddschecker_match_slug(betfair_id):
     """
     Convert Betfair match ID to OddsChecker page slug using the mapping API.
-    Uses in-memory cache to avoid repeated API calls for the same match.
+    Uses the persistent slug store; concurrent misses are resolved in one batched request.
     
     betfair_id: Betfair match ID (can be string or dict)
     Returns: page_slug string (e.g., "english/premier-league/team-a-v-team-b") or None on failure
     """
     if isinstance(betfair_id, dict):
         betfair_id = next(iter(betfair_id.values()))
+    betfair_id = str(betfair_id)
     
-    # Check cache first
-    if betfair_id in _SLUG_CACHE:
-        _debug(f"[INFO] Using cached slug for Betfair {betfair_id}: {_SLUG_CACHE[betfair_id]}")
-        return _SLUG_CACHE[betfair_id]
+    with _slug_lock:
+        entry = _fresh_slug_entry(betfair_id)
+    if entry is None:
+        _resolve_slugs([betfair_id])
+        with _slug_lock:
+            entry = _fresh_slug_entry(betfair_id)
     
-    api_url = f'https://api.oddsmatcha.uk/convert/betfair_to_oddschecker?betfair_ids={betfair_id}'
-    try:
-        response_data = requests.get(api_url).json()
-        
-        # Validate response structure
-        if response_data.get('success') and isinstance(response_data.get('conversions'), list):
-            conversions = response_data['conversions']
-            if conversions:
-                first_item = conversions[0]
-                page_slug = first_item.get('page_slug')
-                if page_slug:
-                    _debug(f"[INFO] Mapped Betfair {betfair_id} to OddsChecker slug: {page_slug}")
-                    # Cache the result
-                    _SLUG_CACHE[betfair_id] = page_slug
-                    return page_slug
-                else:
-                    print(f"[WARN] 'page_slug' not found in conversion response for Betfair {betfair_id}", flush=True)
-                    return None
-            else:
-                print(f"[WARN] 'conversions' list is empty for Betfair {betfair_id}", flush=True)
-                return None
-        else:
-            print(f"[WARN] API response structure invalid or unsuccessful for Betfair {betfair_id}", flush=True)
-            return None
-    except Exception as e:
-        print(f"[ERROR] Failed to map Betfair ID {betfair_id} to OddsChecker: {e}", flush=True)
+    if entry is None:
+        print(f"[WARN] Could not look up OddsChecker slug for Betfair {betfair_id}", flush=True)
+        return None
+    if not entry.get('slug'):
+        _debug(f"[INFO] No OddsChecker slug for Betfair {betfair_id}")
         return None
+    _debug(f"[INFO] Using cached slug for Betfair {betfair_id}: {entry['slug']}")
+    return entry['slug']
 
-def scrape_oddschecker_market_ids(match_slug):
+def _new_tls_session():
+    return tls_client.Session(
+        client_identifier="chrome120",
+        random_tls_extension_order=True
+    )
+
+def _fetch_market_page(match_slug, session):
+    """Fetch the match page HTML. Returns None on 404, raises on other HTTP errors."""
+    url = f'https://www.oddschecker.com/football/{match_slug}/winner'
+    headers = {
+        'authority': 'www.oddschecker.com',
+        'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+        'accept-encoding': 'gzip, deflate, br, zstd',
+        'accept-language': 'en-GB,en;q=0.9,en-US;q=0.8',
+        'cache-control': 'no-cache',
+        'pragma': 'no-cache',
+        'priority': 'u=0, i',
+        'referer': 'https://www.oddschecker.com/football',
+        'sec-ch-ua': '"Chromium";v="142", "Microsoft Edge";v="142", "Not_A Brand";v="99"',
+        'sec-ch-ua-mobile': '?0',
+        'sec-ch-ua-platform': '"Windows"',
+        'sec-fetch-dest': 'document',
+        'sec-fetch-mode': 'navigate',
+        'sec-fetch-site': 'same-origin',
+        'sec-fetch-user': '?1',
+        'upgrade-insecure-requests': '1',
+        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36 Edg/142.0.0.0',
+    }
+    cookies = {
+        'odds_type': 'decimal',
+        'device': 'desktop',
+        'logged_in': 'false',
+        'mobile_redirect': 'true',
+    }
+    _debug(f"[INFO] Fetching match page: {url}")
+    response = session.get(url, headers=headers, cookies=cookies)
+    if response.status_code == 404:
+        print(f"[INFO] No OddsChecker page found at {url} (404)", flush=True)
+        return None
+    elif response.status_code != 200:
+        raise Exception(f"HTTP {response.status_code} fetching OddsChecker page: {url}")
+    return response.text
+
+def _parse_market_page(html_content):
     """
-    Scrape OddsChecker webpage to find Anytime Goalscorer and First Goalscorer market IDs using tls_client.
-    Caches HTML forever (doesn't change), reuses cached HTML if available.
-    Reuses the same session to get odds with the market IDs found.
-    match_slug: e.g., "world-cup-european-qualifiers/slovakia-v-northern-ireland"
-    Returns: tuple of (dict with market_ids, tls_client session) or (None, None) on failure
+    Parse a match page into a compact market metadata record:
+        {'markets': {'First Goalscorer': '3579339764', ...},
+         'bets': {'First Goalscorer': {'Player Name': betId, ...}, 'Anytime Goalscorer': {...}}}
     """
-    _ensure_cache_dirs()
+    markets = {}
+    soup = BeautifulSoup(html_content, 'html.parser')
+    # Look for the scripts containing market data, e.g.
+    # "3579339764":{"ocMarketId":3579339764,...,"marketName":"...#First Goalscorer",...}
+    for script in soup.find_all('script'):
+        script_content = script.get_text() if script.get_text() else ""
+        if not script_content or 'marketName' not in script_content:
+            continue
+        for oc_market_id, market_name in re.findall(r'"ocMarketId":(\d+),[^}]*"marketName":"([^"]*)"', script_content):
+            # Market names look like "Team A v Team B#First Goalscorer"; keep the first id per name
+            markets.setdefault(market_name.split('#')[-1], oc_market_id)
+    
+    market_ids = {'fgs': markets.get('First Goalscorer'), 'ags': markets.get('Anytime Goalscorer')}
+    return {'markets': markets, 'bets': _extract_player_bets_from_html(html_content, market_ids)}
+
+def _market_ids_from_meta(meta):
+    markets = meta.get('markets', {})
+    return {'fgs': markets.get('First Goalscorer'), 'ags': markets.get('Anytime Goalscorer')}
+
+def _market_meta_path(match_slug):
+    return _get_cache_path(f"{match_slug.replace('/', '_')}.json", CACHE_META_SUBDIR)
+
+def get_oddschecker_market_meta(match_slug, session=None):
+    """
+    Return the parsed market metadata record for a match (see _parse_market_page).
+    Records are kept in memory and in cache/meta, so the page is fetched and parsed
+    once per match; only records with an FGS or AGS market are cached.
+    Returns None if the page could not be fetched or has neither market.
+    """
+    meta = _MARKET_META.get(match_slug)
+    if meta is not None:
+        return meta
+    
+    cache_path = _market_meta_path(match_slug)
+    if _cache_file_exists_and_valid(cache_path, max_age=None):  # Market layout doesn't change
+        meta = _read_cache(cache_path)
+        if meta:
+            _debug(f"[INFO] Using cached market metadata for {match_slug}")
+            _MARKET_META[match_slug] = meta
+            return meta
     
     if not BeautifulSoup:
         print("[ERROR] BeautifulSoup4 not installed, cannot scrape webpage", flush=True)
-        return None, None
-    
+        return None
     if not tls_client:
         print("[ERROR] tls_client not installed, cannot scrape webpage", flush=True)
-        return None, None
+        return None
     
-    try:
-        url = f'https://www.oddschecker.com/football/{match_slug}/winner'
-        
-        # Check if we have cached HTML for this match
-        cache_filename = f"{match_slug.replace('/', '_')}_page.html"
-        cache_path = _get_cache_path(cache_filename, CACHE_HTML_SUBDIR)
-        
-        html_content = None
-        if _cache_file_exists_and_valid(cache_path, max_age=None):  # Cache HTML forever
-            _debug(f"[INFO] Using cached HTML for {match_slug}")
-            html_content = _read_cache_text(cache_path)
-        
-        # If not in cache, fetch from web
-        if html_content is None:
-            headers = {
-                'authority': 'www.oddschecker.com',
-                'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                'accept-encoding': 'gzip, deflate, br, zstd',
-                'accept-language': 'en-GB,en;q=0.9,en-US;q=0.8',
-                'cache-control': 'no-cache',
-                'pragma': 'no-cache',
-                'priority': 'u=0, i',
-                'referer': 'https://www.oddschecker.com/football',
-                'sec-ch-ua': '"Chromium";v="142", "Microsoft Edge";v="142", "Not_A Brand";v="99"',
-                'sec-ch-ua-mobile': '?0',
-                'sec-ch-ua-platform': '"Windows"',
-                'sec-fetch-dest': 'document',
-                'sec-fetch-mode': 'navigate',
-                'sec-fetch-site': 'same-origin',
-                'sec-fetch-user': '?1',
-                'upgrade-insecure-requests': '1',
-                'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36 Edg/142.0.0.0',
-            }
-            
-            cookies = {
-                'odds_type': 'decimal',
-                'device': 'desktop',
-                'logged_in': 'false',
-                'mobile_redirect': 'true',
-            }
-            
-            # Create a single tls_client session to reuse for both page fetch and odds API calls
-            _debug(f"[INFO] Creating tls_client session with chrome120 fingerprint...")
-            session = tls_client.Session(
-                client_identifier="chrome120",
-                random_tls_extension_order=True
-            )
-            
-            # Fetch the match page
-            _debug(f"[INFO] Fetching match page: {url}")
-            response = session.get(
-                url,
-                headers=headers,
-                cookies=cookies
-            )
-            if response.status_code == 404:
-                print(f"[INFO] No OddsChecker page found at {url} (404)", flush=True)
-                return None, None
-            elif response.status_code != 200:
-                raise Exception(f"HTTP {response.status_code} fetching OddsChecker page: {url}")
-            html_content = response.text
-            _debug(f"[INFO] Successfully fetched page with tls_client")
-            
-            # Cache the HTML for future use
-            _write_cache_text(cache_path, html_content)
-        else:
-            # Create a new session for odds fetching even if we used cached HTML
-            _debug(f"[INFO] Creating tls_client session for odds fetch...")
-            session = tls_client.Session(
-                client_identifier="chrome120",
-                random_tls_extension_order=True
-            )
-        
-        # Also save to debug file
+    html_content = _fetch_market_page(match_slug, session or _new_tls_session())
+    if html_content is None:
+        return None
+    if DEBUG_MODE:
         try:
             with open('oddschecker_market_page.html', 'w', encoding='utf-8') as f:
                 f.write(html_content)
-            _debug(f"[INFO] Saved HTML to oddschecker_market_page.html for debugging")
         except Exception as e:
             print(f"[WARN] Failed to save HTML: {e}", flush=True)
-        
-        market_ids = {
-            'fgs': None,
-            'ags': None
-        }
-        
-        import re
-        
-        # Parse HTML to find the data script
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Look for the script containing market data
-        for script in soup.find_all('script'):
-            script_content = script.get_text() if script.get_text() else ""
-            if not script_content or 'marketName' not in script_content:
-                continue
-            
-            # Extract market data from the JSON structure
-            # Look for patterns like "3579339764":{"ocMarketId":3579339764,...,"marketName":"...#First Goalscorer",...}
-            
-            # Match First Goalscorer market
-            fgs_pattern = r'"ocMarketId":(\d+),[^}]*"marketName":"[^#]*#First Goalscorer"'
-            fgs_matches = re.findall(fgs_pattern, script_content)
-            if fgs_matches:
-                market_ids['fgs'] = fgs_matches[0]
-                _debug(f"[INFO] Found FGS market ID: {market_ids['fgs']}")
-            
-            # Match Anytime Goalscorer market
-            ags_pattern = r'"ocMarketId":(\d+),[^}]*"marketName":"[^#]*#Anytime Goalscorer"'
-            ags_matches = re.findall(ags_pattern, script_content)
-            if ags_matches:
-                market_ids['ags'] = ags_matches[0]
-                _debug(f"[INFO] Found AGS market ID: {market_ids['ags']}")
-        
-        if market_ids['fgs'] or market_ids['ags']:
-            _debug(f"[INFO] Found market IDs: FGS={market_ids['fgs']}, AGS={market_ids['ags']}")
-            # Return both the market IDs and the session to reuse
-            return market_ids, session
-        else:
-            print(f"[WARN] Could not find market IDs in page for {match_slug}", flush=True)
+    
+    meta = _parse_market_page(html_content)
+    market_ids = _market_ids_from_meta(meta)
+    if not (market_ids['fgs'] or market_ids['ags']):
+        print(f"[WARN] Could not find market IDs in page for {match_slug}", flush=True)
+        return None
+    _debug(f"[INFO] Found market IDs: FGS={market_ids['fgs']}, AGS={market_ids['ags']}")
+    _ensure_cache_dirs()
+    _write_cache(cache_path, meta)
+    _MARKET_META[match_slug] = meta
+    return meta
+
+def scrape_oddschecker_market_ids(match_slug):
+    """
+    Find Anytime Goalscorer and First Goalscorer market IDs for a match, from the
+    cached market metadata or by scraping the OddsChecker page using tls_client.
+    match_slug: e.g., "world-cup-european-qualifiers/slovakia-v-northern-ireland"
+    Returns: tuple of (dict with market_ids, tls_client session) or (None, None) on failure
+    """
+    if not tls_client:
+        print("[ERROR] tls_client not installed, cannot scrape webpage", flush=True)
+        return None, None
+    
+    try:
+        session = _new_tls_session()
+        meta = get_oddschecker_market_meta(match_slug, session=session)
+        if not meta:
             return None, None
-            
+        return _market_ids_from_meta(meta), session
     except Exception as e:
         print(f"[ERROR] Unexpected error scraping OddsChecker page for {match_slug}: {e}", flush=True)
         return None, None
 
+# ========= ODDS CACHE =========
+# marketId (str) -> (fetched_at, market dict from all-odds); one entry per market so
+# FGS-only and FGS+AGS requests share entries.
+_ODDS_CACHE = {}
+_odds_cache_lock = threading.Lock()
+_odds_cache_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'api_calls': 0}
+
+def _count_odds_cache(name):
+    # Prefetch workers update the counters concurrently
+    with _odds_cache_lock:
+        _odds_cache_stats[name] += 1
+
+def _market_odds_path(market_id):
+    return _get_cache_path(f"market_{market_id}.json", CACHE_ODDS_SUBDIR)
+
+def _cached_market_odds(market_id, now):
+    """Fresh cached market dict from memory, then (if enabled) disk; None if missing or stale."""
+    with _odds_cache_lock:
+        entry = _ODDS_CACHE.get(market_id)
+    if entry and now - entry[0] < ODDS_CACHE_TTL:
+        _count_odds_cache('hits')
+        return entry[1]
+    if ODDS_DISK_CACHE:
+        cache_path = _market_odds_path(market_id)
+        if _cache_file_exists_and_valid(cache_path, max_age=ODDS_CACHE_TTL):
+            market = _read_cache(cache_path)
+            if market is not None:
+                with _odds_cache_lock:
+                    _ODDS_CACHE[market_id] = (os.path.getmtime(cache_path), market)
+                _count_odds_cache('disk_hits')
+                return market
+    _count_odds_cache('misses')
+    return None
+
+def _store_market_odds(odds_data, now):
+    for market in odds_data or []:
+        market_id = str(market.get('marketId', ''))
+        if not market_id:
+            continue
+        with _odds_cache_lock:
+            _ODDS_CACHE[market_id] = (now, market)
+        if ODDS_DISK_CACHE:
+            _write_cache(_market_odds_path(market_id), market)
+
+def get_odds_cache_stats():
+    """Return odds cache counters: memory hits, disk hits, misses, API calls and overall hit rate."""
+    with _odds_cache_lock:
+        stats = dict(_odds_cache_stats)
+    lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+    return stats
+
+def _odds_cache_summary():
+    stats = get_odds_cache_stats()
+    return (f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} mem, {stats['disk_hits']} disk, "
+            f"{stats['misses']} miss), {stats['api_calls']} API calls")
+
 def get_oddschecker_odds_web_fallback(market_ids, session=None):
     """
     Fetch odds from /api/markets/v2/all-odds endpoint using the provided tls_client session.
-    Caches odds for 60 seconds, reuses cache if available and fresh.
+    Odds are cached per market for 60 seconds; only missing or stale markets are
+    fetched (in one call) and merged with the cached ones.
     market_ids: list of OddsChecker market IDs (e.g., ['3579249255', '3579289293'])
     session: tls_client session to reuse (if None, creates a new one)
+    Returns: list of market dicts (in market_ids order, markets without odds omitted) or None on failure
     """
     _ensure_cache_dirs()
     
     try:
-        # Create cache filename based on market IDs
-        cache_filename = f"odds_{'_'.join(str(mid) for mid in market_ids)}.json"
-        cache_path = _get_cache_path(cache_filename, CACHE_ODDS_SUBDIR)
-        
-        # Check if we have valid cached odds (less than 60 seconds old)
-        if _cache_file_exists_and_valid(cache_path, max_age=ODDS_CACHE_TTL):
-            _debug(f"[INFO] Using cached odds (less than {ODDS_CACHE_TTL}s old) for market IDs: {market_ids}")
-            return _read_cache(cache_path)
+        market_ids = [str(mid) for mid in market_ids]
+        now = time.time()
+        cached = {}
+        for mid in market_ids:
+            market = _cached_market_odds(mid, now)
+            if market is not None:
+                cached[mid] = market
+        missing = [mid for mid in market_ids if mid not in cached]
+        if not missing:
+            _debug(f"[INFO] Using cached odds for market IDs: {market_ids} ({_odds_cache_summary()})")
+            return [cached[mid] for mid in market_ids]
         
         # Web API headers
         headers = {
@@ -486,7 +585,7 @@ def get_oddschecker_odds_web_fallback(market_ids, session=None):
             'mobile_redirect': 'true',
         }
         
-        market_ids_str = ','.join(str(mid) for mid in market_ids)
+        market_ids_str = ','.join(missing)
         odds_url = f'https://www.oddschecker.com/api/markets/v2/all-odds?market-ids={market_ids_str}&repub=OC'
         
         # Create or reuse session
@@ -495,10 +594,7 @@ def get_oddschecker_odds_web_fallback(market_ids, session=None):
                 print("[ERROR] tls_client not installed, cannot fetch odds", flush=True)
                 return None
             _debug(f"[INFO] Creating new tls_client session for odds fetch")
-            session = tls_client.Session(
-                client_identifier="chrome120",
-                random_tls_extension_order=True
-            )
+            session = _new_tls_session()
         
         _debug(f"[INFO] Fetching fresh odds from: {odds_url}")
         response = session.get(
@@ -509,40 +605,53 @@ def get_oddschecker_odds_web_fallback(market_ids, session=None):
         if response.status_code != 200:
             raise Exception(f"HTTP {response.status_code}: {response.reason}")
         odds_data = response.json()
+        _count_odds_cache('api_calls')
         _debug(f"[INFO] Successfully fetched fresh odds via tls_client for market IDs: {market_ids_str}")
         
-        # Cache the odds for 60 seconds
-        _write_cache(cache_path, odds_data)
+        # Cache each market for 60 seconds
+        _store_market_odds(odds_data, time.time())
         
-        # Also save to debug file
-        try:
-            with open('whale_oc_web_fallback.json', 'w', encoding='utf-8') as f:
-                json.dump(odds_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"[WARN] Failed to write whale_oc_web_fallback.json: {e}", flush=True)
+        # Archive the raw response (opt-in, written off the request path)
+        archive_response("whale_oc_web_fallback", odds_data)
         
-        return odds_data
+        fetched = {str(market.get('marketId', '')): market for market in odds_data or []}
+        print(f"[OC] Fetched {len(missing)}/{len(market_ids)} markets, {len(cached)} cached; odds cache {_odds_cache_summary()}", flush=True)
+        merged = []
+        for mid in market_ids:
+            market = cached.get(mid) or fetched.get(mid)
+            if market is not None:
+                merged.append(market)
+        return merged
     except Exception as e:
         print(f"[ERROR] Failed to fetch odds for market IDs {market_ids}: {e}", flush=True)
         return None
 
 def get_oddschecker_odds(match_slug, betdata):
     """
-    Get OddsChecker odds by scraping the market page and fetching odds using the same tls_client session.
-    Extracts player names from both HTML and API response (bets array).
+    Get OddsChecker odds using the match's cached market metadata and a tls_client session.
+    Extracts player names from both the page metadata and API response (bets array).
     match_slug: e.g., "world-cup-european-qualifiers/slovakia-v-northern-ireland"
     betdata: list of dicts with 'bettype', 'outcome', 'min_odds', 'lay_odds' keys
     Returns: tuple of (arbs_list, arb_opportunities_list) where arb_opportunities contains only true arbitrage opportunities
     """
-    # Scrape market page to get market IDs and player names from the page HTML
-    market_ids, session = scrape_oddschecker_market_ids(match_slug)
+    if not tls_client:
+        print("[ERROR] tls_client not installed, cannot fetch odds", flush=True)
+        return []
+    
+    # Market IDs and player betIds come from the parsed metadata record (no HTML parsing after the first call)
+    session = _new_tls_session()
+    try:
+        meta = get_oddschecker_market_meta(match_slug, session=session)
+    except Exception as e:
+        print(f"[ERROR] Unexpected error scraping OddsChecker page for {match_slug}: {e}", flush=True)
+        meta = None
     
-    if not market_ids:
+    if not meta:
         print(f"[ERROR] Failed to get market IDs for match slug {match_slug}", flush=True)
         return []
     
-    # Read the saved HTML to extract player names and their betIds (fallback for HTML-available data)
-    player_bet_mapping = _extract_player_bets_from_html('oddschecker_market_page.html', market_ids)
+    market_ids = _market_ids_from_meta(meta)
+    player_bet_mapping = {bettype: dict(players) for bettype, players in meta.get('bets', {}).items()}
     
     # Extract just the IDs from the dict
     market_id_list = []
@@ -564,12 +673,6 @@ def get_oddschecker_odds(match_slug, betdata):
         print(f"[ERROR] Failed to get odds for match slug {match_slug}", flush=True)
         return []
     
-    try:
-        with open('whale_oc.json', 'w', encoding='utf-8') as f:
-            json.dump(oddschecker_data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[WARN] Failed to write whale_oc.json: {e}", flush=True)
-
     # Extract player names from API response's bets array (for FGS and AGS)
     api_player_bet_mapping = _extract_player_bets_from_api(oddschecker_data, market_ids)
     
@@ -653,18 +756,15 @@ def get_oddschecker_odds(match_slug, betdata):
 
     return arb_opportunities
 
-def _extract_player_bets_from_html(html_file, market_ids):
+def _extract_player_bets_from_html(html_content, market_ids):
     """
-    Extract player names and their betIds from the saved HTML file.
+    Extract player names and their betIds from the match page HTML.
     market_ids: dict with 'fgs' and 'ags' market IDs
     Returns: dict with structure {'First Goalscorer': {'Player Name': betId, ...}, 'Anytime Goalscorer': {...}}
     """
     player_bets = {}
     
     try:
-        with open(html_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
         # Find the script tag with subeventmarkets data
         script_pattern = r'<script[^>]*data-hypernova-key="subeventmarkets"[^>]*><!--({.*?})--></script>'
         script_match = re.search(script_pattern, html_content, re.DOTALL)
@@ -676,12 +776,13 @@ def _extract_player_bets_from_html(html_file, market_ids):
         json_str = script_match.group(1)
         
         # Save the raw JSON for debugging
-        try:
-            with open('extracted_markets_data.json', 'w', encoding='utf-8') as f:
-                f.write(json_str)
-            _debug(f"[INFO] Saved extracted markets JSON to extracted_markets_data.json")
-        except Exception as e:
-            print(f"[WARN] Failed to save extracted markets data: {e}", flush=True)
+        if DEBUG_MODE:
+            try:
+                with open('extracted_markets_data.json', 'w', encoding='utf-8') as f:
+                    f.write(json_str)
+                _debug(f"[INFO] Saved extracted markets JSON to extracted_markets_data.json")
+            except Exception as e:
+                print(f"[WARN] Failed to save extracted markets data: {e}", flush=True)
         
         # Parse the JSON to get bets
         try:
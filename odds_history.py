@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Columnar odds-history store over the per-match tracking files.
+
+virgin_goose appends one JSON file per match to wh_odds_tracking/
+(`<id>.json` combo records, `<id>_base.json` base snapshots) and
+kwiff_odds_tracking/ (`<id>.json`). Here each (match, source) is turned into
+flat NumPy columns (timestamp, series code, price, boosted, lay, run number),
+sorted by series and time, where a series is one (player, market) pair. The
+columns are cached as odds_history/<source>/<id>.npz and rebuilt when the JSON
+file is newer, so repeated analysis runs never re-parse the JSON.
+
+Queries (range scans, as-of joins, change detection) are array operations
+over the cached columns. NumPy is required for this module.
+"""
+
+import os
+import json
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WH_ODDS_TRACKING_DIR = os.path.join(BASE_DIR, 'wh_odds_tracking')
+KWIFF_ODDS_TRACKING_DIR = os.path.join(BASE_DIR, 'kwiff_odds_tracking')
+ODDS_HISTORY_DIR = os.getenv("ODDS_HISTORY_DIR", os.path.join(BASE_DIR, 'odds_history'))
+
+# source -> (tracking dir, file suffix)
+SOURCES = {
+    'wh_combo': (WH_ODDS_TRACKING_DIR, '.json'),
+    'wh_base': (WH_ODDS_TRACKING_DIR, '_base.json'),
+    'kwiff': (KWIFF_ODDS_TRACKING_DIR, '.json'),
+}
+
+COLUMNS = ('ts', 'key', 'price', 'boosted', 'lay', 'run')
+
+
+def parse_ts(value):
+    """ISO-8601 timestamp (as written by the trackers) -> epoch seconds."""
+    return datetime.fromisoformat(value).timestamp()
+
+
+def format_ts(ts):
+    """Epoch seconds -> UTC ISO-8601 string."""
+    return datetime.fromtimestamp(float(ts), timezone.utc).isoformat()
+
+
+def _kwiff_market(record):
+    for name in (record.get('markets') or {}):
+        if name != 'goals':
+            return name.upper()
+    return 'AGS'
+
+
+def _rows_from_tracking(source, data):
+    """Yield (ts, player, market, price, boosted, lay, run) from a tracking file."""
+    nan = float('nan')
+    for record in data.get('records') or []:
+        try:
+            ts = parse_ts(record['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        run = record.get('run_number')
+        run = -1 if run is None else int(run)
+        if source == 'wh_base':
+            for key, odds in (record.get('odds') or {}).items():
+                player, _, market = key.partition('|')
+                yield ts, player, market, float(odds), nan, nan, run
+        elif source == 'wh_combo':
+            yield (ts, record.get('player_name'), record.get('market_type'), float(record.get('wh_odds') or nan),
+                   float(record.get('boosted_odds') or nan), float(record.get('lay_odds') or nan), run)
+        else:
+            odds = record.get('odds')
+            yield (ts, record.get('player_name'), _kwiff_market(record),
+                   nan if odds is None else float(odds), nan, nan, run)
+
+
+class OddsFrame:
+    """Odds rows of one match and source, sorted by (series, timestamp).
+
+    `keys` lists the (player, market) series; `key` holds each row's index
+    into it. All other columns are parallel arrays.
+    """
+
+    def __init__(self, match_id, source, match_name, keys, ts, key, price, boosted, lay, run):
+        self.match_id = match_id
+        self.source = source
+        self.match_name = match_name
+        self.keys = list(keys)
+        self.ts = ts
+        self.key = key
+        self.price = price
+        self.boosted = boosted
+        self.lay = lay
+        self.run = run
+        self._codes = {k: i for i, k in enumerate(self.keys)}
+        # starts[i]:starts[i + 1] is series i
+        self.starts = np.searchsorted(key, np.arange(len(self.keys) + 1))
+
+    @classmethod
+    def from_rows(cls, match_id, source, match_name, rows):
+        codes = {}
+        ts, key, price, boosted, lay, run = [], [], [], [], [], []
+        for t, player, market, p, b, l, r in rows:
+            ts.append(t)
+            key.append(codes.setdefault((player, market), len(codes)))
+            price.append(p)
+            boosted.append(b)
+            lay.append(l)
+            run.append(r)
+        key = np.array(key, dtype=np.int32)
+        ts = np.array(ts, dtype=np.float64)
+        order = np.lexsort((ts, key))
+        return cls(match_id, source, match_name, list(codes), ts[order], key[order],
+                   np.array(price, dtype=np.float64)[order], np.array(boosted, dtype=np.float64)[order],
+                   np.array(lay, dtype=np.float64)[order], np.array(run, dtype=np.int64)[order])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z['meta']))
+            return cls(meta['match_id'], meta['source'], meta['match_name'], [tuple(k) for k in meta['keys']],
+                       *(z[c] for c in COLUMNS))
+
+    def save(self, path):
+        """Write the columns atomically as an uncompressed .npz."""
+        meta = json.dumps({'match_id': self.match_id, 'source': self.source,
+                           'match_name': self.match_name, 'keys': self.keys})
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, meta=np.array(meta), **{c: getattr(self, c) for c in COLUMNS})
+        os.replace(tmp_file, path)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def take(self, idx):
+        """New frame with the rows at `idx` (index array or boolean mask), keeping series codes."""
+        return OddsFrame(self.match_id, self.source, self.match_name, self.keys,
+                         *(getattr(self, c)[idx] for c in COLUMNS))
+
+    def series(self, player, market):
+        """Slice of the rows for one (player, market), or None if never quoted."""
+        code = self._codes.get((player, market))
+        if code is None:
+            return None
+        return slice(int(self.starts[code]), int(self.starts[code + 1]))
+
+    def range(self, start=None, end=None, player=None, market=None):
+        """Rows with start <= ts < end (epoch seconds), optionally for one player and/or market."""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.ts >= start
+        if end is not None:
+            mask &= self.ts < end
+        if player is not None or market is not None:
+            wanted = [i for i, (p, m) in enumerate(self.keys)
+                      if (player is None or p == player) and (market is None or m == market)]
+            mask &= np.isin(self.key, wanted)
+        return self.take(mask)
+
+    def asof(self, player, market, ts):
+        """Price of (player, market) at or before `ts`, or None."""
+        rows = self.series(player, market)
+        if rows is None:
+            return None
+        pos = int(np.searchsorted(self.ts[rows], ts, side='right')) - 1
+        return float(self.price[rows][pos]) if pos >= 0 else None
+
+    def asof_join(self, left, forward=False):
+        """Prices from this frame aligned to each row of `left` on the same (player, market).
+
+        Backward (default): last price at or before the left row's timestamp.
+        forward=True: first price strictly after it. Missing -> NaN.
+        """
+        out = np.full(len(left), np.nan)
+        if not len(left) or not len(self):
+            return out
+        lut = np.array([self._codes.get(k, -1) for k in left.keys], dtype=np.int64)
+        left_code = lut[left.key]
+        # Rank both timestamp columns together so (series, time) packs into one exact int64
+        _, inverse = np.unique(np.concatenate([self.ts, left.ts]), return_inverse=True)
+        width = int(inverse.max()) + 1
+        right_comp = self.key.astype(np.int64) * width + inverse[:len(self)]
+        left_comp = left_code * width + inverse[len(self):]
+        pos = np.searchsorted(right_comp, left_comp, side='right')
+        if not forward:
+            pos -= 1
+        ok = (left_code >= 0) & (pos >= 0) & (pos < len(self))
+        pos = np.clip(pos, 0, len(self) - 1)
+        ok &= self.key[pos] == left_code
+        out[ok] = self.price[pos[ok]]
+        return out
+
+    def changes(self):
+        """Rows where a series' price differs from its previous (positive) price.
+
+        Returns (frame of the changed rows, array of the previous prices).
+        """
+        if len(self) < 2:
+            return self.take(np.zeros(len(self), dtype=bool)), np.empty(0)
+        prev = self.price[:-1]
+        changed = (self.key[1:] == self.key[:-1]) & (prev > 0) & (self.price[1:] != prev)
+        idx = np.flatnonzero(changed)
+        return self.take(idx + 1), prev[idx]
+
+    def player_market(self, i):
+        return self.keys[int(self.key[i])]
+
+
+class OddsHistory:
+    """Lazily converted, cached columnar view of the odds tracking directories."""
+
+    def __init__(self, cache_dir=ODDS_HISTORY_DIR, sources=None):
+        if np is None:
+            raise ImportError("odds_history requires numpy (pip install numpy)")
+        self.cache_dir = cache_dir
+        self.sources = dict(SOURCES if sources is None else sources)
+        self._frames = {}  # (source, match_id) -> (json mtime, OddsFrame)
+
+    def _json_path(self, source, match_id):
+        directory, suffix = self.sources[source]
+        return os.path.join(directory, f"{match_id}{suffix}")
+
+    def match_ids(self, source):
+        """Match ids with a tracking file for `source`."""
+        directory, suffix = self.sources[source]
+        if not os.path.isdir(directory):
+            return []
+        ids = []
+        for filename in os.listdir(directory):
+            if not filename.endswith(suffix) or filename.startswith('run_counter'):
+                continue
+            if suffix == '.json' and filename.endswith('_base.json'):
+                continue
+            ids.append(filename[:-len(suffix)])
+        return sorted(ids)
+
+    def load(self, match_id, source):
+        """OddsFrame for one match/source (None if there is no tracking file)."""
+        json_path = self._json_path(source, match_id)
+        try:
+            mtime = os.path.getmtime(json_path)
+        except OSError:
+            return None
+        cached = self._frames.get((source, match_id))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        cache_path = os.path.join(self.cache_dir, source, f"{match_id}.npz")
+        frame = None
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= mtime:
+            try:
+                frame = OddsFrame.load(cache_path)
+            except Exception as e:
+                print(f"[ODDS HISTORY] Rebuilding unreadable cache {cache_path}: {e}")
+        if frame is None:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            frame = OddsFrame.from_rows(match_id, source, data.get('match_name'),
+                                        _rows_from_tracking(source, data))
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                frame.save(cache_path)
+            except OSError as e:
+                print(f"[ODDS HISTORY] Failed to write cache {cache_path}: {e}")
+        self._frames[(source, match_id)] = (mtime, frame)
+        return frame
+
+    def scan(self, source, start=None, end=None, match_ids=None, player=None, market=None):
+        """Yield non-empty range-filtered frames for every match of `source`."""
+        for match_id in (self.match_ids(source) if match_ids is None else match_ids):
+            frame = self.load(match_id, source)
+            if frame is None:
+                continue
+            if start is not None or end is not None or player is not None or market is not None:
+                frame = frame.range(start, end, player, market)
+            if len(frame):
+                yield frame
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Shared OddsMatcha API client.
+
+All OddsMatcha calls go through get(). It provides:
+- one pooled session
+- a per-endpoint TTL cache of successful responses
+- single-flight coalescing: concurrent identical requests wait for the one
+  already in flight
+- conditional revalidation (If-None-Match / If-Modified-Since) once a
+  cached response has expired
+
+Counts per endpoint accumulate until loop_summary() is called, so the
+monitoring loop can print what each iteration cost.
+
+Cached payloads (Response.json()) are shared between callers: treat them as
+read-only.
+
+ODDSMATCHA_* settings are read when used, not at import: the bots import
+this module (through oc/betfair) before loading their .env.
+"""
+
+import os
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_BASE = "https://api.oddsmatcha.uk"  # ODDSMATCHA_API_BASE overrides
+DEFAULT_POOL_SIZE = 16                          # ODDSMATCHA_POOL_SIZE overrides
+
+# Seconds a successful response is served without contacting the API; 0 means
+# always ask (conditionally, when the API sent validators). Override per
+# endpoint with ODDSMATCHA_TTL_<ENDPOINT>, e.g. ODDSMATCHA_TTL_OFFERS=120.
+DEFAULT_TTLS = {
+    'convert': 0,       # a missing conversion appears once the match is mapped; oc caches slugs itself
+    'matches': 60,
+    'match': 300,
+    'markets': 0,       # exchange_odds keeps its own snapshot TTL
+    'lineups': 60,
+    'offers': 60,
+    'accafreeze': 0,
+}
+CACHE_MAX_AGE = 6 * 3600  # entries kept for revalidation after their TTL
+
+STAT_FIELDS = ('calls', 'cached', 'coalesced', 'requests', 'not_modified', 'errors')
+
+_lock = threading.Lock()
+_session = None
+_cache = {}        # url -> (fetched_at, Response)
+_in_flight = {}    # url -> _Flight
+_stats = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+_seconds = defaultdict(float)
+
+
+class Response:
+    """status_code/ok/text/json()/raise_for_status(), from the network or the cache."""
+
+    __slots__ = ('url', 'status_code', 'text', 'etag', 'last_modified', '_data')
+
+    def __init__(self, url, status_code, text, etag=None, last_modified=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self._data = None
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        # Decoded once; every caller sharing this response gets the same object
+        if self._data is None:
+            self._data = json.loads(self.text)
+        return self._data
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class _Flight:
+    __slots__ = ('done', 'response', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def endpoint_name(url):
+    """'convert', 'matches', 'match', 'markets', 'lineups', 'offers', 'accafreeze', ..."""
+    parts = [p for p in urlsplit(url).path.split('/') if p]
+    if not parts:
+        return 'root'
+    if parts[0] == 'matches' and len(parts) > 1:
+        return parts[2] if len(parts) > 2 else 'match'
+    return parts[0]
+
+
+def endpoint_ttl(endpoint):
+    """Default cache TTL (seconds) for an endpoint, honouring ODDSMATCHA_TTL_<ENDPOINT>."""
+    override = os.getenv(f"ODDSMATCHA_TTL_{endpoint.upper()}")
+    if override:
+        try:
+            return float(override)
+        except ValueError:
+            pass
+    return DEFAULT_TTLS.get(endpoint, 0)
+
+
+def get_session():
+    """The pooled session used when callers don't pass their own."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            pool_size = int(os.getenv("ODDSMATCHA_POOL_SIZE", "") or DEFAULT_POOL_SIZE)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def build_url(path, params=None):
+    api_base = os.getenv("ODDSMATCHA_API_BASE") or DEFAULT_API_BASE
+    url = path if path.startswith('http') else f"{api_base}/{path.lstrip('/')}"
+    if params:
+        url += ('&' if '?' in url else '?') + urlencode(params)
+    return url
+
+
+def get(path, params=None, ttl=None, timeout=10, session=None):
+    """GET an OddsMatcha path (e.g. 'offers/1') or full URL.
+
+    Args:
+        path: API path relative to the API base URL, or an absolute URL
+        params: optional query parameters
+        ttl: seconds a cached success is reused; defaults to the endpoint's TTL
+        timeout: request timeout in seconds
+        session: requests-compatible session (e.g. a cloudscraper scraper);
+            the pooled session by default
+
+    Returns:
+        Response. Non-2xx answers are returned (not cached); network errors raise.
+    """
+    url = build_url(path, params)
+    endpoint = endpoint_name(url)
+    ttl = endpoint_ttl(endpoint) if ttl is None else ttl
+    with _lock:
+        stats = _stats[endpoint]
+        stats['calls'] += 1
+        cached = _cache.get(url)
+        if cached and time.time() - cached[0] <= ttl:
+            stats['cached'] += 1
+            return cached[1]
+        flight = _in_flight.get(url)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[url] = _Flight()
+        else:
+            stats['coalesced'] += 1
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+    try:
+        flight.response = _fetch(url, endpoint, cached[1] if cached else None, timeout, session)
+        return flight.response
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _in_flight.pop(url, None)
+        flight.done.set()
+
+
+def _fetch(url, endpoint, cached, timeout, session):
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+    started = time.perf_counter()
+    try:
+        raw = (session or get_session()).get(url, headers=headers, timeout=timeout)
+    except Exception:
+        with _lock:
+            _stats[endpoint]['errors'] += 1
+        raise
+    with _lock:
+        stats = _stats[endpoint]
+        stats['requests'] += 1
+        _seconds[endpoint] += time.perf_counter() - started
+        if raw.status_code == 304 and cached is not None:
+            stats['not_modified'] += 1
+            _cache[url] = (time.time(), cached)
+            return cached
+        response = Response(url, raw.status_code, raw.text,
+                            raw.headers.get('ETag'), raw.headers.get('Last-Modified'))
+        if response.ok:
+            _cache[url] = (time.time(), response)
+        else:
+            stats['errors'] += 1
+        return response
+
+
+def get_json(path, params=None, ttl=None, timeout=10, session=None):
+    """Decoded JSON of a successful GET; raises requests.HTTPError otherwise."""
+    response = get(path, params=params, ttl=ttl, timeout=timeout, session=session)
+    response.raise_for_status()
+    return response.json()
+
+
+def loop_stats(reset=True):
+    """{endpoint: {calls, cached, coalesced, requests, not_modified, errors, seconds}}.
+
+    With reset (the default) counters start again from zero and cache entries
+    older than CACHE_MAX_AGE are dropped.
+    """
+    with _lock:
+        result = {name: dict(counts, seconds=round(_seconds[name], 3)) for name, counts in _stats.items()}
+        if reset:
+            _stats.clear()
+            _seconds.clear()
+            cutoff = time.time() - CACHE_MAX_AGE
+            for url in [url for url, (fetched_at, _) in _cache.items() if fetched_at < cutoff]:
+                del _cache[url]
+    return result
+
+
+def loop_summary(reset=True):
+    """One-line per-endpoint summary of loop_stats(), or '' if nothing was called."""
+    stats = loop_stats(reset)
+    if not stats:
+        return ''
+    parts = []
+    for name in sorted(stats):
+        s = stats[name]
+        detail = f"{s['requests']} req"
+        if s['not_modified']:
+            detail += f" ({s['not_modified']} 304)"
+        if s['cached'] or s['coalesced']:
+            detail += f", {s['cached'] + s['coalesced']} reused"
+        if s['errors']:
+            detail += f", {s['errors']} err"
+        parts.append(f"{name} {s['calls']} calls/{detail}/{s['seconds']:.2f}s")
+    return "[ODDSMATCHA] " + " | ".join(parts)
@@ -7,17 +7,32 @@ Replaces JSON files for improved performance with large datasets.
 import sqlite3
 import os
 import json
-from datetime import datetime, timezone
+import threading
+import time
+from datetime import datetime, timezone, timedelta
 from pathlib import Path
 from typing import Optional, Dict, List, Set, Tuple
 from contextlib import contextmanager
 
 
+# Detail sightings older than this are rolled into player_tracking_rollup
+TRACKING_RETENTION_DAYS = int(os.getenv("PLAYER_TRACKING_RETENTION_DAYS", "90"))
+# Hours between scheduled retention / incremental VACUUM / ANALYZE runs
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("PLAYER_DB_MAINTENANCE_HOURS", "24"))
+# Rows rolled up per transaction, and per scheduled run (the rest waits for the next run)
+RETENTION_BATCH_ROWS = 5000
+RETENTION_MAX_ROWS_PER_RUN = 200000
+# Free pages released per incremental VACUUM (4KB pages -> ~40MB)
+VACUUM_PAGES_PER_RUN = 10000
+
+
 class PlayerDatabase:
     """Thread-safe SQLite database for player name management."""
     
     def __init__(self, db_path: str = "data/player_names.db"):
         self.db_path = db_path
+        self._maintenance_lock = threading.Lock()
+        self._next_maintenance_check = 0.0
         self._ensure_db_exists()
     
     def _ensure_db_exists(self):
@@ -26,6 +41,10 @@ class PlayerDatabase:
         
         with self._get_connection() as conn:
             conn.executescript("""
+                -- Only takes effect on a new, empty database; existing ones are
+                -- converted by `migrate_player_db.py maintain` (compact(full_vacuum=True))
+                PRAGMA auto_vacuum = INCREMENTAL;
+                
                 -- Player name mappings
                 CREATE TABLE IF NOT EXISTS player_mappings (
                     variant_normalized TEXT PRIMARY KEY,
@@ -48,14 +67,29 @@ class PlayerDatabase:
                 );
                 CREATE INDEX IF NOT EXISTS idx_player_key 
                     ON player_tracking(player_key);
-                CREATE INDEX IF NOT EXISTS idx_site 
-                    ON player_tracking(site_name);
                 CREATE INDEX IF NOT EXISTS idx_seen_at 
                     ON player_tracking(seen_at);
                 CREATE INDEX IF NOT EXISTS idx_team_name 
                     ON player_tracking(team_name);
-                CREATE INDEX IF NOT EXISTS idx_fixture 
-                    ON player_tracking(fixture);
+                CREATE INDEX IF NOT EXISTS idx_match_id 
+                    ON player_tracking(match_id);
+                -- Low-cardinality indexes no query uses; every upsert paid for them
+                DROP INDEX IF EXISTS idx_site;
+                DROP INDEX IF EXISTS idx_site_name;
+                DROP INDEX IF EXISTS idx_fixture;
+                
+                -- Sightings older than the retention window, one row per player/site
+                -- (teams and raw_names are JSON arrays)
+                CREATE TABLE IF NOT EXISTS player_tracking_rollup (
+                    player_key TEXT NOT NULL,
+                    site_name TEXT NOT NULL,
+                    first_seen TIMESTAMP,
+                    last_seen TIMESTAMP,
+                    sightings INTEGER DEFAULT 0,
+                    teams TEXT DEFAULT '[]',
+                    raw_names TEXT DEFAULT '[]',
+                    PRIMARY KEY (player_key, site_name)
+                );
                 
                 -- Player statistics (cached aggregates)
                 CREATE TABLE IF NOT EXISTS player_stats (
@@ -274,50 +308,100 @@ class PlayerDatabase:
 
         Returns the number of rows affected.
         """
+        return self.merge_many([(source_key, target_key)])
+
+    def merge_many(self, pairs) -> int:
+        """Merge several (source_key, target_key) pairs in one transaction.
+
+        Pairs are applied in order, so chains like (a, b), (b, c) end up under c.
+        Each merge is three set-based statements over the source key's rows, and
+        player_stats is adjusted incrementally (counts added, first/last seen
+        widened) instead of being recounted from player_tracking.
+
+        Returns the total number of source rows merged or re-keyed.
+        """
         affected = 0
         with self._get_connection() as conn:
             cur = conn.cursor()
-            # Fetch all distinct sightings for source_key
-            cur.execute("""
-                SELECT id, raw_name, site_name, match_id, team_name, fixture, seen_at
-                FROM player_tracking
-                WHERE player_key = ?
-            """, (source_key,))
-            rows = cur.fetchall()
+            try:
+                for source_key, target_key in pairs:
+                    if not source_key or not target_key or source_key == target_key:
+                        continue
+                    affected += self._merge_key(cur, source_key, target_key)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return affected
 
-            for row in rows:
-                # Check for existing target row with same site/team/fixture
+    @staticmethod
+    def _merge_key(cur, source_key: str, target_key: str) -> int:
+        # Keep recorded sightings, or derive them from tracking rows for keys that
+        # never got a player_stats row (e.g. imported data). Done for both keys
+        # before any rows move, so the stats upsert below starts from real counts.
+        for key in (source_key, target_key):
+            cur.execute("SELECT 1 FROM player_stats WHERE player_key = ?", (key,))
+            if cur.fetchone() is None:
                 cur.execute("""
-                    SELECT id, seen_at FROM player_tracking
-                    WHERE player_key = ? AND site_name = ? AND (team_name IS ? OR team_name = ?) AND (fixture IS ? OR fixture = ?)
-                    LIMIT 1
-                """, (target_key, row['site_name'], row['team_name'], row['team_name'], row['fixture'], row['fixture']))
-                existing = cur.fetchone()
-                if existing:
-                    # Update seen_at to newest
-                    existing_seen = existing['seen_at']
-                    if existing_seen is None or row['seen_at'] > existing_seen:
-                        cur.execute("UPDATE player_tracking SET seen_at = ? WHERE id = ?", (row['seen_at'], existing['id']))
-                    # Delete the source row to avoid duplicates
-                    cur.execute("DELETE FROM player_tracking WHERE id = ?", (row['id'],))
-                    affected += 1
-                else:
-                    # Re-key the source row to the target_key
-                    cur.execute("UPDATE player_tracking SET player_key = ? WHERE id = ?", (target_key, row['id']))
-                    affected += 1
+                    INSERT INTO player_stats (player_key, first_seen, last_seen, occurrence_count)
+                    SELECT ?, MIN(seen_at), MAX(seen_at), COUNT(*)
+                    FROM player_tracking WHERE player_key = ?
+                    HAVING COUNT(*) > 0
+                """, (key, key))
 
-            # Recalculate stats for target_key and source_key
-            def refresh_stats(key):
-                cur.execute("SELECT MIN(seen_at) as first_seen, MAX(seen_at) as last_seen, COUNT(*) as cnt FROM player_tracking WHERE player_key = ?", (key,))
-                res = cur.fetchone()
-                if res['cnt'] > 0:
-                    cur.execute("INSERT OR REPLACE INTO player_stats (player_key, first_seen, last_seen, occurrence_count) VALUES (?, ?, ?, ?)", (key, res['first_seen'], res['last_seen'], res['cnt']))
-                else:
-                    cur.execute("DELETE FROM player_stats WHERE player_key = ?", (key,))
+        # Target rows that also exist under source_key take the newer seen_at
+        # (IS comparisons: NULL team/fixture sightings match each other; the unary +
+        # keeps the planner on idx_player_key instead of the low-cardinality
+        # idx_team_name)
+        cur.execute("""
+            UPDATE player_tracking
+            SET seen_at = (
+                SELECT MAX(s.seen_at) FROM player_tracking s
+                WHERE s.player_key = ? AND +s.site_name = player_tracking.site_name
+                  AND +s.team_name IS player_tracking.team_name AND +s.fixture IS player_tracking.fixture
+            )
+            WHERE player_key = ? AND EXISTS (
+                SELECT 1 FROM player_tracking s
+                WHERE s.player_key = ? AND +s.site_name = player_tracking.site_name
+                  AND +s.team_name IS player_tracking.team_name AND +s.fixture IS player_tracking.fixture
+                  AND (player_tracking.seen_at IS NULL OR s.seen_at > player_tracking.seen_at)
+            )
+        """, (source_key, target_key, source_key))
 
-            refresh_stats(target_key)
-            refresh_stats(source_key)
-            conn.commit()
+        # Those source rows are now duplicates
+        cur.execute("""
+            DELETE FROM player_tracking
+            WHERE player_key = ? AND EXISTS (
+                SELECT 1 FROM player_tracking t
+                WHERE t.player_key = ? AND +t.site_name = player_tracking.site_name
+                  AND +t.team_name IS player_tracking.team_name AND +t.fixture IS player_tracking.fixture
+            )
+        """, (source_key, target_key))
+        affected = cur.rowcount
+
+        # Everything else is re-keyed to the target
+        cur.execute("UPDATE player_tracking SET player_key = ? WHERE player_key = ?", (target_key, source_key))
+        affected += cur.rowcount
+
+        cur.execute("""
+            SELECT site_name, first_seen, last_seen, sightings, teams, raw_names
+            FROM player_tracking_rollup WHERE player_key = ?
+        """, (source_key,))
+        for row in cur.fetchall():
+            PlayerDatabase._add_rollup(cur, target_key, row['site_name'], row['first_seen'], row['last_seen'],
+                                       row['sightings'], json.loads(row['teams']), json.loads(row['raw_names']))
+        cur.execute("DELETE FROM player_tracking_rollup WHERE player_key = ?", (source_key,))
+
+        cur.execute("""
+            INSERT INTO player_stats (player_key, first_seen, last_seen, occurrence_count)
+            SELECT ?, first_seen, last_seen, occurrence_count
+            FROM player_stats WHERE player_key = ?
+            ON CONFLICT(player_key) DO UPDATE SET
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen),
+                occurrence_count = occurrence_count + excluded.occurrence_count
+        """, (target_key, source_key))
+        cur.execute("DELETE FROM player_stats WHERE player_key = ?", (source_key,))
         return affected
 
     def get_player_raw_names(self, player_key: str) -> Dict[str, List[str]]:
@@ -331,11 +415,15 @@ class PlayerDatabase:
         """
         with self._get_connection() as conn:
             cursor = conn.execute("""
-                SELECT DISTINCT site_name, raw_name
+                SELECT site_name, raw_name
                 FROM player_tracking
                 WHERE player_key = ?
+                UNION
+                SELECT r.site_name, j.value
+                FROM player_tracking_rollup r, json_each(r.raw_names) j
+                WHERE r.player_key = ?
                 ORDER BY site_name, raw_name
-            """, (player_key,))
+            """, (player_key, player_key))
             
             result = {}
             for row in cursor:
@@ -358,10 +446,14 @@ class PlayerDatabase:
         """
         with self._get_connection() as conn:
             cursor = conn.execute("""
-                SELECT DISTINCT team_name
+                SELECT team_name
                 FROM player_tracking
                 WHERE player_key = ? AND team_name IS NOT NULL
-            """, (player_key,))
+                UNION
+                SELECT j.value
+                FROM player_tracking_rollup r, json_each(r.teams) j
+                WHERE r.player_key = ?
+            """, (player_key, player_key))
             
             return {row['team_name'] for row in cursor}
     
@@ -383,6 +475,41 @@ class PlayerDatabase:
             
             return {row['fixture'] for row in cursor}
     
+    def get_player_profiles(self) -> Dict[str, Dict[str, Set[str]]]:
+        """Get teams, raw names and fixtures for every tracked player in one query.
+        
+        Bulk equivalent of get_player_teams/get_player_raw_names/get_player_fixtures
+        for tools that need all players at once. Teams and raw names include
+        rolled-up sightings; fixtures only cover the retention window.
+        
+        Returns:
+            Dict of {player_key: {'teams': set, 'raw_names': set, 'fixtures': set}}
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute("""
+                SELECT player_key,
+                       json_group_array(DISTINCT team_name) AS teams,
+                       json_group_array(DISTINCT raw_name) AS raw_names,
+                       json_group_array(DISTINCT fixture) AS fixtures
+                FROM player_tracking
+                GROUP BY player_key
+            """)
+            
+            profiles = {}
+            for row in cursor:
+                profiles[row['player_key']] = {
+                    field: {value for value in json.loads(row[field]) if value is not None}
+                    for field in ('teams', 'raw_names', 'fixtures')
+                }
+            
+            empty = {'teams': set(), 'raw_names': set(), 'fixtures': set()}
+            cursor = conn.execute("SELECT player_key, teams, raw_names FROM player_tracking_rollup")
+            for row in cursor:
+                profile = profiles.setdefault(row['player_key'], {k: set(v) for k, v in empty.items()})
+                profile['teams'].update(json.loads(row['teams']))
+                profile['raw_names'].update(json.loads(row['raw_names']))
+            return profiles
+    
     def have_conflicting_teams(self, player_key1: str, player_key2: str) -> bool:
         """Check if two players have been seen with different teams.
         
@@ -598,6 +725,190 @@ class PlayerDatabase:
         with open(tracking_file, 'w', encoding='utf-8') as f:
             json.dump(tracking, f, indent=2, sort_keys=True)
     
+    @staticmethod
+    def _add_rollup(cur, player_key: str, site_name: str, first_seen, last_seen,
+                    sightings: int, teams, raw_names) -> None:
+        """Fold sightings into the player/site rollup row (merging team and raw name sets)."""
+        cur.execute("""
+            SELECT first_seen, last_seen, sightings, teams, raw_names
+            FROM player_tracking_rollup WHERE player_key = ? AND site_name = ?
+        """, (player_key, site_name))
+        existing = cur.fetchone()
+        teams = set(teams)
+        raw_names = set(raw_names)
+        if existing:
+            first_seen = min(filter(None, (first_seen, existing['first_seen'])), default=None)
+            last_seen = max(filter(None, (last_seen, existing['last_seen'])), default=None)
+            sightings += existing['sightings'] or 0
+            teams.update(json.loads(existing['teams']))
+            raw_names.update(json.loads(existing['raw_names']))
+        cur.execute("""
+            INSERT OR REPLACE INTO player_tracking_rollup
+            (player_key, site_name, first_seen, last_seen, sightings, teams, raw_names)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (player_key, site_name, first_seen, last_seen, sightings,
+              json.dumps(sorted(t for t in teams if t)), json.dumps(sorted(n for n in raw_names if n))))
+    
+    def roll_up_tracking(self, retention_days: int = TRACKING_RETENTION_DAYS,
+                         batch_rows: int = RETENTION_BATCH_ROWS,
+                         max_rows: Optional[int] = None) -> Dict[str, int]:
+        """Roll sightings older than `retention_days` into player_tracking_rollup.
+        
+        Old detail rows are summarised per (player_key, site_name) - first/last seen,
+        row count, teams and raw names - and deleted, one batch per transaction so
+        concurrent track_player calls only wait for a single batch. Active sightings
+        are never rolled up because track_player refreshes their seen_at.
+        
+        Args:
+            retention_days: Detail rows with seen_at before today minus this are rolled up
+            batch_rows: Rows per transaction
+            max_rows: Stop after this many rows (None = until nothing is left)
+        
+        Returns:
+            Dict with 'rolled_up' (rows removed) and 'remaining' (1 if max_rows was hit)
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        rolled = 0
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            while max_rows is None or rolled < max_rows:
+                limit = batch_rows if max_rows is None else min(batch_rows, max_rows - rolled)
+                cur.execute("""
+                    SELECT id, player_key, site_name, raw_name, team_name, seen_at
+                    FROM player_tracking
+                    WHERE seen_at < ?
+                    ORDER BY seen_at
+                    LIMIT ?
+                """, (cutoff, limit))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                
+                groups: Dict[Tuple[str, str], Dict] = {}
+                for row in rows:
+                    group = groups.setdefault((row['player_key'], row['site_name']), {
+                        'first_seen': row['seen_at'], 'last_seen': row['seen_at'],
+                        'sightings': 0, 'teams': set(), 'raw_names': set(),
+                    })
+                    group['first_seen'] = min(group['first_seen'], row['seen_at'])
+                    group['last_seen'] = max(group['last_seen'], row['seen_at'])
+                    group['sightings'] += 1
+                    group['teams'].add(row['team_name'])
+                    group['raw_names'].add(row['raw_name'])
+                
+                try:
+                    for (player_key, site_name), group in groups.items():
+                        self._add_rollup(cur, player_key, site_name, group['first_seen'], group['last_seen'],
+                                         group['sightings'], group['teams'], group['raw_names'])
+                    cur.execute("DELETE FROM player_tracking WHERE id IN (SELECT value FROM json_each(?))",
+                                (json.dumps([row['id'] for row in rows]),))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                rolled += len(rows)
+                if len(rows) < limit:
+                    break
+        
+        remaining = 1 if max_rows is not None and rolled >= max_rows else 0
+        return {'rolled_up': rolled, 'remaining': remaining}
+    
+    def compact(self, vacuum_pages: int = VACUUM_PAGES_PER_RUN, full_vacuum: bool = False) -> Dict[str, int]:
+        """Release free pages (incremental VACUUM) and refresh planner statistics.
+        
+        Only releases up to `vacuum_pages` free pages. A database created before
+        auto_vacuum=INCREMENTAL has no incremental VACUUM; with full_vacuum it is
+        converted by one full VACUUM, which locks the database for as long as it
+        takes (about a minute on a 128MB file), so only the maintenance CLI asks
+        for it. Statistics use a bounded ANALYZE the first time and PRAGMA
+        optimize afterwards (re-analyzes only what changed).
+        
+        Returns:
+            Dict with 'freed_pages' and 'full_vacuum' (1 if the conversion ran)
+        """
+        result = {'freed_pages': 0, 'full_vacuum': 0}
+        with self._get_connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+                if full_vacuum:
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    conn.execute("VACUUM")
+                    result['full_vacuum'] = 1
+            else:
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+                result['freed_pages'] = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            conn.execute("PRAGMA analysis_limit = 1000")
+            analyzed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            ).fetchone()
+            conn.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+            conn.commit()
+        return result
+    
+    def run_maintenance(self, force: bool = False,
+                        retention_days: int = TRACKING_RETENTION_DAYS,
+                        max_rows: Optional[int] = RETENTION_MAX_ROWS_PER_RUN,
+                        full_vacuum: bool = False) -> Optional[Dict[str, int]]:
+        """Run retention and compaction if MAINTENANCE_INTERVAL_HOURS have passed.
+        
+        The last run time is kept in the metadata table, so the schedule holds
+        across processes and restarts. full_vacuum is passed to compact().
+        
+        Returns:
+            Combined roll_up_tracking/compact results, or None if not due
+        """
+        if not self._maintenance_lock.acquire(blocking=False):
+            return None
+        try:
+            now = datetime.now(timezone.utc)
+            with self._get_connection() as conn:
+                row = conn.execute("SELECT value FROM metadata WHERE key = 'last_maintenance'").fetchone()
+            if not force and row and row['value']:
+                try:
+                    last = datetime.fromisoformat(row['value'])
+                    if now - last < timedelta(hours=MAINTENANCE_INTERVAL_HOURS):
+                        return None
+                except ValueError:
+                    pass
+            
+            started = time.time()
+            result = self.roll_up_tracking(retention_days=retention_days, max_rows=max_rows)
+            result.update(self.compact(full_vacuum=full_vacuum))
+            result['seconds'] = round(time.time() - started, 2)
+            
+            with self._get_connection() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO metadata (key, value, updated_at)
+                    VALUES ('last_maintenance', ?, ?)
+                """, (now.isoformat(), now.isoformat()))
+                conn.commit()
+            return result
+        finally:
+            self._maintenance_lock.release()
+    
+    def schedule_maintenance(self) -> None:
+        """Start run_maintenance in a background thread when it may be due.
+        
+        Cheap enough to call after every write: the metadata table is only
+        consulted once per hour per process.
+        """
+        now = time.time()
+        if now < self._next_maintenance_check or self._maintenance_lock.locked():
+            return
+        self._next_maintenance_check = now + 3600
+        
+        def _run():
+            try:
+                result = self.run_maintenance()
+                if result:
+                    print(f"[PLAYER_DB] Maintenance: rolled up {result['rolled_up']} old sightings, "
+                          f"freed {result['freed_pages']} pages in {result['seconds']}s")
+            except Exception as e:
+                print(f"[PLAYER_DB] Maintenance failed: {e}")
+        
+        threading.Thread(target=_run, name="player-db-maintenance", daemon=True).start()
+    
     def get_stats(self) -> Dict[str, int]:
         """Get database statistics.
         
@@ -607,7 +918,7 @@ class PlayerDatabase:
         with self._get_connection() as conn:
             stats = {}
             
-            for table in ['player_mappings', 'player_tracking', 'player_stats', 'skipped_pairs']:
+            for table in ['player_mappings', 'player_tracking', 'player_tracking_rollup', 'player_stats', 'skipped_pairs']:
                 cursor = conn.execute(f"SELECT COUNT(*) as count FROM {table}")
                 stats[table] = cursor.fetchone()['count']
             
@@ -130,6 +130,8 @@ def _track_player_sqlite(player_name: str, site_name: str, match_id: Optional[st
     player_key = preferred if preferred else norm_name
     
     db.track_player(player_key, player_name, site_name, match_id, team_name, fixture)
+    # Retention/VACUUM/ANALYZE in the background when due (see player_db.run_maintenance)
+    db.schedule_maintenance()
 
 
 # ========= INTERNAL: JSON Fallback Implementation =========
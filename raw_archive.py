@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Opt-in archiving of raw API responses (Betfair, Virgin, OddsChecker).
+
+Archiving is off by default. When enabled, callers hand a response to
+`archive_response()`, which only does a sampling check and a non-blocking
+queue put; serialization, gzip compression and disk-budget enforcement all
+happen on a background writer thread.
+
+Environment:
+    RAW_ARCHIVE_ENABLED      1/true/yes to enable (default off)
+    RAW_ARCHIVE_SAMPLE_RATE  fraction of responses kept, 0..1 (default 1.0)
+    RAW_ARCHIVE_DIR          output folder (default data/raw; not under cache/, which
+                             whale clears on start-up and at midnight)
+    RAW_ARCHIVE_MAX_MB       disk budget; oldest archives are deleted past it (default 200)
+    RAW_ARCHIVE_QUEUE_SIZE   pending writes before new responses are dropped (default 256)
+
+The settings are read on the first archive_response() call rather than at
+import, because the bots import this module before loading their .env.
+"""
+
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+DEFAULT_ARCHIVE_DIR = os.path.join(BASE_DIR, "data", "raw")
+
+# Filled in from the environment by _configure() on first use
+ARCHIVE_ENABLED = None
+ARCHIVE_SAMPLE_RATE = 1.0
+ARCHIVE_DIR = DEFAULT_ARCHIVE_DIR
+ARCHIVE_MAX_BYTES = 200 * 1024 * 1024
+ARCHIVE_QUEUE_SIZE = 256
+
+_queue = None
+_writer_lock = threading.Lock()
+_writer = None
+_files = deque()  # (path, size) oldest first
+_total_bytes = 0
+_stats = {"queued": 0, "written": 0, "dropped": 0, "evicted": 0}
+
+
+def _configure():
+    """Read the RAW_ARCHIVE_* settings (once, after the caller's .env is loaded)."""
+    global ARCHIVE_ENABLED, ARCHIVE_SAMPLE_RATE, ARCHIVE_DIR, ARCHIVE_MAX_BYTES, ARCHIVE_QUEUE_SIZE, _queue
+    with _writer_lock:
+        if ARCHIVE_ENABLED is not None:
+            return
+        try:
+            ARCHIVE_SAMPLE_RATE = min(1.0, max(0.0, float(os.getenv("RAW_ARCHIVE_SAMPLE_RATE", "1") or 1)))
+        except ValueError:
+            ARCHIVE_SAMPLE_RATE = 1.0
+        ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "").strip() or DEFAULT_ARCHIVE_DIR
+        try:
+            ARCHIVE_MAX_BYTES = int(float(os.getenv("RAW_ARCHIVE_MAX_MB", "200") or 200) * 1024 * 1024)
+        except ValueError:
+            ARCHIVE_MAX_BYTES = 200 * 1024 * 1024
+        try:
+            ARCHIVE_QUEUE_SIZE = max(1, int(os.getenv("RAW_ARCHIVE_QUEUE_SIZE", "256") or 256))
+        except ValueError:
+            ARCHIVE_QUEUE_SIZE = 256
+        _queue = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+        # Set last: archive_response() only skips _configure() once this is known
+        ARCHIVE_ENABLED = os.getenv("RAW_ARCHIVE_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(name))[:120] or "response"
+
+
+def _load_existing():
+    """Seed the budget tracker with archives left over from earlier runs."""
+    global _total_bytes
+    try:
+        entries = []
+        for fname in os.listdir(ARCHIVE_DIR):
+            if not fname.endswith(".json.gz"):
+                continue
+            path = os.path.join(ARCHIVE_DIR, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        entries.sort()
+        for _, path, size in entries:
+            _files.append((path, size))
+            _total_bytes += size
+    except OSError:
+        pass
+
+
+def _enforce_budget():
+    global _total_bytes
+    while _files and _total_bytes > ARCHIVE_MAX_BYTES:
+        path, size = _files.popleft()
+        _total_bytes -= size
+        try:
+            os.remove(path)
+            _stats["evicted"] += 1
+        except OSError:
+            pass
+
+
+def _write_one(name, data, ts):
+    global _total_bytes
+    stamp = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(ARCHIVE_DIR, f"{_safe_name(name)}_{stamp}.json.gz")
+    tmp = path + ".tmp"
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    with gzip.open(tmp, "wb", compresslevel=6) as fh:
+        fh.write(payload)
+    os.replace(tmp, path)
+    size = os.path.getsize(path)
+    _files.append((path, size))
+    _total_bytes += size
+    _stats["written"] += 1
+    _enforce_budget()
+
+
+def _writer_loop():
+    try:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"[ARCHIVE] Cannot create {ARCHIVE_DIR}: {e}")
+    _load_existing()
+    _enforce_budget()
+    while True:
+        name, data, ts = _queue.get()
+        try:
+            _write_one(name, data, ts)
+        except Exception as e:
+            print(f"[ARCHIVE] Failed to archive {name}: {e}")
+        finally:
+            _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="raw-archive-writer", daemon=True)
+            _writer.start()
+
+
+def archive_response(name: str, data) -> bool:
+    """Queue a raw response for archiving without blocking the caller.
+
+    Args:
+        name: file name prefix, e.g. "betfair_market_1.234" or "virgin_event_123"
+        data: JSON-serializable response; it is serialized later on the writer
+              thread, so callers must not mutate it after handing it over
+
+    Returns:
+        True if the response was queued, False if archiving is disabled,
+        the response was not sampled, or the queue is full.
+    """
+    if ARCHIVE_ENABLED is None:
+        _configure()
+    if not ARCHIVE_ENABLED or data is None:
+        return False
+    if ARCHIVE_SAMPLE_RATE < 1.0 and random.random() >= ARCHIVE_SAMPLE_RATE:
+        return False
+    _ensure_writer()
+    try:
+        _queue.put_nowait((name, data, time.time()))
+    except queue.Full:
+        _stats["dropped"] += 1
+        return False
+    _stats["queued"] += 1
+    return True
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Wait (up to `timeout` seconds) for queued archives to reach disk."""
+    deadline = time.time() + timeout
+    while _queue is not None and _queue.unfinished_tasks:
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def get_stats() -> dict:
+    """Return counters for queued/written/dropped/evicted archives and bytes on disk."""
+    return dict(_stats, bytes_on_disk=_total_bytes, pending=_queue.qsize() if _queue is not None else 0)
@@ -0,0 +1,122 @@
+"""Benchmark consolidate_player_tracking's merge and write on a synthetic tracking file.
+
+Compares the previous implementation (linear scan over the tracking keys per
+merge target, list membership checks, json.dump(indent=2)) with the
+normalized-key dict / set-based merge and streaming write in virgin_goose.
+Usage: python scripts/bench_consolidate_tracking.py [entries] [mapped_fraction]
+(the baseline is quadratic: several minutes at the default 50k entries)
+"""
+import sys, os, time, json, random, tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from virgin_goose import normalize_name, _merge_tracking_entries, _write_tracking_file
+
+FIRST = ["erling", "mohamed", "bukayo", "cole", "son", "kai", "phil", "james", "luis", "joao",
+         "bruno", "marcus", "jack", "declan", "harry", "kevin", "alexis", "rodrigo", "dominic", "ollie"]
+LAST = ["haaland", "salah", "saka", "palmer", "heung-min", "havertz", "foden", "maddison", "diaz", "felix",
+        "fernandes", "rashford", "grealish", "rice", "kane", "de bruyne", "mac allister", "muniz", "solanke", "watkins"]
+SITES = ["betfair", "williamhill", "ladbrokes", "kwiff", "oddschecker"]
+
+
+def make_tracking(n_entries, mapped_fraction, seed=11):
+    """Synthetic tracking dict plus mappings that fold ~mapped_fraction of keys into other names."""
+    rnd = random.Random(seed)
+    tracking, keys = {}, []
+    for i in range(n_entries):
+        key = f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {i}"
+        first = f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T12:00:00"
+        tracking[key] = {
+            'raw_names': {site: [f"{key.title()}", f"{key.upper()} {rnd.randint(0, 3)}"]
+                          for site in rnd.sample(SITES, rnd.randint(1, 3))},
+            'first_seen': first,
+            'last_seen': first.replace('2025', '2026'),
+            'occurrence_count': rnd.randint(1, 50),
+            'team_names': [f"team {rnd.randint(0, 99)}" for _ in range(rnd.randint(0, 3))],
+            'fixtures': [f"fixture {rnd.randint(0, 4999)}" for _ in range(rnd.randint(0, 4))],
+        }
+        keys.append(key)
+    mappings = {}
+    targets = rnd.sample(keys, max(1, int(n_entries * mapped_fraction / 4)))
+    for key in rnd.sample(keys, int(n_entries * mapped_fraction)):
+        target = rnd.choice(targets)
+        # Half of the targets are existing keys, half are new preferred names
+        mappings[key] = target.title() if hash(target) % 2 else f"{target} Jr".title()
+    return tracking, mappings
+
+
+def baseline_merge(tracking_data, mappings):
+    """The pre-index second pass: re-normalize every key per merge target."""
+    new_tracking_data, entries_to_merge = {}, {}
+    for norm_key, entry in tracking_data.items():
+        preferred_name = mappings.get(norm_key)
+        if preferred_name and normalize_name(preferred_name) != norm_key:
+            entries_to_merge.setdefault((normalize_name(preferred_name), preferred_name), []).append((norm_key, entry))
+        else:
+            new_tracking_data[norm_key] = entry
+    for (target_norm_key, preferred_name), source_entries in entries_to_merge.items():
+        existing_entry_key = None
+        for existing_key in new_tracking_data.keys():
+            if normalize_name(existing_key) == target_norm_key:
+                existing_entry_key = existing_key
+                break
+        if existing_entry_key:
+            target_entry = new_tracking_data[existing_entry_key]
+        else:
+            target_entry = {'raw_names': {}, 'first_seen': None, 'last_seen': None, 'occurrence_count': 0}
+            new_tracking_data[preferred_name] = target_entry
+        for source_key, source_entry in source_entries:
+            for site, names in source_entry.get('raw_names', {}).items():
+                target_entry['raw_names'].setdefault(site, [])
+                for name in names:
+                    if name not in target_entry['raw_names'][site]:
+                        target_entry['raw_names'][site].append(name)
+            source_first, source_last = source_entry.get('first_seen'), source_entry.get('last_seen')
+            if source_first and (not target_entry['first_seen'] or source_first < target_entry['first_seen']):
+                target_entry['first_seen'] = source_first
+            if source_last and (not target_entry['last_seen'] or source_last > target_entry['last_seen']):
+                target_entry['last_seen'] = source_last
+            target_entry['occurrence_count'] += source_entry.get('occurrence_count', 0)
+            for tk in source_entry.get('team_names', []):
+                target_entry.setdefault('team_names', [])
+                if tk not in target_entry['team_names']:
+                    target_entry['team_names'].append(tk)
+            for fx in source_entry.get('fixtures', []):
+                target_entry.setdefault('fixtures', [])
+                if fx not in target_entry['fixtures']:
+                    target_entry['fixtures'].append(fx)
+        target_entry['merged_from'] = [source_key for source_key, _ in source_entries]
+    return new_tracking_data
+
+
+def baseline_write(path, data):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t, result
+
+
+if __name__ == '__main__':
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    mapped_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    tracking, mappings = make_tracking(n_entries, mapped_fraction)
+    print(f"{n_entries} entries, {len(mappings)} mapped")
+
+    # Merges mutate target entries in place, so each run gets its own copy
+    t_new, merged = timed(_merge_tracking_entries, json.loads(json.dumps(tracking)), mappings)
+    print(f"  indexed merge  : {t_new*1000:9.1f} ms  -> {len(merged)} entries")
+    t_base, merged_base = timed(baseline_merge, json.loads(json.dumps(tracking)), mappings)
+    print(f"  baseline merge : {t_base*1000:9.1f} ms  -> {len(merged_base)} entries")
+    assert merged == merged_base
+    print(f"  vs baseline    : {t_base / t_new:.1f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'player_name_tracking.json')
+        t_write, _ = timed(_write_tracking_file, path, merged)
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f) == merged
+        t_write_base, _ = timed(baseline_write, path, merged)
+        print(f"  streaming write: {t_write*1000:9.1f} ms  (json.dump indent=2: {t_write_base*1000:.1f} ms)")
@@ -0,0 +1,71 @@
+"""Benchmark OddsChecker market lookups: re-parsing the match page HTML vs the parsed metadata record.
+
+Builds a synthetic match page (many <script> tags plus the subeventmarkets
+blob) and times, per get_oddschecker_odds call, the old HTML path (read page,
+BeautifulSoup + regex for market ids, regex + json for betIds) against the
+metadata record read from memory and from cache/meta.
+Usage: python scripts/bench_oc_market_meta.py [players] [scripts]
+"""
+import sys, os, json, time, tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import oc
+
+
+def make_page(n_players, n_scripts):
+    markets = {
+        "3579339764": {"ocMarketId": 3579339764, "subeventId": 1, "marketName": "Team A v Team B#First Goalscorer"},
+        "3579339765": {"ocMarketId": 3579339765, "subeventId": 1, "marketName": "Team A v Team B#Anytime Goalscorer"},
+    }
+    bets = {}
+    for i in range(n_players):
+        bets[str(1000 + i)] = {"betName": f"Player {i}", "marketId": 3579339764}
+        bets[str(5000 + i)] = {"betName": f"Player {i}", "marketId": 3579339765}
+    blob = json.dumps({"bestOdds": {"bets": {"entities": bets}}, "markets": markets}, separators=(',', ':'))
+    filler = "".join(f"<script>window.__x{i} = {json.dumps({'k': list(range(50))})};</script>" for i in range(n_scripts))
+    body = "<div><span>x</span>" * 3000 + "</div>" * 3000
+    return (f"<html><head>{filler}</head><body>{body}"
+            f"<script>window.__data = {json.dumps({'markets': markets}, separators=(',', ':'))};</script>"
+            f'<script type="application/json" data-hypernova-key="subeventmarkets"><!--{blob}--></script>'
+            f"</body></html>")
+
+
+def bench(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+if __name__ == '__main__':
+    if oc.BeautifulSoup is None:
+        sys.exit("beautifulsoup4 is required for the HTML baseline")
+    n_players = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    n_scripts = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    html = make_page(n_players, n_scripts)
+    with tempfile.TemporaryDirectory() as tmp:
+        oc.CACHE_DIR = tmp
+        page_path = os.path.join(tmp, 'page.html')
+        with open(page_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+        def html_path():
+            with open(page_path, 'r', encoding='utf-8') as f:
+                return oc._parse_market_page(f.read())
+
+        t_html, meta = bench(html_path)
+        oc._ensure_cache_dirs()
+        oc._write_cache(oc._market_meta_path('a/b'), meta)
+
+        def disk_path():
+            oc._MARKET_META.clear()
+            return oc.get_oddschecker_market_meta('a/b')
+
+        t_disk, meta_disk = bench(disk_path)
+        t_mem, meta_mem = bench(lambda: oc.get_oddschecker_market_meta('a/b'))
+    assert meta_disk == meta_mem and oc._market_ids_from_meta(meta_mem)['fgs'] == '3579339764'
+    print(f"page {len(html) / 1024:.0f} KB, {n_players} players, {n_scripts} scripts")
+    print(f"  parse HTML     : {t_html * 1000:8.3f} ms/call")
+    print(f"  metadata (disk): {t_disk * 1000:8.3f} ms/call  ({t_html / t_disk:.0f}x)")
+    print(f"  metadata (mem) : {t_mem * 1e6:8.3f} us/call  ({t_html / t_mem:.0f}x)")
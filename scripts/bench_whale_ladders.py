@@ -0,0 +1,88 @@
+"""Benchmark whale's liquidity scan on a synthetic sweep (default 600 markets x 30 runners).
+
+Compares the old per-runner helper loop, the single-pass Python scan (default)
+and the NumPy scan (WHALE_VECTOR_SCAN=1).
+Usage: python scripts/bench_whale_ladders.py [markets] [runners] [levels]
+"""
+import sys, os, time, random
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import whale_ladders
+from whale_ladders import scan_ladders, _scan_ladders_py
+from whale_stream import PriceSize
+
+
+def make_books(n_markets, n_runners, levels, seed=7):
+    rnd = random.Random(seed)
+    books = []
+    for m in range(n_markets):
+        runners = []
+        for sid in range(n_runners):
+            base = rnd.uniform(1.5, 30.0)
+            lays = [PriceSize(round(base + 0.1 * i, 2), round(rnd.expovariate(1 / 40.0), 2)) for i in range(rnd.randint(0, levels))]
+            backs = [PriceSize(round(base - 0.1, 2), round(rnd.expovariate(1 / 80.0), 2))] if lays else []
+            runners.append(SimpleNamespace(selection_id=sid, last_price_traded=base,
+                                           ex=SimpleNamespace(available_to_lay=lays, available_to_back=backs)))
+        books.append(SimpleNamespace(market_id=f"1.{m}", runners=runners))
+    return books
+
+
+def baseline_scan(books, levels, thresholds, near_pct, near_min):
+    """The pre-vectorization per-runner loop (helper calls + [NEAR] string formatting)."""
+    def sum_lay_levels(runner, levels):
+        ats = (runner.ex.available_to_lay or [])[:levels] if getattr(runner, "ex", None) else []
+        return sum(l.size for l in ats)
+
+    def best_tuple(side):
+        try:
+            lvl = (side or [])[0]
+            return (lvl.price, lvl.size)
+        except Exception:
+            return (None, None)
+
+    def lay_levels_list(runner, levels):
+        lays = runner.ex.available_to_lay or []
+        return [(lays[i].price, lays[i].size) for i in range(min(levels, len(lays)))]
+
+    crossing, near = [], []
+    for mb in books:
+        threshold = thresholds[mb.market_id]
+        for r in mb.runners:
+            lay_size = sum_lay_levels(r, levels)
+            if lay_size >= max(near_min, threshold * near_pct):
+                levels_str = " ".join(f"L{i+1}=£{int(sz)}@{pr}" for i, (pr, sz) in enumerate(lay_levels_list(r, levels)))
+                near.append(f"[NEAR] {mb.market_id} | {levels_str} | £{int(lay_size)}")
+            if lay_size >= threshold:
+                crossing.append((r, best_tuple(r.ex.available_to_back), best_tuple(r.ex.available_to_lay)))
+    return crossing, near
+
+
+def bench(fn, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+if __name__ == '__main__':
+    n_markets = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    n_runners = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    levels = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    books = make_books(n_markets, n_runners, levels)
+    thresholds = {mb.market_id: (200.0 if i % 2 else 750.0) for i, mb in enumerate(books)}
+    print(f"{n_markets} markets x {n_runners} runners, top {levels} levels")
+
+    t_base, (cross_base, near_base) = bench(baseline_scan, books, levels, thresholds, 0.7, 150.0)
+    print(f"  baseline    : {t_base*1000:8.2f} ms  crossing={len(cross_base)} near={len(near_base)}")
+    t_py, (cross_py, near_py) = bench(_scan_ladders_py, books, levels, thresholds, 0.7, 150.0)
+    print(f"  python loop : {t_py*1000:8.2f} ms  crossing={len(cross_py)} near={len(near_py)}")
+    if whale_ladders.np is None:
+        print("  numpy not installed; vectorized scan unavailable")
+        sys.exit(0)
+    print(f"  vs baseline : {t_base / t_py:.2f}x (python loop)")
+    t_np, (cross_np, near_np) = bench(scan_ladders, books, levels, thresholds, 0.7, 150.0, True)
+    print(f"  vectorized  : {t_np*1000:8.2f} ms  crossing={len(cross_np)} near={len(near_np)}")
+    assert len(cross_np) == len(cross_py) and len(near_np) == len(near_py)
+    print(f"  vs baseline : {t_base / t_np:.2f}x (vectorized)")
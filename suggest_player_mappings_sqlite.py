@@ -7,17 +7,31 @@ Finds potential player name duplicates and auto-adds approved mappings.
 from typing import List, Tuple, Optional, Set, Dict
 from difflib import SequenceMatcher
 from player_db import get_db
+import os
 import time
 import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 # Prefer rapidfuzz for speed; fall back to difflib.SequenceMatcher on failure
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     HAVE_RAPIDFUZZ = True
 except Exception:
     HAVE_RAPIDFUZZ = False
 
+# rapidfuzz's batch scorers (cdist/cpdist) return NumPy arrays
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+# Candidate pairs scored per batch (bounds the memory of the name/score arrays)
+SCORE_BATCH_SIZE = 50000
+# Below this many pairs a process pool costs more than it saves (difflib fallback only)
+PARALLEL_MIN_PAIRS = 20000
+
 
 def fuzzy_match_score(name1: str, name2: str) -> Tuple[float, List[str]]:
     """
@@ -94,6 +108,59 @@ def _score_names(a: str, b: str) -> Tuple[float, List[str]]:
         return score_raw, matching
 
 
+def _score_batch_difflib(pairs: List[Tuple[str, str]]) -> List[float]:
+    return [SequenceMatcher(None, a.lower(), b.lower()).ratio() for a, b in pairs]
+
+
+def _score_pairs(pairs: List[Tuple[str, str]], workers: int = -1) -> Tuple[List[float], str]:
+    """Score candidate pairs with the same scorer as _score_names, in batches across cores.
+
+    Returns (scores, method) where method describes the scorer used, for [PERF] output.
+    """
+    if not pairs:
+        return [], "none"
+    cpu_workers = workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+    if HAVE_RAPIDFUZZ and not HAVE_NUMPY:
+        return [fuzz.token_set_ratio(a, b) / 100.0 for a, b in pairs], "rapidfuzz, workers=1"
+
+    if HAVE_RAPIDFUZZ:
+        scores: List[float] = []
+        # cpdist (rapidfuzz >= 3.6) scores element-wise pairs; older versions get
+        # one cdist row per query name against its own candidates
+        pairwise = hasattr(process, 'cpdist')
+        for start in range(0, len(pairs), SCORE_BATCH_SIZE):
+            batch = pairs[start:start + SCORE_BATCH_SIZE]
+            if pairwise:
+                raw = process.cpdist([a for a, _ in batch], [b for _, b in batch],
+                                     scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+                scores.extend(float(v) / 100.0 for v in raw)
+                continue
+            i = 0
+            while i < len(batch):
+                query = batch[i][0]
+                j = i
+                while j < len(batch) and batch[j][0] == query:
+                    j += 1
+                row = process.cdist([query], [b for _, b in batch[i:j]],
+                                    scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)[0]
+                scores.extend(float(v) / 100.0 for v in row)
+                i = j
+        return scores, f"rapidfuzz {'cpdist' if pairwise else 'cdist'}, workers={cpu_workers}"
+
+    if len(pairs) < PARALLEL_MIN_PAIRS or cpu_workers == 1:
+        return _score_batch_difflib(pairs), "difflib, workers=1"
+    chunk = max(1000, len(pairs) // (cpu_workers * 4))
+    batches = [pairs[i:i + chunk] for i in range(0, len(pairs), chunk)]
+    try:
+        with ProcessPoolExecutor(max_workers=cpu_workers) as pool:
+            scores = [score for part in pool.map(_score_batch_difflib, batches) for score in part]
+        return scores, f"difflib, workers={cpu_workers}"
+    except Exception as e:
+        print(f"[PERF] Parallel scoring unavailable ({e}); scoring serially")
+        return _score_batch_difflib(pairs), "difflib, workers=1"
+
+
 def find_potential_duplicates(score_threshold: float = 0.75, max_candidates_per_name: int = 500) -> List[Tuple[str, str, float, List[str]]]:
     """
     Find potential duplicate/variant player names using database with token-blocking and in-memory caches.
@@ -102,6 +169,8 @@ def find_potential_duplicates(score_threshold: float = 0.75, max_candidates_per_
     - Build token and surname indices to only compare likely candidates (drastically reduces O(n^2)).
     - Preload mappings, skipped pairs, and team sets into memory to avoid per-pair DB calls.
     - Use RapidFuzz when available for fast fuzzy scoring.
+    - Preload teams, raw names and fixtures with one GROUP BY query (get_player_profiles).
+    - Score all candidate pairs in batches (RapidFuzz cpdist/cdist across cores when available).
     """
     db = get_db()
 
@@ -116,77 +185,97 @@ def find_potential_duplicates(score_threshold: float = 0.75, max_candidates_per_
     skipped_pairs_db = db.get_all_skipped_pairs() if hasattr(db, 'get_all_skipped_pairs') else set()
     skipped_pairs = {tuple(sorted(p)) for p in skipped_pairs_db}  # normalize ordering
 
-    # Preload teams to avoid DB hits
-    teams_cache: Dict[str, Set[str]] = {}
+    # Teams, raw names and fixtures for every player in a single aggregated query
+    profiles = db.get_player_profiles()
+    no_teams: Set[str] = set()
+    teams_cache: Dict[str, Set[str]] = {name: profiles.get(name, {}).get('teams', no_teams) for name in player_names}
+    load_elapsed = time.time() - start
+
+    # Names grouped by exact team set; a name only pairs with names on the same
+    # team set or with no team data (anything else is a team conflict)
+    names_by_teams: Dict[frozenset, Set[str]] = defaultdict(set)
+    teamless: Set[str] = set()
     for name in player_names:
-        try:
-            teams_cache[name] = set(db.get_player_teams(name) or [])
-        except Exception:
-            teams_cache[name] = set()
+        teams = teams_cache[name]
+        if teams:
+            names_by_teams[frozenset(teams)].add(name)
+        else:
+            teamless.add(name)
 
     # Build token index and surname index
+    tokens_by_name: Dict[str, Set[str]] = {}
     token_index: Dict[str, Set[str]] = defaultdict(set)
     surname_index: Dict[str, Set[str]] = defaultdict(set)
 
     for name in player_names:
-        for tok in _tokenize_name(name):
+        tokens = _tokenize_name(name)
+        tokens_by_name[name] = tokens
+        if name in mappings:
+            continue
+        for tok in tokens:
             token_index[tok].add(name)
         sname = _surname(name)
         if sname:
             surname_index[sname].add(name)
 
-    duplicates: List[Tuple[str, str, float, List[str]]] = []
     seen_pairs = set()
+    pairs: List[Tuple[str, str]] = []
 
     total_candidates = 0
 
-    for i, name in enumerate(player_names):
+    for name in player_names:
         if name in mappings:
             continue
 
         # Gather candidates via shared tokens and surname
-        tokens = _tokenize_name(name)
+        tokens = tokens_by_name[name]
         candidates = set()
         for t in tokens:
-            candidates.update(token_index.get(t, set()))
+            candidates.update(token_index.get(t, ()))
         s = _surname(name)
         if s:
-            candidates.update(surname_index.get(s, set()))
+            candidates.update(surname_index.get(s, ()))
 
-        # Remove self and mapped names
+        # Remove self (mapped names are not indexed)
         candidates.discard(name)
-        candidates = {c for c in candidates if c not in mappings}
+        too_many = len(candidates) > max_candidates_per_name
+
+        # Skip conflicting team data (set intersections rather than per-pair checks)
+        teams_a = teams_cache[name]
+        if teams_a:
+            candidates = (candidates & names_by_teams[frozenset(teams_a)]) | (candidates & teamless)
 
         # Limit candidate explosion for very common tokens
-        if len(candidates) > max_candidates_per_name:
+        if too_many:
             # Keep only those that share at least 2 tokens if too many
-            candidates = {c for c in candidates if len(_tokenize_name(c) & tokens) >= 2}
+            candidates = {c for c in candidates if len(tokens_by_name[c] & tokens) >= 2}
 
-        # Convert to list and cap to reasonable number (deterministic order)
-        cand_list = sorted(candidates)
-        total_candidates += len(cand_list)
+        total_candidates += len(candidates)
 
-        for cand in cand_list:
-            pair = tuple(sorted([name, cand]))
+        # Deterministic order
+        for cand in sorted(candidates):
+            pair = (name, cand) if name < cand else (cand, name)
             if pair in seen_pairs or pair in skipped_pairs:
                 continue
             seen_pairs.add(pair)
+            pairs.append((name, cand))
 
-            # Skip if conflicting team data
-            teams_a = teams_cache.get(name, set())
-            teams_b = teams_cache.get(cand, set())
-            if teams_a and teams_b and teams_a != teams_b:
-                continue
-
-            score, matching = _score_names(name, cand)
-            if score >= score_threshold:
-                duplicates.append((name, cand, score, matching))
+    candidates_elapsed = time.time() - start - load_elapsed
 
+    scores, score_method = _score_pairs(pairs)
+    duplicates: List[Tuple[str, str, float, List[str]]] = [
+        (a, b, score, sorted(tokens_by_name[a] & tokens_by_name[b]))
+        for (a, b), score in zip(pairs, scores)
+        if score >= score_threshold
+    ]
     duplicates.sort(key=lambda x: x[2], reverse=True)
 
     elapsed = time.time() - start
+    score_elapsed = elapsed - load_elapsed - candidates_elapsed
     avg_candidates = (total_candidates / len(player_names)) if player_names else 0
-    print(f"[PERF] Scanned {len(player_names)} players, total candidate checks={total_candidates}, avg per name={avg_candidates:.2f}, found {len(duplicates)} potential matches in {elapsed:.2f}s")
+    print(f"[PERF] Scanned {len(player_names)} players, total candidate checks={total_candidates}, avg per name={avg_candidates:.2f}, "
+          f"scored {len(pairs)} pairs ({score_method}), found {len(duplicates)} potential matches in {elapsed:.2f}s "
+          f"(load {load_elapsed:.2f}s, candidates {candidates_elapsed:.2f}s, scoring {score_elapsed:.2f}s)")
 
     return duplicates
 
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Team-name matching shared by the Kwiff auto-mapper (kwiff/server) and
+accafreeze.
+
+Names match when one normalized form contains the other, with a few
+known aliases (TEAM_ALIASES) for short names a substring check can't
+connect. TeamNameIndex answers the same question for many names at once.
+Kickoff buckets rule out same-named teams playing a different fixture.
+"""
+
+from datetime import datetime, timezone
+
+
+# Short names the feeds use that a substring check can't connect to the
+# full club name. Keys and values are normalized (see normalize_team_name).
+TEAM_ALIASES = {
+    'wolves': 'wolverhampton',
+    'spurs': 'tottenham',
+    'man utd': 'manchester united',
+    'man united': 'manchester united',
+    'man city': 'manchester city',
+    'nottm forest': 'nottingham forest',
+    "nott'm forest": 'nottingham forest',
+    'west brom': 'west bromwich',
+    'sheff utd': 'sheffield united',
+    'sheff wed': 'sheffield wednesday',
+    'qpr': 'queens park rangers',
+    'psg': 'paris saint-germain',
+    'paris st-g': 'paris saint-germain',
+}
+
+# Kickoffs further apart than this are never treated as the same fixture.
+# Generous enough to absorb a feed reporting UK local time without an offset.
+KICKOFF_BUCKET_SECONDS = 3600
+KICKOFF_SLACK_BUCKETS = 3
+
+
+def normalize_team_name(name):
+    """Normalize team name for comparison."""
+    if not name:
+        return ""
+    return name.lower().strip()
+
+
+def team_name_forms(name):
+    """Normalized name plus its known alias, if any."""
+    normalized = normalize_team_name(name)
+    if not normalized:
+        return ()
+    alias = TEAM_ALIASES.get(normalized)
+    return (normalized, alias) if alias else (normalized,)
+
+
+def _forms_match(t1, t2, min_substring_len=0):
+    if t1 == t2:
+        return True
+    if len(t1) < min_substring_len or len(t2) < min_substring_len:
+        return False
+    return t1 in t2 or t2 in t1
+
+
+def team_name_matches(team1, team2):
+    """Check if two team names match.
+    
+    Returns True if:
+    - One name is entirely contained in the other
+    - They are identical after normalization
+    - Either of the above holds for a known alias (see TEAM_ALIASES)
+    """
+    forms2 = team_name_forms(team2)
+    return any(_forms_match(t1, t2) for t1 in team_name_forms(team1) for t2 in forms2)
+
+
+def match_teams(local_home, local_away, api_home, api_away):
+    """Check if teams match between local events and API data.
+    
+    Returns True if AT LEAST ONE team name matches.
+    This allows flexibility in match identification.
+    """
+    # Check if local home matches either API team
+    home_matches = team_name_matches(local_home, api_home) or team_name_matches(local_home, api_away)
+    
+    # Check if local away matches either API team
+    away_matches = team_name_matches(local_away, api_home) or team_name_matches(local_away, api_away)
+    
+    # Return true if at least one team matches
+    return home_matches or away_matches
+
+
+class TeamNameIndex:
+    """
+    Team names indexed for team_name_matches-style lookups.
+    
+    Each name is stored under its normalized forms (name plus alias). A query
+    only checks forms that can possibly match it:
+    - forms containing the query contain every trigram of it, so only the
+      bucket of its rarest trigram is checked
+    - forms contained in the query have all their trigrams in it; each form
+      is keyed by its own rarest trigram and only keys found in the query
+      are checked
+    Forms shorter than a trigram are few and always checked.
+    
+    Values are returned in the order they were added, so callers keep
+    "first match wins" semantics.
+    """
+    
+    GRAM = 3
+    
+    def __init__(self, entries=(), min_substring_len=0):
+        """
+        Args:
+            entries: iterable of (team_name, value) pairs
+            min_substring_len: substring matches need both forms at least
+                this long; exact matches always count
+        """
+        self.min_substring_len = min_substring_len
+        self._forms = []        # (form, position, value)
+        self._exact = {}        # form -> form ids
+        self._grams = {}        # trigram -> form ids of forms containing it
+        self._key_gram = None   # rarest trigram of form -> form ids, built on lookup
+        self._short = []        # ids of forms shorter than GRAM
+        for name, value in entries:
+            self.add(name, value)
+    
+    def __len__(self):
+        return len(self._forms)
+    
+    def add(self, name, value):
+        """Index a team name; `value` is what lookup() returns for it."""
+        position = len(self._forms)
+        for form in team_name_forms(name):
+            form_id = len(self._forms)
+            self._forms.append((form, position, value))
+            self._exact.setdefault(form, []).append(form_id)
+            if len(form) < self.GRAM:
+                self._short.append(form_id)
+                continue
+            for gram in self._trigrams(form):
+                self._grams.setdefault(gram, []).append(form_id)
+        self._key_gram = None
+    
+    def _trigrams(self, text):
+        return {text[i:i + self.GRAM] for i in range(len(text) - self.GRAM + 1)}
+    
+    def _build_key_grams(self):
+        self._key_gram = {}
+        for form_id, (form, _, _) in enumerate(self._forms):
+            if len(form) >= self.GRAM:
+                key = min(sorted(self._trigrams(form)), key=lambda g: len(self._grams[g]))
+                self._key_gram.setdefault(key, []).append(form_id)
+    
+    def _candidate_ids(self, query):
+        ids = set(self._exact.get(query, ()))
+        if len(query) >= self.GRAM:
+            if self._key_gram is None:
+                self._build_key_grams()
+            grams = self._trigrams(query)
+            # Forms containing the query
+            rarest = min(grams, key=lambda g: len(self._grams.get(g, ())))
+            ids.update(self._grams.get(rarest, ()))
+            # Forms contained in the query
+            for gram in grams:
+                ids.update(self._key_gram.get(gram, ()))
+        else:
+            ids.update(range(len(self._forms)))
+        ids.update(self._short)
+        return ids
+    
+    def lookup(self, name):
+        """Values whose team name matches `name`, in insertion order."""
+        hits = {}
+        for query in team_name_forms(name):
+            for form_id in self._candidate_ids(query):
+                form, position, value = self._forms[form_id]
+                if position not in hits and _forms_match(query, form, self.min_substring_len):
+                    hits[position] = value
+        return [hits[position] for position in sorted(hits)]
+
+
+def kickoff_bucket(value):
+    """Hour bucket (hours since epoch) for an ISO kickoff string, or None."""
+    if not value:
+        return None
+    try:
+        ko = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if ko.tzinfo is None:
+        ko = ko.replace(tzinfo=timezone.utc)
+    return int(ko.timestamp() // KICKOFF_BUCKET_SECONDS)
+
+
+def kickoffs_compatible(bucket1, bucket2):
+    """True unless both kickoffs are known and too far apart."""
+    if bucket1 is None or bucket2 is None:
+        return True
+    return abs(bucket1 - bucket2) <= KICKOFF_SLACK_BUCKETS
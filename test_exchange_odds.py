@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests for the shared exchange-odds snapshot layer."""
+
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import json
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import exchange_odds
+from exchange_odds import compact_markets, exchange_odds_view, get_snapshot, parse_timestamp
+
+NOW = datetime(2026, 1, 10, 15, 0, tzinfo=timezone.utc)
+
+
+def _odd(site, outcome, lay, age, liquidity=None, fmt='naive'):
+    t = NOW - timedelta(seconds=age)
+    last_updated = {'naive': t.replace(tzinfo=None).isoformat(), 'z': t.replace(tzinfo=None).isoformat() + 'Z',
+                    'offset': t.isoformat()}[fmt]
+    return {'site_name': site, 'outcome_name': outcome, 'lay_odds': lay,
+            'last_updated': last_updated, 'lay_liquidity': liquidity}
+
+
+MARKETS = [
+    {'market_name': 'Anytime Goalscorer', 'odds': [
+        _odd('smarkets', 'Erling Haaland', 2.0, 30, '150.5'),
+        _odd('smarkets_ws', 'Erling Haaland', 1.98, 10, 90, fmt='z'),
+        _odd('matchbook', 'Erling Haaland', 2.04, 20, fmt='offset'),
+        _odd('betfair', 'Erling Haaland', 2.02, 5),
+        _odd('matchbook_ws', 'Phil Foden', 4.5, 600),     # stale
+        _odd('matchbook', 'Phil Foden', 4.6, 60),
+    ]},
+    {'market_name': 'Match Odds', 'odds': [_odd('smarkets', 'Home', 2.0, 5)]},
+]
+
+
+def test_parse_timestamp_formats():
+    expected = NOW.timestamp()
+    assert parse_timestamp(NOW.replace(tzinfo=None).isoformat()) == expected
+    assert parse_timestamp(NOW.replace(tzinfo=None).isoformat() + 'Z') == expected
+    assert parse_timestamp(NOW.astimezone(timezone(timedelta(hours=1))).isoformat()) == expected
+    assert parse_timestamp(1767225600) == 1767225600.0
+    assert parse_timestamp('not a time') is None
+
+
+def test_view_prefers_websocket_and_drops_stale():
+    view = exchange_odds_view(compact_markets(MARKETS), normalize=str.lower, now=NOW.timestamp())
+    assert list(view) == ['Anytime Goalscorer']
+    haaland = view['Anytime Goalscorer']['Erling Haaland']
+    assert [(e['site_name'], e['lay_odds'], e['is_websocket']) for e in haaland] == [
+        ('Smarkets', 1.98, True), ('Matchbook', 2.04, False)]
+    assert haaland[0]['liquidity'] == 90.0 and haaland[0]['norm'] == 'erling haaland'
+    assert [(e['site_name'], e['lay_odds']) for e in view['Anytime Goalscorer']['Phil Foden']] == [('Matchbook', 4.6)]
+
+    plain = exchange_odds_view(compact_markets(MARKETS), prefer_websocket=False, sites={'smarkets'}, now=NOW.timestamp())
+    assert [e['lay_odds'] for e in plain['Anytime Goalscorer']['Erling Haaland']] == [2.0]
+    assert 'Phil Foden' not in plain['Anytime Goalscorer']
+
+
+def test_runner_layout():
+    data = [{'name': 'Anytime Goal Scorer', 'runners': [
+        {'name': 'Cole Palmer', 'id': 1, 'smarkets': {'lay_price': 3.2, 'last_updated': NOW.timestamp() - 60},
+         'betfair': {'lay_price': 3.1, 'last_updated': NOW.timestamp()}},
+        {'name': 'Bukayo Saka', 'smarkets': {'lay_price': 3.9}},   # no timestamp -> stale
+    ]}]
+    view = exchange_odds_view(compact_markets(data), prefer_websocket=False, sites={'smarkets'}, now=NOW.timestamp())
+    assert view == {'Anytime Goalscorer': {'Cole Palmer': [
+        {'site_name': 'Smarkets', 'lay_odds': 3.2, 'last_updated': NOW.timestamp() - 60, 'liquidity': None}]}}
+
+
+def test_snapshot_fetched_once_per_ttl_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(exchange_odds, 'EXCHANGE_ODDS_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(exchange_odds, '_snapshots', {})
+    calls = []
+
+    def get(url, headers, timeout):
+        calls.append(url)
+        return SimpleNamespace(status_code=200, text=json.dumps(MARKETS), headers={})
+
+    session = SimpleNamespace(get=get)
+    first = get_snapshot(42, ttl=60, session=session)
+    assert get_snapshot(42, ttl=60, session=session) is first
+    assert (tmp_path / '42.json').exists()
+
+    # Another process starts with an empty memory cache and reads the file
+    monkeypatch.setattr(exchange_odds, '_snapshots', {})
+    assert get_snapshot(42, ttl=60, session=session) == first
+    assert len(calls) == 1
+
+    get_snapshot(42, ttl=0, session=session)
+    assert len(calls) == 2
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Tests for the persistent OddsChecker slug store."""
+
+from pathlib import Path
+import shutil
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import oc
+
+
+def _restart(monkeypatch):
+    """Forget everything a process keeps in memory."""
+    monkeypatch.setattr(oc, '_SLUG_CACHE', {})
+    monkeypatch.setattr(oc, '_slug_store_mtime', None)
+
+
+def test_slug_store_survives_cache_clear(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(oc, 'CACHE_DIR', str(cache_dir))
+    monkeypatch.setattr(oc, 'SLUG_STORE_DIR', str(tmp_path / "data"))
+    monkeypatch.delenv("OC_SLUG_STORE", raising=False)
+    _restart(monkeypatch)
+    requests_made = []
+
+    def request_slugs(betfair_ids):
+        requests_made.append(list(betfair_ids))
+        return {'34000001': 'english/premier-league/arsenal-v-chelsea'}
+
+    monkeypatch.setattr(oc, '_request_slugs', request_slugs)
+    assert oc.get_oddschecker_match_slug('34000001') == 'english/premier-league/arsenal-v-chelsea'
+    assert len(requests_made) == 1
+
+    # whale clears cache/ on start-up and at midnight, then the process restarts
+    cache_dir.mkdir(exist_ok=True)
+    shutil.rmtree(cache_dir)
+    _restart(monkeypatch)
+
+    assert oc.get_oddschecker_match_slug('34000001') == 'english/premier-league/arsenal-v-chelsea'
+    assert len(requests_made) == 1
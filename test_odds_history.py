@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests for the columnar odds-history store against the JSON analysis path."""
+
+from pathlib import Path
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+np = pytest.importorskip("numpy")
+
+from odds_history import OddsHistory, parse_ts
+from analyze_wh_base_vs_combo import collect_changes, collect_changes_columnar
+
+PLAYERS = ["Erling Haaland", "Phil Foden", "Bukayo Saka", "Cole Palmer"]
+
+
+def _write_tracking(directory, match_id, snapshots=40, seed=3):
+    """Combo and base tracking files shaped like virgin_goose's trackers."""
+    rnd = random.Random(seed)
+    combo = {'match_id': match_id, 'match_name': 'Home v Away', 'records': []}
+    base = {'match_id': match_id, 'match_name': 'Home v Away', 'records': []}
+    odds = {(p, m): rnd.choice([2.5, 3.0, 4.0]) for p in PLAYERS for m in ('AGS', 'FGS')}
+    for i in range(snapshots):
+        ts = f"2026-01-10T15:{i // 60:02d}:{i % 60:02d}.{rnd.randint(0, 999999):06d}+00:00"
+        for key in rnd.sample(list(odds), 3):
+            odds[key] = rnd.choice([2.5, 3.0, 4.0, 5.0])
+        base['records'].append({'timestamp': ts, 'run_number': i,
+                                'odds': {f"{p}|{m}": o for (p, m), o in odds.items()}})
+        player, market = rnd.choice(list(odds))
+        combo_ts = ts if rnd.random() < 0.3 else ts.replace('+00:00', '').rstrip('0123456789') + '500000+00:00'
+        combo['records'].append({'timestamp': combo_ts, 'player_name': player, 'market_type': market,
+                                 'wh_odds': odds[(player, market)] * 1.5, 'boosted_odds': odds[(player, market)] * 1.6,
+                                 'lay_odds': 4.0, 'run_number': i})
+    for name, data in ((f"{match_id}.json", combo), (f"{match_id}_base.json", base)):
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    return combo, base
+
+
+def _history(tmp_path):
+    tracking = tmp_path / "wh_odds_tracking"
+    tracking.mkdir()
+    sources = {'wh_combo': (str(tracking), '.json'), 'wh_base': (str(tracking), '_base.json')}
+    return tracking, OddsHistory(cache_dir=str(tmp_path / "cache"), sources=sources)
+
+
+def test_columnar_changes_match_json_analysis(tmp_path):
+    tracking, history = _history(tmp_path)
+    combo_data, base_data = _write_tracking(str(tracking), "OB_EV1")
+
+    base_json, combo_json = collect_changes(combo_data, base_data)
+    base_col, combo_col = collect_changes_columnar(history.load("OB_EV1", 'wh_combo'), history.load("OB_EV1", 'wh_base'))
+
+    def normalize(changes):
+        return sorted((parse_ts(ts), repr(sorted(c.items()))) for ts, rows in changes.items() for c in rows)
+
+    assert normalize(base_col) == normalize(base_json)
+    assert normalize(combo_col) == normalize(combo_json)
+
+
+def test_range_asof_and_cache_refresh(tmp_path):
+    tracking, history = _history(tmp_path)
+    combo_data, _ = _write_tracking(str(tracking), "OB_EV2")
+    assert history.match_ids('wh_combo') == ["OB_EV2"]
+
+    frame = history.load("OB_EV2", 'wh_combo')
+    assert os.path.exists(tmp_path / "cache" / "wh_combo" / "OB_EV2.npz")
+    first = combo_data['records'][0]
+    t0 = parse_ts(first['timestamp'])
+    assert frame.asof(first['player_name'], first['market_type'], t0) == first['wh_odds']
+    assert frame.asof(first['player_name'], first['market_type'], t0 - 1) is None
+
+    window = frame.range(t0, t0 + 10, player=first['player_name'])
+    expected = [r for r in combo_data['records']
+                if r['player_name'] == first['player_name'] and t0 <= parse_ts(r['timestamp']) < t0 + 10]
+    assert len(window) == len(expected)
+    assert sorted(window.price.tolist()) == sorted(r['wh_odds'] for r in expected)
+
+    # A fresh store reads the .npz; a newer JSON file invalidates it
+    reloaded = OddsHistory(cache_dir=history.cache_dir, sources=history.sources).load("OB_EV2", 'wh_combo')
+    assert reloaded.keys == frame.keys and np.array_equal(reloaded.price, frame.price)
+    combo_data['records'].append(dict(first, timestamp="2026-01-11T00:00:00+00:00", wh_odds=99.0))
+    with open(tracking / "OB_EV2.json", 'w', encoding='utf-8') as f:
+        json.dump(combo_data, f)
+    later = os.path.getmtime(tmp_path / "cache" / "wh_combo" / "OB_EV2.npz") + 5
+    os.utime(tracking / "OB_EV2.json", (later, later))
+    refreshed = history.load("OB_EV2", 'wh_combo')
+    assert len(refreshed) == len(frame) + 1
+    assert refreshed.asof(first['player_name'], first['market_type'], parse_ts("2026-01-12T00:00:00+00:00")) == 99.0
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests for the shared OddsMatcha client (TTL cache, conditional GETs, single-flight)."""
+
+from pathlib import Path
+from types import SimpleNamespace
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import oddsmatcha
+
+
+class FakeSession:
+    """Answers like the API: 304 when If-None-Match matches the current ETag."""
+
+    def __init__(self, payload, delay=0.0):
+        self.payload = payload
+        self.version = 1
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, headers, timeout):
+        self.calls.append((url, dict(headers)))
+        time.sleep(self.delay)
+        etag = f'"v{self.version}"'
+        if headers.get('If-None-Match') == etag:
+            return SimpleNamespace(status_code=304, text='', headers={'ETag': etag})
+        return SimpleNamespace(status_code=200, text=json.dumps(self.payload), headers={'ETag': etag})
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(oddsmatcha, '_cache', {})
+    monkeypatch.setattr(oddsmatcha, '_in_flight', {})
+    oddsmatcha.loop_stats()
+
+
+def test_endpoint_names():
+    assert oddsmatcha.endpoint_name(oddsmatcha.build_url('offers/13')) == 'offers'
+    assert oddsmatcha.endpoint_name(oddsmatcha.build_url('matches/', {'next_days': 0})) == 'matches'
+    assert oddsmatcha.endpoint_name(oddsmatcha.build_url('matches/42')) == 'match'
+    assert oddsmatcha.endpoint_name('https://api.oddsmatcha.uk/matches/42/markets/') == 'markets'
+    assert oddsmatcha.endpoint_name('https://api.oddsmatcha.uk/convert/site_to_site?source_site=betfair') == 'convert'
+
+
+def test_ttl_cache_then_conditional_revalidation():
+    session = FakeSession({'matches': [1, 2]})
+    first = oddsmatcha.get('offers/1', ttl=60, session=session)
+    assert oddsmatcha.get('offers/1', ttl=60, session=session) is first
+    assert len(session.calls) == 1
+
+    # Expired: revalidated with the ETag, 304 keeps the cached body
+    again = oddsmatcha.get('offers/1', ttl=0, session=session)
+    assert again is first and again.json() == {'matches': [1, 2]}
+    assert session.calls[-1][1] == {'If-None-Match': '"v1"'}
+
+    session.payload, session.version = {'matches': [3]}, 2
+    assert oddsmatcha.get_json('offers/1', ttl=0, session=session) == {'matches': [3]}
+
+    stats = oddsmatcha.loop_stats()['offers']
+    assert (stats['calls'], stats['cached'], stats['requests'], stats['not_modified']) == (4, 1, 3, 1)
+    assert oddsmatcha.loop_stats() == {}
+
+
+def test_concurrent_identical_requests_are_coalesced():
+    session = FakeSession({'home_lineup': {}}, delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(oddsmatcha.get('lineups/7', session=session)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(session.calls) == 1
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    stats = oddsmatcha.loop_stats()['lineups']
+    assert stats['requests'] == 1 and stats['coalesced'] == 4
+
+
+def test_errors_are_returned_uncached():
+    session = FakeSession({})
+    session.get = lambda url, headers, timeout: SimpleNamespace(status_code=503, text='busy', headers={})
+    resp = oddsmatcha.get('offers/9', session=session)
+    assert not resp.ok and resp.status_code == 503
+    with pytest.raises(oddsmatcha.requests.HTTPError):
+        resp.raise_for_status()
+    assert oddsmatcha._cache == {}
+    assert oddsmatcha.loop_summary().startswith('[ODDSMATCHA] offers 1 calls/1 req, 1 err')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Tests for PlayerDatabase merges and tracking retention."""
+
+from pathlib import Path
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from player_db import PlayerDatabase
+
+
+def _db(tmp_path):
+    db = PlayerDatabase(str(tmp_path / "players.db"))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tracking_unique
+            ON player_tracking(player_key, site_name, team_name, fixture)
+        """)
+    return db
+
+
+def _sight(db, key, site, team, fixture, seen_at, count=1):
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            INSERT INTO player_tracking (player_key, raw_name, site_name, team_name, fixture, seen_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (key, key.title(), site, team, fixture, seen_at))
+        conn.execute("""
+            INSERT INTO player_stats (player_key, first_seen, last_seen, occurrence_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(player_key) DO UPDATE SET
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen),
+                occurrence_count = occurrence_count + excluded.occurrence_count
+        """, (key, seen_at, seen_at, count))
+
+
+def _rows(db, key):
+    with sqlite3.connect(db.db_path) as conn:
+        return sorted(conn.execute("""
+            SELECT site_name, team_name, fixture, seen_at FROM player_tracking
+            WHERE player_key = ?
+        """, (key,)).fetchall(), key=repr)
+
+
+def test_merge_player_key_dedupes_and_rekeys(tmp_path):
+    db = _db(tmp_path)
+    _sight(db, "erling haaland", "wh", "Man City", "Man City v Spurs", "2026-01-01", count=3)
+    _sight(db, "erling haaland", "lineup", None, None, "2026-01-01")
+    _sight(db, "e haaland", "wh", "Man City", "Man City v Spurs", "2026-01-05", count=2)
+    _sight(db, "e haaland", "lineup", None, None, "2025-12-01")
+    _sight(db, "e haaland", "lb", "Man City", "Man City v Spurs", "2026-01-03")
+
+    assert db.merge_player_key("e haaland", "erling haaland") == 3
+
+    assert _rows(db, "e haaland") == []
+    assert _rows(db, "erling haaland") == sorted([
+        ("wh", "Man City", "Man City v Spurs", "2026-01-05"),
+        ("lineup", None, None, "2026-01-01"),
+        ("lb", "Man City", "Man City v Spurs", "2026-01-03"),
+    ], key=repr)
+    assert db.get_player_stats("e haaland") is None
+    assert db.get_player_stats("erling haaland") == {
+        "first_seen": "2025-12-01", "last_seen": "2026-01-05", "occurrence_count": 8,
+    }
+
+
+def test_merge_many_follows_chains_in_one_call(tmp_path):
+    db = _db(tmp_path)
+    _sight(db, "a", "wh", "X", "X v Y", "2026-01-01")
+    _sight(db, "b", "wh", "X", "X v Y", "2026-01-02")
+    _sight(db, "c", "lb", "X", "X v Y", "2026-01-03")
+    with sqlite3.connect(db.db_path) as conn:
+        # A key with tracking rows but no stats row
+        conn.execute("""
+            INSERT INTO player_tracking (player_key, raw_name, site_name, team_name, fixture, seen_at)
+            VALUES ('d', 'D', 'bf', 'X', 'X v Y', '2025-12-31')
+        """)
+
+    assert db.merge_many([("a", "b"), ("b", "c"), ("d", "c"), ("c", "c")]) == 3
+
+    assert [key for key in ("a", "b", "c", "d") if _rows(db, key)] == ["c"]
+    assert len(_rows(db, "c")) == 3
+    assert db.get_player_stats("c") == {
+        "first_seen": "2025-12-31", "last_seen": "2026-01-03", "occurrence_count": 4,
+    }
+
+
+def _days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+def test_roll_up_tracking_keeps_teams_and_raw_names(tmp_path):
+    db = _db(tmp_path)
+    _sight(db, "bukayo saka", "wh", "Arsenal", "Arsenal v Spurs", _days_ago(200))
+    _sight(db, "bukayo saka", "wh", "Arsenal", "Arsenal v Chelsea", _days_ago(120))
+    _sight(db, "bukayo saka", "lb", "Arsenal", "Arsenal v Chelsea", _days_ago(100))
+    _sight(db, "bukayo saka", "wh", "Arsenal", "Arsenal v Fulham", _days_ago(1))
+    _sight(db, "b saka", "wh", "England", "England v Wales", _days_ago(150))
+
+    result = db.roll_up_tracking(retention_days=90, batch_rows=2)
+
+    assert result == {"rolled_up": 4, "remaining": 0}
+    assert [row[2] for row in _rows(db, "bukayo saka")] == ["Arsenal v Fulham"]
+    assert db.get_player_teams("bukayo saka") == {"Arsenal"}
+    assert db.get_player_raw_names("bukayo saka") == {"lb": ["Bukayo Saka"], "wh": ["Bukayo Saka"]}
+    assert db.get_player_fixtures("bukayo saka") == {"Arsenal v Fulham"}
+    assert db.get_stats()["player_tracking_rollup"] == 3
+
+    # Rollups follow merges and show up in bulk profiles
+    db.merge_player_key("b saka", "bukayo saka")
+    profiles = db.get_player_profiles()
+    assert set(profiles) == {"bukayo saka"}
+    assert profiles["bukayo saka"]["teams"] == {"Arsenal", "England"}
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("""
+            SELECT sightings FROM player_tracking_rollup
+            WHERE player_key = 'bukayo saka' AND site_name = 'wh'
+        """).fetchone() == (3,)
+
+
+def test_run_maintenance_is_scheduled(tmp_path):
+    db = _db(tmp_path)
+    _sight(db, "declan rice", "wh", "Arsenal", "Arsenal v Spurs", _days_ago(400))
+
+    first = db.run_maintenance(retention_days=90)
+    assert first["rolled_up"] == 1
+    assert db.run_maintenance(retention_days=90) is None
+
+    forced = db.run_maintenance(force=True, retention_days=90)
+    assert forced["rolled_up"] == 0 and forced["full_vacuum"] == 0
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+        index_names = {row[1] for row in conn.execute("PRAGMA index_list(player_tracking)")}
+    assert "idx_match_id" in index_names
+
+    # An older, non-incremental database is only converted when asked (maintenance CLI)
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+    assert db.run_maintenance(force=True)["full_vacuum"] == 0
+    assert db.run_maintenance(force=True, full_vacuum=True)["full_vacuum"] == 1
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+
+def test_merge_derives_missing_target_stats(tmp_path):
+    db = _db(tmp_path)
+    with sqlite3.connect(db.db_path) as conn:
+        # Target with tracking rows but no stats row
+        conn.executemany("""
+            INSERT INTO player_tracking (player_key, raw_name, site_name, team_name, fixture, seen_at)
+            VALUES ('cole palmer', 'Cole Palmer', ?, 'Chelsea', ?, ?)
+        """, [("wh", "Chelsea v Spurs", "2025-11-01"), ("lb", "Chelsea v Spurs", "2025-11-02"),
+              ("wh", "Chelsea v Fulham", "2025-11-20")])
+    _sight(db, "c palmer", "bf", "Chelsea", "Chelsea v Spurs", "2026-01-04", count=2)
+
+    db.merge_player_key("c palmer", "cole palmer")
+
+    assert db.get_player_stats("cole palmer") == {
+        "first_seen": "2025-11-01", "last_seen": "2026-01-04", "occurrence_count": 5,
+    }
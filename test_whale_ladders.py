@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Parity tests for whale's liquidity scan (Python loop vs NumPy)."""
+
+from pathlib import Path
+import random
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import whale_ladders
+from whale_ladders import scan_ladders
+
+
+def _books(n_markets=40, n_runners=12, levels=3, seed=11):
+    rnd = random.Random(seed)
+    books = []
+    for m in range(n_markets):
+        runners = []
+        for sid in range(n_runners):
+            base = rnd.uniform(1.5, 30.0)
+            lays = [SimpleNamespace(price=round(base + 0.1 * i, 2), size=round(rnd.expovariate(1 / 40.0), 2))
+                    for i in range(rnd.randint(0, levels + 1))]
+            backs = [SimpleNamespace(price=round(base - 0.1, 2), size=round(rnd.expovariate(1 / 80.0), 2))] if lays else []
+            ex = SimpleNamespace(available_to_lay=lays, available_to_back=backs) if sid % 7 else None
+            runners.append(SimpleNamespace(selection_id=sid, ex=ex))
+        books.append(SimpleNamespace(market_id=f"1.{m}", runners=runners))
+    return books
+
+
+def _keys(hits):
+    return [(h.market_id, h.runner.selection_id, round(h.lay_size, 6), h.best_back, h.best_lay, h.lay_levels)
+            for h in hits]
+
+
+@pytest.mark.skipif(whale_ladders.np is None, reason="numpy not installed")
+def test_numpy_scan_matches_python_scan():
+    levels = 3
+    books = _books(levels=levels)
+    # one market with no threshold: never crossing, near only via near_min
+    thresholds = {mb.market_id: (60.0 if i % 2 else 120.0) for i, mb in enumerate(books[:-1])}
+    cross_py, near_py = scan_ladders(books, levels, thresholds, 0.7, 40.0, vectorized=False)
+    cross_np, near_np = scan_ladders(books, levels, thresholds, 0.7, 40.0, vectorized=True)
+    assert cross_py and near_py
+    assert _keys(cross_np) == _keys(cross_py)
+    assert _keys(near_np) == _keys(near_py)
+
+
+def test_vector_scan_flag_read_per_call(monkeypatch):
+    monkeypatch.setenv("WHALE_VECTOR_SCAN", "1")
+    assert whale_ladders.vector_scan_enabled()
+    monkeypatch.setenv("WHALE_VECTOR_SCAN", "0")
+    assert not whale_ladders.vector_scan_enabled()
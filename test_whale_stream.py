@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Tests for the stream ladder cache, replayed through a local stand-in stream server."""
+
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import whale_stream
+from whale_stream import LadderCache, LadderStreamListener, ReplayStreamServer, replay_stream
+
+
+RECORDED = [
+    {"op": "mcm", "id": 1, "ct": "SUB_IMAGE", "clk": "A", "pt": 1, "mc": [
+        {"id": "1.100", "img": True, "rc": [
+            {"id": 11, "bdatl": [[0, 3.5, 120.0], [1, 3.6, 80.0]], "bdatb": [[0, 3.4, 50.0]], "ltp": 3.45},
+            {"id": 12, "bdatl": [[0, 8.0, 10.0]]},
+        ]},
+        {"id": "1.200", "img": True, "rc": [{"id": 21, "bdatl": [[0, 2.1, 5.0]]}]},
+    ]},
+    {"op": "mcm", "id": 1, "clk": "B", "pt": 2, "ct": "HEARTBEAT"},
+    {"op": "mcm", "id": 1, "clk": "C", "pt": 3, "mc": [
+        {"id": "1.100", "rc": [{"id": 11, "bdatl": [[0, 3.5, 900.0], [1, 3.6, 0]]}]},
+    ]},
+    {"op": "mcm", "id": 1, "clk": "D", "pt": 4, "mc": [
+        {"id": "1.200", "marketDefinition": {"status": "CLOSED"}},
+    ]},
+]
+
+
+def test_ladder_cache_applies_deltas():
+    cache = LadderCache()
+    assert cache.apply(RECORDED[0]) == {"1.100", "1.200"}
+    assert cache.apply(RECORDED[1]) == set()
+    assert cache.apply(RECORDED[2]) == {"1.100"}
+
+    book = cache.market_book("1.100")
+    runner = {r.selection_id: r for r in book.runners}[11]
+    assert [(l.price, l.size) for l in runner.ex.available_to_lay] == [(3.5, 900.0)]
+    assert [(l.price, l.size) for l in runner.ex.available_to_back] == [(3.4, 50.0)]
+    assert runner.last_price_traded == 3.45
+
+    cache.apply(RECORDED[3])
+    assert cache.market_book("1.200") is None
+    assert cache.clk == "D"
+
+
+def test_replay_server_feeds_listener():
+    server = ReplayStreamServer(RECORDED).start()
+    try:
+        listener = LadderStreamListener(LadderCache())
+        host, port = server.address
+        delivered = replay_stream(listener, host, port)
+    finally:
+        server.stop()
+
+    # connection message + recorded messages
+    assert delivered == len(RECORDED) + 1
+    changed = set()
+    while not listener.changes.empty():
+        _, mids = listener.changes.get_nowait()
+        changed |= mids
+    assert changed == {"1.100", "1.200"}
+    lays = listener.cache.market_book("1.100").runners[0].ex.available_to_lay
+    assert lays[0].size == 900.0
+
+
+def test_dead_stream_is_stopped_before_resubscribing(monkeypatch):
+    monkeypatch.setattr(whale_stream, "filters", SimpleNamespace(
+        streaming_market_filter=dict, streaming_market_data_filter=dict))
+    created = []
+
+    class FakeStream:
+        def __init__(self):
+            self.stopped = False
+            created.append(self)
+
+        def subscribe_to_markets(self, **kwargs):
+            pass
+
+        def start(self):
+            pass  # returns at once, like a stream whose connection dropped
+
+        def stop(self):
+            self.stopped = True
+
+    trading = SimpleNamespace(streaming=SimpleNamespace(create_stream=lambda listener: FakeStream()))
+    stream = whale_stream.MarketStream(trading)
+    assert stream.update_subscription(["1.100"])
+    stream._thread.join(1)
+    assert not stream.is_alive()
+
+    assert stream.update_subscription(["1.100"])
+    assert len(created) == 2
+    assert created[0].stopped and not created[1].stopped
@@ -1,5 +1,8 @@
 import os, sys, time, json, requests, shutil
 from dotenv import load_dotenv
+# Load .env before the project imports below; several of them (oc, oddsmatcha,
+# exchange_odds, ...) read their settings from the environment at import time
+load_dotenv()
 import pytz
 import traceback
 from datetime import datetime, timedelta, timezone
@@ -17,6 +20,9 @@ from betfair import Betfair
 from oc import get_oddschecker_match_slug, get_oddschecker_odds
 from willhill_betbuilder import get_odds, configure, BET_TYPES
 from match_context import get_match_context
+from raw_archive import archive_response
+from exchange_odds import get_snapshot as get_exchange_snapshot, exchange_odds_view
+import oddsmatcha
 
 try:
     from ladbrokes_alerts.client import LadbrokesAlerts
@@ -27,7 +33,6 @@ from kwiff import initialize_kwiff_sync, get_kwiff_event_mappings
 
 # ========= INITIALIZATION =========
 
-load_dotenv()
 london = pytz.timezone("Europe/London")
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DEBUG_DIR = os.path.join(BASE_DIR, 'debug')
@@ -1223,6 +1228,112 @@ def suggest_mappings_for_player(player_name, site_name):
     
     return {}
 
+def _merge_tracking_entries(tracking_data, mappings):
+    """Merge tracking entries whose key maps to a different preferred name.
+    
+    Linear in the number of entries: existing targets are found through a
+    normalized-key dict (first key wins, as before) and raw names, teams and
+    fixtures are merged with per-target membership sets while keeping list order.
+    
+    Returns:
+        New tracking dict (source entries merged and dropped)
+    """
+    new_tracking_data = {}
+    entries_to_merge = {}  # Maps (target_norm_key, preferred_name) -> [source_entries]
+    
+    # First pass: identify what needs to be merged
+    for norm_key, entry in tracking_data.items():
+        preferred_name = mappings.get(norm_key)
+        target_norm_key = normalize_name(preferred_name) if preferred_name else None
+        if target_norm_key and target_norm_key != norm_key:
+            entries_to_merge.setdefault((target_norm_key, preferred_name), []).append((norm_key, entry))
+        else:
+            # No mapping, or maps to itself: keep as-is
+            new_tracking_data[norm_key] = entry
+    
+    if not entries_to_merge:
+        return new_tracking_data
+    
+    # normalized key -> first key in new_tracking_data with that normalization
+    key_by_norm = {}
+    for key in new_tracking_data:
+        key_by_norm.setdefault(normalize_name(key), key)
+    
+    # id(target list) -> set of its members, so repeated merges into one target stay O(1)
+    members = {}
+    
+    def _extend_unique(target_list, values):
+        present = members.get(id(target_list))
+        if present is None:
+            present = members[id(target_list)] = set(target_list)
+        for value in values:
+            if value not in present:
+                present.add(value)
+                target_list.append(value)
+    
+    # Second pass: perform merges
+    for (target_norm_key, preferred_name), source_entries in entries_to_merge.items():
+        existing_entry_key = key_by_norm.get(target_norm_key)
+        if existing_entry_key is not None:
+            target_entry = new_tracking_data[existing_entry_key]
+        else:
+            # Create new entry using preferred name as key
+            target_entry = {
+                'raw_names': {},
+                'first_seen': None,
+                'last_seen': None,
+                'occurrence_count': 0
+            }
+            new_tracking_data[preferred_name] = target_entry
+            key_by_norm[target_norm_key] = preferred_name
+        
+        for source_key, source_entry in source_entries:
+            # Merge raw_names by site
+            for site, names in source_entry.get('raw_names', {}).items():
+                _extend_unique(target_entry['raw_names'].setdefault(site, []), names)
+            
+            # Update timestamps (earliest first_seen, latest last_seen)
+            source_first = source_entry.get('first_seen')
+            source_last = source_entry.get('last_seen')
+            if source_first and (not target_entry['first_seen'] or source_first < target_entry['first_seen']):
+                target_entry['first_seen'] = source_first
+            if source_last and (not target_entry['last_seen'] or source_last > target_entry['last_seen']):
+                target_entry['last_seen'] = source_last
+            
+            # Sum occurrence counts
+            target_entry['occurrence_count'] += source_entry.get('occurrence_count', 0)
+            
+            # Merge team_names and fixtures if present (newer JSON structure)
+            if source_entry.get('team_names'):
+                _extend_unique(target_entry.setdefault('team_names', []), source_entry['team_names'])
+            if source_entry.get('fixtures'):
+                _extend_unique(target_entry.setdefault('fixtures', []), source_entry['fixtures'])
+        
+        # Track which keys were merged
+        target_entry['merged_from'] = [source_key for source_key, _ in source_entries]
+    
+    return new_tracking_data
+
+
+def _write_tracking_file(path, tracking_data):
+    """Write the tracking dict atomically, streaming one entry per line.
+    
+    json.dump(indent=2) runs the pure-Python encoder over the whole tree;
+    dumping each entry compactly uses the C encoder and never holds the full
+    document in memory. The result is still one JSON object with sorted keys.
+    """
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for i, key in enumerate(sorted(tracking_data)):
+            f.write(',\n  ' if i else '\n  ')
+            f.write(json.dumps(key))
+            f.write(': ')
+            f.write(json.dumps(tracking_data[key], sort_keys=True))
+        f.write('\n}\n')
+    os.replace(tmp_file, path)
+
+
 def consolidate_player_tracking():
     """Consolidate tracking file entries based on manual mappings.
     
@@ -1248,93 +1359,7 @@ def consolidate_player_tracking():
             print(f"[CONSOLIDATE] No mappings found - nothing to consolidate")
             return {'merged_count': 0, 'total_entries': len(tracking_data)}
         
-        # Process entries: merge those with mappings into their target entries
-        new_tracking_data = {}
-        entries_to_merge = {}  # Maps (target_norm_key, preferred_name) -> [source_entries]
-        
-        # First pass: identify what needs to be merged
-        for norm_key, entry in tracking_data.items():
-            # Check if this key has a mapping to a different name
-            preferred_name = mappings.get(norm_key)
-            
-            if preferred_name:
-                # This entry maps to a preferred name
-                target_norm_key = normalize_name(preferred_name)
-                
-                # Check if target is different from source (don't merge to self)
-                if target_norm_key != norm_key:
-                    merge_key = (target_norm_key, preferred_name)
-                    if merge_key not in entries_to_merge:
-                        entries_to_merge[merge_key] = []
-                    entries_to_merge[merge_key].append((norm_key, entry))
-                else:
-                    # Maps to itself, keep as-is
-                    new_tracking_data[norm_key] = entry
-            else:
-                # No mapping, keep as-is
-                new_tracking_data[norm_key] = entry
-        
-        # Second pass: perform merges
-        for (target_norm_key, preferred_name), source_entries in entries_to_merge.items():
-            # Try to find existing entry by normalized key
-            existing_entry_key = None
-            for existing_key in new_tracking_data.keys():
-                if normalize_name(existing_key) == target_norm_key:
-                    existing_entry_key = existing_key
-                    break
-            
-            if existing_entry_key:
-                # Merge into existing entry
-                target_entry = new_tracking_data[existing_entry_key]
-            else:
-                # Create new entry using preferred name as key
-                target_entry = {
-                    'raw_names': {},
-                    'first_seen': None,
-                    'last_seen': None,
-                    'occurrence_count': 0
-                }
-                new_tracking_data[preferred_name] = target_entry
-            
-            # Merge all source entries into target
-            for source_key, source_entry in source_entries:
-                # Merge raw_names by site
-                for site, names in source_entry.get('raw_names', {}).items():
-                    if site not in target_entry['raw_names']:
-                        target_entry['raw_names'][site] = []
-                    for name in names:
-                        if name not in target_entry['raw_names'][site]:
-                            target_entry['raw_names'][site].append(name)
-                
-                # Update timestamps (earliest first_seen, latest last_seen)
-                source_first = source_entry.get('first_seen')
-                source_last = source_entry.get('last_seen')
-                
-                if source_first and (not target_entry['first_seen'] or source_first < target_entry['first_seen']):
-                    target_entry['first_seen'] = source_first
-                
-                if source_last and (not target_entry['last_seen'] or source_last > target_entry['last_seen']):
-                    target_entry['last_seen'] = source_last
-                
-                # Sum occurrence counts
-                target_entry['occurrence_count'] += source_entry.get('occurrence_count', 0)
-
-                # Merge team_names and fixtures if present (newer JSON structure)
-                for tk in source_entry.get('team_names', []):
-                    if 'team_names' not in target_entry:
-                        target_entry['team_names'] = []
-                    if tk not in target_entry['team_names']:
-                        target_entry['team_names'].append(tk)
-                for fx in source_entry.get('fixtures', []):
-                    if 'fixtures' not in target_entry:
-                        target_entry['fixtures'] = []
-                    if fx not in target_entry['fixtures']:
-                        target_entry['fixtures'].append(fx)
-
-            
-            # Track which keys were merged
-            merged_keys = [source_key for source_key, _ in source_entries]
-            target_entry['merged_from'] = merged_keys
+        new_tracking_data = _merge_tracking_entries(tracking_data, mappings)
         
         # Calculate stats
         original_count = len(tracking_data)
@@ -1342,10 +1367,7 @@ def consolidate_player_tracking():
         merged_count = original_count - new_count
         
         # Save consolidated tracking file
-        tmp_file = PLAYER_TRACKING_FILE + '.tmp'
-        with open(tmp_file, 'w', encoding='utf-8') as f:
-            json.dump(new_tracking_data, f, indent=2, sort_keys=True)
-        os.replace(tmp_file, PLAYER_TRACKING_FILE)
+        _write_tracking_file(PLAYER_TRACKING_FILE, new_tracking_data)
         
         print(f"[CONSOLIDATE] Merged {merged_count} entries ({original_count} -> {new_count})")
         return {'merged_count': merged_count, 'total_entries': new_count}
@@ -1502,7 +1524,7 @@ def getVirginMarkets(virgin_id):
         except Exception:
             pass
         return []
-    write_json(event_markets_json, os.path.join(cache_dir, f"virgin_event_{virgin_id}.json"))
+    archive_response(f"virgin_event_{virgin_id}", event_markets_json)
     if not event_markets_json or 'event' not in event_markets_json:
         print(f"Virgin response for event {virgin_id} contained no 'event' key. Status: {getattr(resp, 'status_code', None)}")
         # Save raw response for debugging
@@ -1958,8 +1980,7 @@ def map_betfair_to_sites(betfair_id, target_sites=None):
     
     for site in target_sites:
         try:
-            api = f"https://api.oddsmatcha.uk/convert/site_to_site?source_site=betfair&source_match_ids={betfair_id}&target_site={site}"
-            resp = requests.get(api, timeout=10)
+            resp = oddsmatcha.get(f"convert/site_to_site?source_site=betfair&source_match_ids={betfair_id}&target_site={site}")
             if not resp.ok:
                 print(f"Mapping API returned {resp.status_code} for Betfair {betfair_id} -> {site}")
                 continue
@@ -1990,6 +2011,53 @@ def map_betfair_to_virgin(betfair_id):
         return {'target_id': mappings['virginbet']}
     return None
 
+# OddsMatcha offers: WH bet builder boosts in order of preference, Ladbrokes/Coral refunds
+WH_BOOST_OFFERS = ((13, 1.5), (1, 1.25))
+LADBROKES_REFUND_OFFERS = (7, 9)  # 7 = Coral refund, 9 = Ladbrokes refund
+OFFER_BOOSTS = dict(WH_BOOST_OFFERS)
+
+class OfferCatalogue:
+    """Membership index for one offer: {site_name: set(site_match_id)} plus boost metadata."""
+    __slots__ = ('offer_id', 'boost', 'sites', 'match_count')
+
+    def __init__(self, offer_id, data=None):
+        self.offer_id = offer_id
+        self.boost = OFFER_BOOSTS.get(offer_id)
+        self.sites = {}
+        matches = (data or {}).get('matches', [])
+        self.match_count = len(matches)
+        for match in matches:
+            for mapping in match.get('mappings', []):
+                self.sites.setdefault(mapping.get('site_name'), set()).add(mapping.get('site_match_id'))
+
+    def contains(self, site_name, site_match_id):
+        return site_match_id in self.sites.get(site_name, ())
+
+# offer_id -> (oddsmatcha response it was built from, OfferCatalogue)
+_offer_catalogues = {}
+
+def get_offer_catalogue(offer_id):
+    """OfferCatalogue for an OddsMatcha offer.
+    
+    The offer list comes through the oddsmatcha client (one request per offer
+    per ODDSMATCHA_TTL_OFFERS) and is indexed only when a new response arrives.
+    Errors give an empty catalogue.
+    """
+    try:
+        resp = oddsmatcha.get(f"offers/{offer_id}")
+        cached = _offer_catalogues.get(offer_id)
+        if cached and cached[0] is resp:
+            return cached[1]
+        if not resp.ok:
+            print(f"Offer API returned {resp.status_code} for offer {offer_id}")
+            return OfferCatalogue(offer_id)
+        catalogue = OfferCatalogue(offer_id, resp.json())
+        _offer_catalogues[offer_id] = (resp, catalogue)
+        return catalogue
+    except Exception as e:
+        print(f"Error fetching offer {offer_id}: {e}")
+        return OfferCatalogue(offer_id)
+
 def is_match_in_wh_offer(wh_match_id, offer_id=1):
     """Check if a William Hill match ID is in the active offer.
     
@@ -2000,28 +2068,30 @@ def is_match_in_wh_offer(wh_match_id, offer_id=1):
     Returns:
         True if the match is in the offer, False otherwise.
     """
-    try:
-        api = f"https://api.oddsmatcha.uk/offers/{offer_id}"
-        resp = requests.get(api, timeout=10)
-        if not resp.ok:
-            print(f"Offer API returned {resp.status_code} for offer {offer_id}")
-            return False
-        
-        data = resp.json()
-        matches = data.get('matches', [])
-        
-        # Check if wh_match_id is in any of the match mappings
-        for match in matches:
-            mappings = match.get('mappings', [])
-            for mapping in mappings:
-                if (mapping.get('site_name') == 'williamhill' and 
-                    mapping.get('site_match_id') == wh_match_id):
-                    return True
-        
-        return False
-    except Exception as e:
-        print(f"Error checking WH offer: {e}")
-        return False
+    return get_offer_catalogue(offer_id).contains('williamhill', wh_match_id)
+
+def find_wh_offer(wh_match_id):
+    """Best WH boost offer containing the match: (offer_id, boost multiplier) or (None, 1.0)."""
+    for offer_id, boost in WH_BOOST_OFFERS:
+        if is_match_in_wh_offer(wh_match_id, offer_id):
+            return offer_id, boost
+    return None, 1.0
+
+def find_ladbrokes_refund_offer(ladbrokes_match_id):
+    """First refund offer (7 Coral, 9 Ladbrokes) containing the Ladbrokes match, or None."""
+    for offer_id in LADBROKES_REFUND_OFFERS:
+        if get_offer_catalogue(offer_id).contains('ladbrokes', ladbrokes_match_id):
+            return offer_id
+    return None
+
+_oddsmatcha_scraper = None
+
+def _get_oddsmatcha_scraper():
+    """Reused cloudscraper session for the matches endpoint (created on first use)."""
+    global _oddsmatcha_scraper
+    if _oddsmatcha_scraper is None:
+        _oddsmatcha_scraper = cloudscraper.create_scraper()
+    return _oddsmatcha_scraper
 
 def fetch_matches_from_oddsmatcha(next_days=0):
     """Fetch matches from OddsMatcha API with all site mappings included.
@@ -2050,9 +2120,7 @@ def fetch_matches_from_oddsmatcha(next_days=0):
         }
     """
     try:
-        url = f"https://api.oddsmatcha.uk/matches/?next_days={next_days}"
-        scraper = cloudscraper.create_scraper()
-        resp = scraper.get(url, timeout=30)
+        resp = oddsmatcha.get(f"matches/?next_days={next_days}", timeout=30, session=_get_oddsmatcha_scraper())
         
         if resp.status_code != 200:
             print(f"[ODDSMATCHA] API error: {resp.status_code}")
@@ -2120,8 +2188,7 @@ def fetch_lineups(oddsmatcha_match_id, fallback_match=None):
             # Fall through to fetching if cache read fails
             pass
 
-        api = f"https://api.oddsmatcha.uk/lineups/{oddsmatcha_match_id}"
-        resp = requests.get(api, timeout=10)
+        resp = oddsmatcha.get(f"lineups/{oddsmatcha_match_id}")
         if not resp.ok:
             print(f"[LINEUPS] Lineups API returned status {resp.status_code} for match {oddsmatcha_match_id}")
             return set()
@@ -2171,8 +2238,7 @@ def fetch_lineups(oddsmatcha_match_id, fallback_match=None):
         # If still missing, try API
         if not fixture:
             try:
-                api = f"https://api.oddsmatcha.uk/matches/{oddsmatcha_match_id}"
-                r = requests.get(api, timeout=10)
+                r = oddsmatcha.get(f"matches/{oddsmatcha_match_id}")
                 if r.ok:
                     match_info = r.json()
                     # Attempt to extract useful fields
@@ -2307,6 +2373,9 @@ def is_confirmed_starter(player_name, starters):
 def fetch_exchange_odds(oddsmatcha_match_id):
     """Fetch lay odds from multiple exchanges for a match.
     
+    Reads the shared exchange_odds snapshot (fetched at most once per
+    EXCHANGE_ODDS_TTL across processes) and keeps odds updated in the last 5 minutes.
+    
     Args:
         oddsmatcha_match_id: The oddsmatcha match ID
     
@@ -2315,142 +2384,17 @@ def fetch_exchange_odds(oddsmatcha_match_id):
         {
             'Anytime Goalscorer': {
                 'Bruno Fernandes': [
-                    {'site_name': 'smarkets', 'lay_odds': 10.0, 'last_updated': '2025-12-15T14:48:17.165097'},
-                    {'site_name': 'matchbook', 'lay_odds': 9.8, 'last_updated': '2025-12-15T14:48:20.123456'}
+                    {'site_name': 'Smarkets', 'lay_odds': 10.0, 'last_updated': '2025-12-15T14:48:17.165097',
+                     'liquidity': 120.0, 'norm': 'bruno fernandes', 'is_websocket': True},
+                    {'site_name': 'Matchbook', 'lay_odds': 9.8, 'last_updated': '2025-12-15T14:48:20.123456', ...}
                 ]
             },
             'First Goalscorer': { ... }
         }
     """
     try:
-        api = f"https://api.oddsmatcha.uk/matches/{oddsmatcha_match_id}/markets/"
-        resp = requests.get(api, timeout=10)
-        if not resp.ok:
-            print(f"Markets API returned {resp.status_code} for match {oddsmatcha_match_id}")
-            return {}
-        
-        data = resp.json()
-        result = {}
-        current_time = datetime.now(timezone.utc)
-        
-        #print(f"[DEBUG] Fetched {len(data)} markets from oddsmatcha for match {oddsmatcha_match_id}")
-        
-        for market in data:
-            market_name = market.get('market_name', '')
-            
-            # Only interested in goalscorer markets (including TOM and HAT)
-            if market_name not in ['Anytime Goalscorer', 'First Goalscorer', 'Two or More Goals', 'Hat-trick']:
-                continue
-            
-            #print(f"[DEBUG] Processing market: {market_name}, odds count: {len(market.get('odds', []))}")
-            
-            if market_name not in result:
-                result[market_name] = {}
-            
-            for odd in market.get('odds', []):
-                site_name = odd.get('site_name')
-                lay_odds = odd.get('lay_odds')
-                outcome_name = odd.get('outcome_name')
-                last_updated_str = odd.get('last_updated')
-                
-                # Skip if no lay odds, if it's betfair (already handled separately), or if missing data
-                if not lay_odds or not outcome_name:
-                    continue
-                
-                # Skip betfair - we already have betfair odds from the main betfair feed
-                if site_name and site_name.lower() == 'betfair':
-                    continue
-                
-                # Skip if data is older than 5 minutes
-                if last_updated_str:
-                    try:
-                        # Parse the timestamp - handle both with and without timezone
-                        if last_updated_str.endswith('Z'):
-                            last_updated = datetime.fromisoformat(last_updated_str.replace('Z', '+00:00'))
-                        elif '+' in last_updated_str or last_updated_str.count('-') > 2:
-                            # Already has timezone info
-                            last_updated = datetime.fromisoformat(last_updated_str)
-                        else:
-                            # No timezone, assume UTC
-                            last_updated = datetime.fromisoformat(last_updated_str).replace(tzinfo=timezone.utc)
-                        
-                        age_minutes = (current_time - last_updated).total_seconds() / 60
-                        if age_minutes > 5:
-                            #print(f"[DEBUG] Skipping {outcome_name} on {site_name} - data age: {age_minutes:.1f} minutes")
-                            continue
-                    except Exception as e:
-                        #print(f"[DEBUG] Failed to parse timestamp for {outcome_name}: {e}")
-                        continue  # Skip if we can't parse the timestamp
-                
-                # Store the odds
-                if outcome_name not in result[market_name]:
-                    result[market_name][outcome_name] = []
-
-                # Extract liquidity from the lay_liquidity field
-                liquidity_val = None
-                try:
-                    lay_liquidity = odd.get('lay_liquidity')
-                    if lay_liquidity is not None:
-                        liquidity_val = float(lay_liquidity)
-                except (ValueError, TypeError):
-                    liquidity_val = None
-
-                result[market_name][outcome_name].append({
-                    'site_name': site_name.capitalize() if site_name else site_name,
-                    'lay_odds': float(lay_odds),
-                    'last_updated': last_updated_str,
-                    'raw': odd,
-                    'norm': normalize_name(outcome_name) if outcome_name else '',
-                    'liquidity': liquidity_val
-                })
-                #print(f"[DEBUG] Added {outcome_name} on {site_name} @ {lay_odds}")
-        
-        # Post-process: if PREFER_WEBSOCKET_DATA is enabled, replace non-ws versions with ws versions
-        if PREFER_WEBSOCKET_DATA:
-            for market_name in result:
-                for outcome_name in result[market_name]:
-                    odds_list = result[market_name][outcome_name]
-                    
-                    # Group odds by base site name (without _ws suffix)
-                    site_groups = {}
-                    for odd_entry in odds_list:
-                        site = odd_entry['site_name']
-                        if not site:
-                            continue
-                        
-                        # Determine base site name and whether it's websocket
-                        base_site = site.lower().replace('_ws', '')
-                        is_ws = site.lower().endswith('_ws')
-                        
-                        if base_site not in site_groups:
-                            site_groups[base_site] = {'ws': None, 'regular': None}
-                        
-                        if is_ws:
-                            site_groups[base_site]['ws'] = odd_entry
-                        else:
-                            site_groups[base_site]['regular'] = odd_entry
-                    
-                    # Build new list preferring ws versions
-                    new_odds_list = []
-                    for base_site, versions in site_groups.items():
-                        if versions['ws']:
-                            # Use ws version but rename to base site name (strip _ws)
-                            ws_entry = versions['ws'].copy()
-                            ws_entry['site_name'] = base_site.capitalize()
-                            ws_entry['is_websocket'] = True
-                            new_odds_list.append(ws_entry)
-                            #print(f"[DEBUG] Preferred {base_site}_ws over {base_site} for {outcome_name}")
-                        elif versions['regular']:
-                            # No ws version available, use regular
-                            reg_entry = versions['regular'].copy()
-                            reg_entry['is_websocket'] = False
-                            new_odds_list.append(reg_entry)
-                    
-                    result[market_name][outcome_name] = new_odds_list
-        
-        #print(f"[DEBUG] Final result: {len(result)} markets, total players: {sum(len(players) for players in result.values())}")
-        return result
-        
+        markets = get_exchange_snapshot(oddsmatcha_match_id)
+        return exchange_odds_view(markets, prefer_websocket=PREFER_WEBSOCKET_DATA, normalize=normalize_name)
     except Exception as e:
         print(f"Error fetching exchange odds for match {oddsmatcha_match_id}: {e}")
         return {}
@@ -2899,6 +2843,27 @@ def main():
             except Exception as e:
                 print(f"[KWIFF] ⚠️ Failed to fetch match details: {e}")
         
+        # Fetch Betfair goalscorer books for all active matches up front so the
+        # per-match loop reads from memory (a handful of batched requests per loop)
+        betfair_matches = {}
+        betfair_books = {}
+        if active_betfair_ids:
+            bf_start = time.time()
+            market_ids = []
+            for bid in active_betfair_ids:
+                bmatch = betfair.fetch_single_match(bid)
+                betfair_matches[bid] = bmatch
+                for node in (bmatch or {}).get('market_nodes') or []:
+                    midid = node.get('marketId') or node.get('market_id')
+                    if midid:
+                        market_ids.append(str(midid))
+            try:
+                betfair_books = betfair.fetch_markets_odds(market_ids)
+            except Exception as e:
+                print(f"[BETFAIR] Batched market fetch failed: {e}")
+                betfair_books = {}
+            print(f"[BETFAIR] Prefetched {len(market_ids)} goalscorer markets for {len(active_betfair_ids)} matches in {time.time() - bf_start:.2f}s")
+
         # Process each active match
         for match in active_matches:
             total_matches_checked += 1
@@ -2938,7 +2903,10 @@ def main():
             # Fetch Betfair market data for this match
             try:
                 print(f"  -> Fetching Betfair odds...")
-                betfair_match = betfair.fetch_single_match(betfair_id)
+                if str(betfair_id) in betfair_matches:
+                    betfair_match = betfair_matches[str(betfair_id)]
+                else:
+                    betfair_match = betfair.fetch_single_match(betfair_id)
                 if not betfair_match:
                     print(f"  [SKIP] Failed to fetch Betfair match data (returned None) - Match ID: {betfair_id}")
                     print(f"         Common reasons: No goalscorer markets available, match suspended, or invalid ID")
@@ -3002,14 +2970,8 @@ def main():
                     # Only fetch WH prices if we have lineup data
                     if ENABLE_WILLIAMHILL and wh_match_id and confirmed_starters:
                         # Prefer offer 13 (50%) fallback to offer 1 (25%)
-                        if is_match_in_wh_offer(wh_match_id, offer_id=13):
-                            wh_offer_checked = True
-                            wh_offer_id = 13
-                            wh_boost_multiplier = 1.5
-                        elif is_match_in_wh_offer(wh_match_id, offer_id=1):
-                            wh_offer_checked = True
-                            wh_offer_id = 1
-                            wh_boost_multiplier = 1.25
+                        wh_offer_id, wh_boost_multiplier = find_wh_offer(wh_match_id)
+                        wh_offer_checked = wh_offer_id is not None
 
                         if wh_offer_checked:
                             try:
@@ -3057,9 +3019,12 @@ def main():
                                 supported[mtype] = {'market_id': midid, 'market_name': desc.get('marketName', ''), 'internal_market_name': 'FGS'}
                             else:
                                 supported[mtype] = {'market_id': midid, 'market_name': desc.get('marketName', ''), 'internal_market_name': 'AGS'}
-                            # call _fetch_market_odds for this market id
+                            # use the prefetched book, falling back to a single-market fetch
                             try:
-                                betfair_odds = betfair._fetch_market_odds(str(midid), supported, betfair_match)
+                                if str(midid) in betfair_books:
+                                    betfair_odds = betfair_books[str(midid)]
+                                else:
+                                    betfair_odds = betfair._fetch_market_odds(str(midid), supported, betfair_match)
                             except Exception as e:
                                 print(f"    Error fetching market {midid}: {e}")
                                 betfair_odds = []
@@ -3735,48 +3700,11 @@ def main():
                                             continue
                                         
                                         # Check if match is in offer id 7 (Coral refund) or offer id 9 (Ladbrokes refund)
-                                        offer_id = None  # None = regular arb, 7 = Coral refund, 9 = Ladbrokes refund
-                                        try:
-                                            # Check offer 7 (Coral)
-                                            api = f"https://api.oddsmatcha.uk/offers/7"
-                                            resp = requests.get(api, timeout=10)
-                                            if resp.ok:
-                                                data = resp.json()
-                                                matches = data.get('matches', [])
-                                                for match in matches:
-                                                    match_mappings = match.get('mappings', [])
-                                                    for mapping in match_mappings:
-                                                        if (mapping.get('site_name') == 'ladbrokes' and 
-                                                            mapping.get('site_match_id') == ladbrokes_match_id):
-                                                            offer_id = 7
-                                                            break
-                                                    if offer_id:
-                                                        break
-                                            
-                                            # Check offer 9 (Ladbrokes) if not in offer 7
-                                            if not offer_id:
-                                                api = f"https://api.oddsmatcha.uk/offers/9"
-                                                resp = requests.get(api, timeout=10)
-                                                if resp.ok:
-                                                    data = resp.json()
-                                                    matches = data.get('matches', [])
-                                                    for match in matches:
-                                                        match_mappings = match.get('mappings', [])
-                                                        for mapping in match_mappings:
-                                                            if (mapping.get('site_name') == 'ladbrokes' and 
-                                                                mapping.get('site_match_id') == ladbrokes_match_id):
-                                                                offer_id = 9
-                                                                break
-                                                        if offer_id:
-                                                            break
-                                            
-                                            if offer_id:
-                                                print(f"    [LADBROKES] Match {ladbrokes_match_id} is in Offer ID {offer_id}")
-                                            else:
-                                                print(f"    [LADBROKES] Match {ladbrokes_match_id} is NOT in any refund offer")
-                                        except Exception as e:
-                                            print(f"    [LADBROKES] Error checking offers: {e}")
-                                            traceback.print_exc()
+                                        offer_id = find_ladbrokes_refund_offer(ladbrokes_match_id)  # None = regular arb, 7 = Coral refund, 9 = Ladbrokes refund
+                                        if offer_id:
+                                            print(f"    [LADBROKES] Match {ladbrokes_match_id} is in Offer ID {offer_id}")
+                                        else:
+                                            print(f"    [LADBROKES] Match {ladbrokes_match_id} is NOT in any refund offer")
                                         
                                         # Check lineup requirements
                                         if not confirmed_starters:
@@ -4058,6 +3986,9 @@ def main():
 
         loop_time = time.time() - loop_start
         print(f"\n[TIMING] Loop completed in {loop_time:.2f}s - {total_matches_checked} matches, {total_players_processed} players")
+        api_summary = oddsmatcha.loop_summary()
+        if api_summary:
+            print(api_summary)
         
         # Check if there are any more matches to monitor today
         upcoming_count = sum(1 for m in all_matches_cache if m.get('minutes_until', -999) > -90)
@@ -1,5 +1,9 @@
-import os, sys, time, json, requests, shutil
+import os, sys, time, json, requests, shutil, threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
+# Load .env before the project imports below; oc and oddsmatcha read their
+# settings from the environment at import time
+load_dotenv()
 import pytz
 from oc import get_oddschecker_match_slug, get_oddschecker_odds
 from datetime import datetime, timedelta, timezone
@@ -8,7 +12,9 @@ import betfairlightweight
 from betfairlightweight import filters
 from betfairlightweight.exceptions import APIError
 
-load_dotenv()
+from whale_stream import MarketStream
+from whale_ladders import scan_ladders
+
 london = pytz.timezone("Europe/London")
 
 # ========= CACHE CLEARING =========
@@ -63,9 +69,12 @@ TOP_LEVELS       = int(os.getenv("TOP_LEVELS", "1"))         # sum top N lay lev
 WINDOW_MINUTES   = int(os.getenv("WINDOW_MINUTES", "90"))    # KO window
 POLL_SECONDS     = int(os.getenv("POLL_SECONDS", "180"))     # poll interval
 MARKET_BOOK_BATCH= int(os.getenv("MARKET_BOOK_BATCH", "5"))  # fetch N markets per call (keep small)
+MARKET_BOOK_WORKERS = int(os.getenv("MARKET_BOOK_WORKERS", "4"))  # concurrent list_market_book requests per sweep
+OC_WORKERS       = int(os.getenv("OC_WORKERS", "3"))        # concurrent OddsChecker enrichment lookups
+STREAM_MODE      = os.getenv("STREAM_MODE", "0") == "1"      # use the Exchange Stream API instead of polling
 
-BATCH_COMP_SIZE  = 5
 MAX_RESULTS      = 1000
+METADATA_BATCH   = 200   # RUNNER_METADATA weighs 1 per market; Betfair allows 200 per request
 
 # ========= DIAGNOSTICS (console-only) =========
 DEBUG_MODE       = os.getenv("DEBUG_MODE", "0") == "1"         # enable detailed filter logging
@@ -110,12 +119,7 @@ def _channel_list():
         return [x.strip() for x in DISCORD_CHANNEL_IDS.split(",") if x.strip()]
     return [DISCORD_CHANNEL_ID] if DISCORD_CHANNEL_ID else []
 
-def send_discord_embed(title, description, fields, colour=0x3AA3E3, channel_ids=None):
-    if not DISCORD_ENABLED:
-        return
-
-    channels = channel_ids if channel_ids else _channel_list()
-
+def _embed_payload(title, description, fields, colour):
     embed = {
         "title": title,
         "description": description,
@@ -124,21 +128,33 @@ def send_discord_embed(title, description, fields, colour=0x3AA3E3, channel_ids=
         "timestamp": datetime.now(london).isoformat()
 
     }
-    payload = {"embeds": [embed], "content": ""}
+    return {"embeds": [embed], "content": ""}
+
+def send_discord_embed(title, description, fields, colour=0x3AA3E3, channel_ids=None):
+    """Post an embed and return [(channel_id or "webhook", message_id), ...] for later edits."""
+    if not DISCORD_ENABLED:
+        return []
+
+    channels = channel_ids if channel_ids else _channel_list()
+    payload = _embed_payload(title, description, fields, colour)
+    sent = []
 
     # single webhook support (posts once)
     if DISCORD_WEBHOOK_URL:
         try:
-            r = requests.post(DISCORD_WEBHOOK_URL, json=payload, timeout=10)
+            sep = "&" if "?" in DISCORD_WEBHOOK_URL else "?"
+            r = requests.post(f"{DISCORD_WEBHOOK_URL}{sep}wait=true", json=payload, timeout=10)
             if r.status_code >= 300:
                 print(f"[WARN] Webhook error: {r.text[:600]}")
+            else:
+                sent.append(("webhook", r.json().get("id")))
         except Exception as e:
             print(f"[WARN] Webhook post failed: {e}")
-        return
+        return sent
 
     if not DISCORD_BOT_TOKEN or not channels:
         print(f"[WARN] Discord not configured. Token set={bool(DISCORD_BOT_TOKEN)} channels={channels}")
-        return
+        return sent
 
     for ch in channels:
         try:
@@ -150,8 +166,35 @@ def send_discord_embed(title, description, fields, colour=0x3AA3E3, channel_ids=
             )
             if r.status_code >= 300:
                 print(f"[WARN] Channel {ch} error body: {r.text[:600]}")
+            else:
+                sent.append((ch, r.json().get("id")))
         except Exception as e:
             print(f"[WARN] Channel {ch} post failed: {e}")
+    return sent
+
+def edit_discord_embed(sent, title, description, fields, colour=0x3AA3E3):
+    """Replace the embed of messages previously returned by send_discord_embed."""
+    if not DISCORD_ENABLED:
+        return
+    payload = _embed_payload(title, description, fields, colour)
+    for ch, message_id in sent or []:
+        if not message_id:
+            continue
+        try:
+            if ch == "webhook":
+                base = DISCORD_WEBHOOK_URL.split("?", 1)[0]
+                r = requests.patch(f"{base}/messages/{message_id}", json=payload, timeout=10)
+            else:
+                r = requests.patch(
+                    f"https://discord.com/api/v10/channels/{ch}/messages/{message_id}",
+                    headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}",
+                             "Content-Type": "application/json"},
+                    json=payload, timeout=10
+                )
+            if r.status_code >= 300:
+                print(f"[WARN] Edit of message {message_id} failed: {r.text[:600]}")
+        except Exception as e:
+            print(f"[WARN] Edit of message {message_id} failed: {e}")
 
 # ========= STATE =========
 def load_state():
@@ -175,35 +218,6 @@ def within_window(ko_dt, minutes):
     now = datetime.now(timezone.utc)
     return 0 <= (ko_dt - now).total_seconds() / 60 <= minutes
 
-def sum_lay_levels(runner, levels):
-    ats = (runner.ex.available_to_lay or [])[:levels] if getattr(runner, "ex", None) else []
-    return sum(l.size for l in ats)
-
-def best_back_tuple(r):
-    try:
-        lvl = (r.ex.available_to_back or [])[0]
-        return (lvl.price, lvl.size)
-    except Exception:
-        return (None, None)
-
-def best_lay_tuple(r):
-    try:
-        lvl = (r.ex.available_to_lay or [])[0]
-        return (lvl.price, lvl.size)
-    except Exception:
-        return (None, None)
-
-def lay_levels_list(runner, levels):
-    """Return list of (price, size) for first N lay levels for diagnostics."""
-    if not getattr(runner, "ex", None):
-        return []
-    lays = runner.ex.available_to_lay or []
-    out = []
-    for i in range(min(levels, len(lays))):
-        lvl = lays[i]
-        out.append((lvl.price, lvl.size))
-    return out
-
 def chunks(seq, n):
     for i in range(0, len(seq), n):
         yield seq[i:i+n]
@@ -239,20 +253,32 @@ def _login_or_die(trading):
         print(f"[AUTH] Login failed: {e}", flush=True)
         raise
 
-def _safe_discover(trading):
+def _safe_refresh(trading, catalogue):
     try:
-        comp_ids = discover_competitions(trading)
-        return discover_markets(trading, comp_ids), comp_ids
+        return catalogue.refresh(trading)
     except APIError as e:
         msg = str(e).upper()
         if "NO_SESSION" in msg or "INVALID_SESSION" in msg:
             print("[AUTH] Session invalid during discovery; re-logging...", flush=True)
-            _login_or_die(trading)
-            comp_ids = discover_competitions(trading)
-            return discover_markets(trading, comp_ids), comp_ids
+            _relogin_once(trading, _login_generation)
+            return catalogue.refresh(trading)
         raise
 
-def _fetch_books_safely(trading, mids, top_levels):
+_login_lock = threading.Lock()
+_login_generation = 0
+
+def _relogin_once(trading, seen_generation):
+    """Re-login unless another thread already did so after `seen_generation` was read."""
+    global _login_generation
+    with _login_lock:
+        if _login_generation == seen_generation:
+            _login_or_die(trading)
+            _login_generation += 1
+        return _login_generation
+
+def _fetch_books_safely(trading, mids, top_levels, batch_size=None, workers=None):
+    batch_size = max(1, batch_size or MARKET_BOOK_BATCH)
+    workers = max(1, workers or MARKET_BOOK_WORKERS)
     price_proj = filters.price_projection(
         price_data=["EX_BEST_OFFERS"],
         ex_best_offers_overrides={"bestPricesDepth": max(1, int(top_levels))},
@@ -260,30 +286,51 @@ def _fetch_books_safely(trading, mids, top_levels):
         rollover_stakes=False,
     )
 
-    def _fetch_chunk(chunk):
+    def _list_books(chunk):
         return trading.betting.list_market_book(
             market_ids=chunk,
             price_projection=price_proj
         ) or []
 
-    out = []
-    stack = [list(mids)]
-    while stack:
-        chunk = stack.pop()
+    def _fetch_chunk(chunk):
+        generation = _login_generation
         try:
-            out.extend(_fetch_chunk(chunk))
+            return _list_books(chunk)
         except APIError as e:
             msg = str(e).upper()
-            if "TOO_MUCH_DATA" in msg and len(chunk) > 1:
-                mid = len(chunk) // 2
-                stack.append(chunk[mid:])
-                stack.append(chunk[:mid])
-            elif "NO_SESSION" in msg or "INVALID_SESSION" in msg:
+            if "NO_SESSION" in msg or "INVALID_SESSION" in msg:
                 print("[AUTH] Session invalid during list_market_book; re-logging...", flush=True)
-                _login_or_die(trading)
-                out.extend(_fetch_chunk(chunk))
-            else:
-                raise
+                _relogin_once(trading, generation)
+                return _list_books(chunk)
+            raise
+
+    out = []
+    started = time.perf_counter()
+    requests_made, splits = 0, 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="market-book") as pool:
+        pending = {}
+        for chunk in chunks(list(mids), batch_size):
+            pending[pool.submit(_fetch_chunk, chunk)] = chunk
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                chunk = pending.pop(fut)
+                requests_made += 1
+                try:
+                    out.extend(fut.result())
+                except APIError as e:
+                    if "TOO_MUCH_DATA" in str(e).upper() and len(chunk) > 1:
+                        splits += 1
+                        half = len(chunk) // 2
+                        for part in (chunk[:half], chunk[half:]):
+                            pending[pool.submit(_fetch_chunk, part)] = part
+                    else:
+                        for other in pending:
+                            other.cancel()
+                        raise
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[SWEEP] {len(out)} books for {len(mids)} markets in {elapsed_ms:.0f}ms "
+          f"({requests_made} requests, {splits} splits, {workers} workers)", flush=True)
     return out
 
 # ========= DISCOVERY =========
@@ -313,81 +360,364 @@ def discover_competitions(trading):
         print(f"[DEBUG] discover_competitions: {total_comps} total → {len(out)} after filtering", flush=True)
     return out
 
-def _catalogue_batch(trading, comp_ids_batch, market_type_codes=None, text_query=None):
+def _list_start_times(trading, competition_ids):
+    """Market id + start time of every FGS/AGS market in `competition_ids` over the next 24h.
+
+    MARKET_START_TIME is the only projection, so this costs no request weight and
+    usually fits in one request; a saturated answer is split by competition.
+    """
+    if not competition_ids:
+        return []
     mf = filters.market_filter(
         event_type_ids=["1"],
-        competition_ids=comp_ids_batch,
-        market_type_codes=market_type_codes,
-        text_query=text_query,
+        competition_ids=competition_ids,
+        market_type_codes=MARKET_TYPE_CODES_FGS + MARKET_TYPE_CODES_AGS,
         market_start_time=time_range_next_24h_utc(),
         in_play_only=False,
     )
-    return trading.betting.list_market_catalogue(
+    cat = trading.betting.list_market_catalogue(
         filter=mf,
-        market_projection=["MARKET_START_TIME","RUNNER_METADATA","COMPETITION","EVENT"],
+        market_projection=["MARKET_START_TIME"],
         max_results=MAX_RESULTS
-    )
+    ) or []
+    if len(cat) >= MAX_RESULTS and len(competition_ids) > 1:
+        half = len(competition_ids) // 2
+        return _list_start_times(trading, competition_ids[:half]) + _list_start_times(trading, competition_ids[half:])
+    return cat
+
+def _catalogues_by_id(trading, market_ids):
+    """Full catalogue entries (runners, competition, event) for specific markets."""
+    cat = []
+    for batch in chunks(market_ids, METADATA_BATCH):
+        cat += trading.betting.list_market_catalogue(
+            filter=filters.market_filter(market_ids=batch),
+            market_projection=["MARKET_START_TIME","RUNNER_METADATA","COMPETITION","EVENT"],
+            max_results=len(batch)
+        ) or []
+    return cat
+
+def _discover_by_name(trading):
+    """Global name-search fallback used when no competition returns FGS/AGS markets."""
+    FGS_NAME_QUERIES = ["first goalscorer", "first goal scorer", "first player to score"]
+    AGS_NAME_QUERIES = ["anytime goalscorer", "to score anytime", "player to score"]
+
+    def _global_name_query(q):
+        mf = filters.market_filter(
+            event_type_ids=["1"],
+            text_query=q,
+            in_play_only=False,
+            market_start_time=time_range_next_24h_utc(),
+        )
+        return trading.betting.list_market_catalogue(
+            filter=mf,
+            market_projection=["MARKET_START_TIME", "RUNNER_METADATA", "COMPETITION", "EVENT"],
+            max_results=MAX_RESULTS
+        ) or []
 
-def discover_markets(trading, competition_ids):
     cat = []
-    # Pass 1: official market type codes (FGS/AGS)
-    for batch in chunks(competition_ids, BATCH_COMP_SIZE):
-        cat += _catalogue_batch(trading, batch, market_type_codes=MARKET_TYPE_CODES_FGS) or []
-    for batch in chunks(competition_ids, BATCH_COMP_SIZE):
-        cat += _catalogue_batch(trading, batch, market_type_codes=MARKET_TYPE_CODES_AGS) or []
-
-    # Pass 2: global name-search fallback if empty
-    if not cat:
-        FGS_NAME_QUERIES = ["first goalscorer", "first goal scorer", "first player to score"]
-        AGS_NAME_QUERIES = ["anytime goalscorer", "to score anytime", "player to score"]
-
-        def _global_name_query(q):
-            mf = filters.market_filter(
-                event_type_ids=["1"],
-                text_query=q,
-                in_play_only=False,
-                market_start_time=time_range_next_24h_utc(),
-            )
-            return trading.betting.list_market_catalogue(
-                filter=mf,
-                market_projection=["MARKET_START_TIME", "RUNNER_METADATA", "COMPETITION", "EVENT"],
-                max_results=MAX_RESULTS
-            ) or []
+    for q in FGS_NAME_QUERIES:
+        cat += _global_name_query(q)
+    for q in AGS_NAME_QUERIES:
+        cat += _global_name_query(q)
+    return cat
+
+class MarketCatalogue:
+    """FGS/AGS markets in scope (next 24h), maintained incrementally.
+
+    Every refresh lists the whole 24h window with start times only (one
+    weightless request), so late-listed markets are found and delayed or
+    brought-forward kick-offs move their expiry. Full metadata (runners,
+    competition, event) is only fetched for market ids not seen before, and
+    markets expire once they kick off. The lookup dicts and `market_ids` are
+    updated in place, so references taken from `lookups()` stay valid
+    across refreshes.
+    """
+
+    def __init__(self):
+        self.market_ids = []
+        self.runner_name, self.comp_name, self.event_name = {}, {}, {}
+        self.kickoff, self.market_label, self.event_id = {}, {}, {}
+        self.comp_ids = []
+        self._known = set()
+
+    def lookups(self):
+        return self.runner_name, self.comp_name, self.event_name, self.kickoff, self.market_label, self.event_id
+
+    def add_catalogues(self, cat):
+        """Ingest catalogue entries for markets not seen before; return how many were added.
+
+        Known markets only take the entry's start time.
+        """
+        added = 0
+        for c in cat or []:
+            mid = c.market_id
+            if mid in self._known and mid in self.kickoff:
+                self.update_start_times([c])
+                continue
+            if mid not in self._known:
+                self._known.add(mid)
+                self.market_ids.append(mid)
+            self.comp_name[mid] = getattr(c.competition, "name", "?")
+            self.event_name[mid] = getattr(c.event, "name", c.market_name)
+            self.kickoff[mid] = c.market_start_time.replace(tzinfo=timezone.utc)
+            self.event_id[mid] = getattr(c.event, "id", None)
+
+            mt = (getattr(c, "market_type", None) or "").upper()
+            name = (getattr(c, "market_name", "") or "")
+            if mt in MARKET_TYPE_CODES_FGS or is_fgs_name(name):
+                self.market_label[mid] = "FGS"
+            elif mt in MARKET_TYPE_CODES_AGS or is_ags_name(name):
+                self.market_label[mid] = "AGS"
+            else:
+                self.market_label[mid] = "AGS"
+
+            for r in c.runners or []:
+                self.runner_name[(mid, r.selection_id)] = r.runner_name
+            added += 1
+        return added
+
+    def update_start_times(self, cat):
+        """Take marketStartTime from catalogue entries of known markets; return how many moved."""
+        moved = 0
+        for c in cat or []:
+            mid = c.market_id
+            start = getattr(c, "market_start_time", None)
+            if mid not in self.kickoff or start is None:
+                continue
+            start = start.replace(tzinfo=timezone.utc)
+            if start != self.kickoff[mid]:
+                self.kickoff[mid] = start
+                moved += 1
+        return moved
+
+    def include(self, mid):
+        """Force a market id into scope (metadata is filled in if it is discovered later)."""
+        if mid not in self._known:
+            self._known.add(mid)
+            self.market_ids.append(mid)
+
+    def expire(self, now=None):
+        """Drop markets that have kicked off; return their ids."""
+        now = now or datetime.now(timezone.utc)
+        expired = {mid for mid in self.market_ids if mid in self.kickoff and self.kickoff[mid] < now}
+        if not expired:
+            return expired
+        self.market_ids[:] = [mid for mid in self.market_ids if mid not in expired]
+        for d in (self.comp_name, self.event_name, self.kickoff, self.market_label, self.event_id):
+            for mid in expired:
+                d.pop(mid, None)
+        for key in [key for key in self.runner_name if key[0] in expired]:
+            del self.runner_name[key]
+        self._known -= expired
+        return expired
+
+    def refresh(self, trading):
+        """List the 24h window, fetch metadata for new markets only; return expired market ids."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        comp_ids = discover_competitions(trading)
+        listed = _list_start_times(trading, comp_ids)
+        moved = self.update_start_times(listed)
+        new_ids = list(dict.fromkeys(c.market_id for c in listed if c.market_id not in self.kickoff))
+        added = self.add_catalogues(_catalogues_by_id(trading, new_ids)) if new_ids else 0
+        if not listed:
+            # Global name-search fallback when no competition lists FGS/AGS markets by type code
+            added += self.add_catalogues(_discover_by_name(trading))
+
+        self.comp_ids = comp_ids
+        expired = self.expire(now)
+        print(f"[CATALOGUE] {len(comp_ids)} comps, {len(listed)} listed, +{added} markets, {moved} rescheduled, "
+              f"-{len(expired)} expired, {len(self.market_ids)} in scope "
+              f"({(time.perf_counter() - started) * 1000:.0f}ms)", flush=True)
+        return expired
+
+# ========= ODDSCHECKER ENRICHMENT =========
+_oc_pool = ThreadPoolExecutor(max_workers=max(1, OC_WORKERS), thread_name_prefix="oc-enrich")
+
+def _submit_oc_enrichment(pending):
+    """Queue one OddsChecker lookup per Betfair event for the alerts raised in a sweep."""
+    for bf_event_id, jobs in pending.items():
+        _oc_pool.submit(_enrich_alerts, bf_event_id, jobs)
+
+def _fetch_oc_odds(match_slug, betdata):
+    """get_oddschecker_odds with 3 attempts, 2s apart (runs on the enrichment pool)."""
+    for attempt in range(3):
+        try:
+            result = get_oddschecker_odds(match_slug, betdata)
+            if isinstance(result, tuple):
+                result = result[0]
+            return result or []
+        except Exception as retry_err:
+            if attempt < 2:
+                print(f"[WARN] OddsChecker API attempt {attempt+1}/3 failed, retrying in 2s: {retry_err}", flush=True)
+                time.sleep(2)
+            else:
+                print(f"[WARN] OddsChecker API failed after 3 attempts: {retry_err}", flush=True)
+    return []
 
-        for q in FGS_NAME_QUERIES:
-            cat += _global_name_query(q)
-        for q in AGS_NAME_QUERIES:
-            cat += _global_name_query(q)
-
-    # Deduplicate and build mappings
-    market_ids, runner_name, comp_name, event_name, kickoff, market_label, event_id = [], {}, {}, {}, {}, {}, {}
-    seen = set()
-    for c in cat:
-        mid = c.market_id
-        if mid in seen:
-            continue
-        seen.add(mid)
-        market_ids.append(mid)
-        comp_name[mid] = getattr(c.competition, "name", "?")
-        event_name[mid] = getattr(c.event, "name", c.market_name)
-        kickoff[mid] = c.market_start_time.replace(tzinfo=timezone.utc)
-        event_id[mid] = getattr(c.event, "id", None)
-
-        mt = (getattr(c, "market_type", None) or "").upper()
-        name = (getattr(c, "market_name", "") or "")
-        if mt in MARKET_TYPE_CODES_FGS or is_fgs_name(name):
-            market_label[mid] = "FGS"
-        elif mt in MARKET_TYPE_CODES_AGS or is_ags_name(name):
-            market_label[mid] = "AGS"
-        else:
-            market_label[mid] = "AGS"
+def _enrich_alerts(bf_event_id, jobs):
+    try:
+        match_slug = get_oddschecker_match_slug(bf_event_id) if bf_event_id else None
+        if not match_slug:
+            print(f"[WARN] OddsChecker setup failed for event {bf_event_id}: Could not map Betfair ID to OddsChecker slug", flush=True)
+            return
+        oc_results = _fetch_oc_odds(match_slug, [job["bet"] for job in jobs])
+        for job in jobs:
+            bet = job["bet"]
+            mine = [oc for oc in oc_results
+                    if oc.get("bettype") == bet["bettype"] and oc.get("outcome") == bet["outcome"]]
+            _complete_alert(job, match_slug, mine)
+    except Exception as e:
+        print(f"[WARN] OddsChecker enrichment failed for event {bf_event_id}: {e}", flush=True)
+
+def _complete_alert(job, match_slug, oc_results):
+    """Edit the base alert with OddsChecker odds and send the separate arb alert."""
+    mid, blp, label = job["mid"], job["blp"], job["label"]
+    pname = job["bet"]["outcome"]
+    fields = list(job["fields"])
+    fields.append(("OC Link", f"[View OC](https://www.oddschecker.com/football/{match_slug})"))
+
+    # Combine all bookie @ odds pairs into a single field under one heading
+    embed_colour = 0xA0A0A0  # default grey
+    better_list = []
+    fallback_list = []
+    for oc in oc_results:
+        bookie = oc.get('bookie')
+        odds = oc.get('odds')
+        if bookie and odds:
+            pair = f"{bookie} @ {odds:.2f}"
+            # Add (ARB) if OddsChecker odds are higher than lay odds
+            if blp and odds > blp:
+                pair += " (ARB)"
+            if oc.get('fallback', False):
+                fallback_list.append(pair)
+            else:
+                better_list.append(pair)
+    if better_list:
+        fields.append(("Better Back Odds", "\n".join(better_list)))
+        embed_colour = 0xE33A3A  # red for ARB
+    if fallback_list and not better_list:
+        fields.append(("Best Back Odds", "\n".join(fallback_list)))
+        embed_colour = 0x3AA3E3  # blue for fallback only
+
+    if job["sent"]:
+        edit_discord_embed(job["sent"], job["title"], job["desc"], fields, colour=embed_colour)
+
+    # Send separate arbitrage message if configured
+    arb_opportunities = [oc for oc in oc_results if blp and oc.get('odds') and oc['odds'] > blp]
+    if arb_opportunities and DISCORD_ARB_CHANNEL_ID:
+        # Calculate max OddsChecker odds for title
+        max_oc_odds = max(arb['odds'] for arb in arb_opportunities)
+        rating_pct = (max_oc_odds / blp * 100) if blp and max_oc_odds > 0 else 0
+        arb_title = f"{pname} ({label}) - {max_oc_odds}/{blp} ({rating_pct:.1f}%)"
+        arb_fields = [
+            ("Back Sites", "\n".join([f"{arb['bookie']} @ {arb['odds']:.2f}" for arb in arb_opportunities])),
+            ("BFEX Link", f"[Open Market](https://www.betfair.com/exchange/plus/football/market/{mid})"),
+            ("OC Link", f"[View OC](https://www.oddschecker.com/football/{match_slug})"),
+        ]
+        send_discord_embed(arb_title, job["desc"], arb_fields, colour=0xFFB80C, channel_ids=[DISCORD_ARB_CHANNEL_ID])
+
+# ========= EVALUATION =========
+def _evaluate_books(books, alerted, poll_count, runner_name, comp_name, event_name, kickoff, market_label, event_id):
+    """Check every runner in `books` against its liquidity threshold and send alerts.
+
+    Base alerts go out immediately; OddsChecker enrichment for the alerts raised
+    here is queued once per match and completes the messages in the background.
+    """
+    pending_oc = {}
+    thresholds = {mid: (GBP_THRESHOLD_FGS if market_label.get(mid, "AGS") == "FGS" else GBP_THRESHOLD_AGS)
+                  for mid in (mb.market_id for mb in books or [])}
+    diag = DIAG_NEAR_PCT > 0 and (poll_count % max(1, DIAG_EVERY_POLLS) == 0)
+    crossing, near = scan_ladders(books, TOP_LEVELS, thresholds,
+                                  near_pct=DIAG_NEAR_PCT if diag else 0.0, near_min=DIAG_MIN_ABS)
+    if DEBUG_MODE:
+        print(f"[DEBUG] Ladder scan: {sum(len(mb.runners or []) for mb in books or [])} runners, "
+              f"{len(crossing)} crossing, {len(near)} near", flush=True)
 
-        for r in c.runners or []:
-            runner_name[(mid, r.selection_id)] = r.runner_name
+    # --- DIAGNOSTIC: log near-threshold runners across ALL markets ---
+    for hit in near:
+        mid, r = hit.market_id, hit.runner
+        if alerted.get(key_for(mid, r.selection_id)):
+            continue
+        label = market_label.get(mid, "AGS")
+        pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
+        levels_str = " ".join(
+            [f"L{i+1}=£{int(sz)}@{pr}" for i,(pr,sz) in enumerate(hit.lay_levels)]
+        ) if hit.lay_levels else "no-levels"
+        print(
+            f"[NEAR] {mid} | {event_name.get(mid,'?')} | {pname} | {label} | "
+            f"{levels_str} | sum(top {TOP_LEVELS})=£{int(hit.lay_size)} "
+            f"vs threshold £{int(thresholds[mid])}",
+            flush=True
+        )
+
+    # --- ALERT when crossing threshold ---
+    for hit in crossing:
+        mid, r, lay_size = hit.market_id, hit.runner, hit.lay_size
+        label = market_label.get(mid, "AGS")
+        threshold = thresholds[mid]
+        k = key_for(mid, r.selection_id)
+        if alerted.get(k):
+            if DEBUG_MODE:
+                pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
+                print(f"[DEBUG] Filtered (already alerted): {mid} | {pname}", flush=True)
+            continue
 
+        pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
+        mins_to_ko = int((kickoff[mid] - datetime.now(timezone.utc)).total_seconds() // 60)
+        bbp, bbs = hit.best_back
+        if bbp and bbp < 1.2:
+            continue
+        blp, bls = hit.best_lay
+        title = f"Liquidity alert ({label})"
+        desc = f"{event_name.get(mid,'?')} — {comp_name.get(mid,'?')}"
+
+        fields = [
+            ("Player", pname),
+            ("Lay size", f"£{int(lay_size)} (top {TOP_LEVELS})"),
+            ("Threshold", f"£{int(threshold)}"),
+            ("LTP", str(getattr(r, 'last_price_traded', None))),
+            ("Layable now", "—" if not (bbp and bbs) else f"£{int(bbs)} @ {bbp}"),
+            ("Best lay", "—" if not (blp and bls) else f"£{int(bls)} @ {blp}"),
+            ("T- mins", str(mins_to_ko)),
+            ("Market Link", f"[Open Market](https://www.betfair.com/exchange/plus/football/market/{mid})"),
+        ]
+
+        # Send the base alert now; OddsChecker odds are added by the enrichment worker
+        sent = []
+        if _channel_list():
+            sent = send_discord_embed(title, desc, fields, colour=0xA0A0A0)
+        bettype = "First Goalscorer" if label == "FGS" else "Anytime Goalscorer"
+        pending_oc.setdefault(event_id.get(mid), []).append({
+            "mid": mid, "label": label, "title": title, "desc": desc,
+            "fields": fields, "sent": sent, "blp": blp,
+            "bet": {"bettype": bettype, "outcome": pname, "min_odds": bbp, "lay_odds": blp},
+        })
+
+        alerted[k] = True
+        save_state(alerted)
+
+    if pending_oc:
+        _submit_oc_enrichment(pending_oc)
+
+def _listen_stream(stream, active, seconds, alerted, poll_count, runner_name, comp_name, event_name, kickoff, market_label, event_id):
+    """Evaluate markets as stream changes arrive, for up to `seconds`."""
+    active = set(active)
+    deadline = time.time() + seconds
+    evaluations, worst_lag = 0, 0.0
+    while stream.is_alive():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        changed, first_ts = stream.wait_for_changes(min(remaining, 1.0))
+        mids = [mid for mid in changed if mid in active]
+        if not mids:
+            continue
+        _evaluate_books(stream.cache.market_books(mids), alerted, poll_count, runner_name, comp_name, event_name, kickoff, market_label, event_id)
+        evaluations += 1
+        worst_lag = max(worst_lag, time.time() - first_ts)
     if DEBUG_MODE:
-        print(f"[DEBUG] discover_markets: {len(cat)} catalogues → {len(market_ids)} unique markets after filtering", flush=True)
-    return market_ids, runner_name, comp_name, event_name, kickoff, market_label, event_id
+        print(f"[STREAM] {evaluations} change evaluations, worst change-to-evaluation lag {worst_lag*1000:.0f}ms", flush=True)
 
 # ========= MAIN LOOP =========
 def main():
@@ -402,7 +732,10 @@ def main():
     alerted = load_state()
     poll_count = 0
 
-    (market_ids, runner_name, comp_name, event_name, kickoff, market_label, event_id), comp_ids = _safe_discover(trading)
+    catalogue = MarketCatalogue()
+    _safe_refresh(trading, catalogue)
+    market_ids = catalogue.market_ids
+    runner_name, comp_name, event_name, kickoff, market_label, event_id = catalogue.lookups()
 
     # Force-include market IDs from env (for debugging/safety/spot checks)
     if OVERRIDE_INCLUDE_MARKET_IDS:
@@ -417,28 +750,11 @@ def main():
             ids_set = set(OVERRIDE_INCLUDE_MARKET_IDS)
             extra_cats.extend([c for c in batch if getattr(c, "market_id", "") in ids_set])
 
-            for c in extra_cats:
-                mid = c.market_id
-                if mid not in market_ids:
-                    market_ids.append(mid)
-                comp_name[mid] = getattr(c.competition, "name", "?")
-                event_name[mid] = getattr(c.event, "name", c.market_name)
-                kickoff[mid] = c.market_start_time.replace(tzinfo=timezone.utc)
-                mt = (getattr(c, "market_type", None) or "").upper()
-                name = (getattr(c, "market_name", "") or "")
-                if mt in MARKET_TYPE_CODES_FGS or is_fgs_name(name):
-                    market_label[mid] = "FGS"
-                elif mt in MARKET_TYPE_CODES_AGS or is_ags_name(name):
-                    market_label[mid] = "AGS"
-                else:
-                    market_label[mid] = "AGS"
-                for r in c.runners or []:
-                    runner_name[(mid, r.selection_id)] = r.runner_name
-                print(comp_name)
+            catalogue.add_catalogues(extra_cats)
         except Exception as e:
             print("[WARN] Failed to force-include market IDs:", e, flush=True)
 
-    print(f"[START] Bot online. Monitoring {len(market_ids)} markets across {len(comp_ids)} competitions (next 24h).", flush=True)
+    print(f"[START] Bot online. Monitoring {len(market_ids)} markets across {len(catalogue.comp_ids)} competitions (next 24h).", flush=True)
     send_discord_embed(
         "liquidity-bot online",
         "Monitoring FGS and AGS markets (next 24h) has started.",
@@ -448,6 +764,9 @@ def main():
     )
     KEEPALIVE_EVERY = 10
     REFRESH_CATALOGUE_EVERY = 15
+    stream = MarketStream(trading, top_levels=TOP_LEVELS) if STREAM_MODE else None
+    if stream is not None:
+        print("[STREAM] Stream mode enabled; evaluating on market changes.", flush=True)
 
     while True:
         poll_count += 1
@@ -464,12 +783,15 @@ def main():
 
         if poll_count % REFRESH_CATALOGUE_EVERY == 0 or not market_ids:
             try:
-                (market_ids, runner_name, comp_name, event_name, kickoff, market_label, event_id), comp_ids = _safe_discover(trading)
+                expired = _safe_refresh(trading, catalogue)
+                # Alerts for kicked-off markets can never fire again
+                for k in [k for k in alerted if k.split(":", 1)[0] in expired]:
+                    alerted.pop(k, None)
+                if expired:
+                    save_state(alerted)
                 # Re-apply force include on refresh as well
-                if OVERRIDE_INCLUDE_MARKET_IDS:
-                    for mid in OVERRIDE_INCLUDE_MARKET_IDS:
-                        if mid not in market_ids:
-                            market_ids.append(mid)
+                for mid in OVERRIDE_INCLUDE_MARKET_IDS:
+                    catalogue.include(mid)
                 print(f"[INFO] Catalogue refresh: {len(market_ids)} markets in scope (next 24h).", flush=True)
             except Exception as e:
                 print("[WARN] Catalogue refresh failed:", e, flush=True)
@@ -484,181 +806,38 @@ def main():
             print(f"[DEBUG] Main loop: {len(market_ids)} markets → {len(active)} within window ({WINDOW_MINUTES} mins)", flush=True)
 
         if not active:
+            if stream is not None:
+                stream.stop()
             time.sleep(POLL_SECONDS)
             continue
 
-        try:
-            books = []
-            for mids in chunks(active, MARKET_BOOK_BATCH):
-                books.extend(_fetch_books_safely(trading, mids, TOP_LEVELS))
-        except APIError as e:
-            print("[WARN] list_market_book APIError:", e, flush=True)
-            time.sleep(POLL_SECONDS)
-            continue
-        except Exception as e:
-            print("[WARN] list_market_book error:", e, flush=True)
-            time.sleep(POLL_SECONDS)
-            continue
+        if stream is not None:
+            try:
+                stream.update_subscription(active)
+            except Exception as e:
+                print("[WARN] Stream subscription failed:", e, flush=True)
+                time.sleep(POLL_SECONDS)
+                continue
+            _listen_stream(stream, active, POLL_SECONDS, alerted, poll_count, runner_name, comp_name, event_name, kickoff, market_label, event_id)
+            if not stream.is_alive():
+                print("[WARN] Market stream disconnected; resubscribing shortly.", flush=True)
+                time.sleep(min(POLL_SECONDS, 30))
+        else:
+            try:
+                books = _fetch_books_safely(trading, active, TOP_LEVELS)
+            except APIError as e:
+                print("[WARN] list_market_book APIError:", e, flush=True)
+                time.sleep(POLL_SECONDS)
+                continue
+            except Exception as e:
+                print("[WARN] list_market_book error:", e, flush=True)
+                time.sleep(POLL_SECONDS)
+                continue
 
-        for mb in books or []:
-            mid = mb.market_id
-            label = market_label.get(mid, "AGS")
-            threshold = GBP_THRESHOLD_FGS if label == "FGS" else GBP_THRESHOLD_AGS
-
-            for r in mb.runners or []:
-                k = key_for(mid, r.selection_id)
-                if alerted.get(k):
-                    if DEBUG_MODE:
-                        pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
-                        print(f"[DEBUG] Filtered (already alerted): {mid} | {pname}", flush=True)
-                    continue
-
-                lay_size = sum_lay_levels(r, TOP_LEVELS)
-
-                # --- DIAGNOSTIC: log near-threshold runners across ALL markets ---
-                if DIAG_NEAR_PCT > 0 and (poll_count % max(1, DIAG_EVERY_POLLS) == 0):
-                    diag_floor = max(DIAG_MIN_ABS, threshold * DIAG_NEAR_PCT)
-                    if lay_size >= diag_floor:
-                        pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
-                        levels = lay_levels_list(r, TOP_LEVELS)
-                        levels_str = " ".join(
-                            [f"L{i+1}=£{int(sz)}@{pr}" for i,(pr,sz) in enumerate(levels)]
-                        ) if levels else "no-levels"
-                        print(
-                            f"[NEAR] {mid} | {event_name.get(mid,'?')} | {pname} | {label} | "
-                            f"{levels_str} | sum(top {TOP_LEVELS})=£{int(lay_size)} "
-                            f"vs threshold £{int(threshold)}",
-                            flush=True
-                        )
-
-                # --- ALERT when crossing threshold ---
-                if lay_size >= threshold:
-                    pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
-                    mins_to_ko = int((kickoff[mid] - datetime.now(timezone.utc)).total_seconds() // 60)
-                    bbp, bbs = best_back_tuple(r)
-                    if bbp and bbp < 1.2:
-                        continue
-                    blp, bls = best_lay_tuple(r)
-                    title = f"Liquidity alert ({label})"
-                    desc = f"{event_name.get(mid,'?')} — {comp_name.get(mid,'?')}"
-
-                    # GET OC RESULTS
-                    oc_results = []
-                    match_slug = None
-                    try:
-                        match_slug = get_oddschecker_match_slug(event_id[mid])
-                        if not match_slug:
-                            raise Exception("Could not map Betfair ID to OddsChecker slug")
-                        # BUILD THE JSON FOR THIS BET ['First Goalscorer','Anytime Goalscorer']
-                        if label == "FGS":
-                            bettype = "First Goalscorer"
-                        elif label == "AGS":
-                            bettype = "Anytime Goalscorer"
-                        betfair_lay_bet = [{"bettype": bettype, "outcome": pname, "min_odds": bbp, "lay_odds": blp}]
-                        # GET ALL BETTER ODDS - retry 3 times with 2s delays
-                        for attempt in range(3):
-                            try:
-                                oc_results, arb_opportunities = get_oddschecker_odds(match_slug, betfair_lay_bet)
-                                break
-                            except Exception as retry_err:
-                                if attempt < 2:
-                                    print(f"[WARN] OddsChecker API attempt {attempt+1}/3 failed, retrying in 2s: {retry_err}", flush=True)
-                                    time.sleep(2)
-                                else:
-                                    print(f"[WARN] OddsChecker API failed after 3 attempts: {retry_err}", flush=True)
-                                    oc_results, arb_opportunities = [], []
-                    except Exception as e:
-                        print(f"[WARN] OddsChecker setup failed for event {event_id[mid]}: {e}", flush=True)
-                        oc_results, arb_opportunities = [], []
-                    '''
-                        [{'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.6, 'bookie': 'Bet365'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 4.0, 'bookie': 'Boylesports'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.9, 'bookie': 'Coral'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.4, 'bookie': 'Betfred'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.9, 'bookie': 'Ladbrokes'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 4.0, 'bookie': 'Paddy Power'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.9, 'bookie': 'QuinnBet'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 4.0, 'bookie': 'Sky Bet'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 4.0, 'bookie': 'Unibet'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 4.0, 'bookie': 'Bet Victor'}, {'bettype': 'Anytime Goalscorer', 'outcome': 'Lee Angol', 'odds': 3.75, 'bookie': 'William Hill'}]
-                    '''
-                    fields = [
-                        ("Player", pname),
-                        ("Lay size", f"£{int(lay_size)} (top {TOP_LEVELS})"),
-                        ("Threshold", f"£{int(threshold)}"),
-                        ("LTP", str(getattr(r, 'last_price_traded', None))),
-                        ("Layable now", "—" if not (bbp and bbs) else f"£{int(bbs)} @ {bbp}"),
-                        ("Best lay", "—" if not (blp and bls) else f"£{int(bls)} @ {blp}"),
-                        ("T- mins", str(mins_to_ko)),
-                        ("Market Link", f"[Open Market](https://www.betfair.com/exchange/plus/football/market/{mid})"),
-                    ]
-                    
-                    # Add OddsChecker link if available
-                    if match_slug:
-                        fields.append(("OC Link", f"[View OC](https://www.oddschecker.com/football/{match_slug})"))
-                    
-                                        # Combine all bookie @ odds pairs into a single field under one heading
-                    embed_colour = 0xA0A0A0  # default blue
-                    if oc_results:
-                        better_list = []
-                        fallback_list = []
-                        for oc in oc_results:
-                            bookie = oc.get('bookie')
-                            odds = oc.get('odds')
-                            if bookie and odds:
-                                pair = f"{bookie} @ {odds:.2f}"
-                                # Add (ARB) if OddsChecker odds are higher than lay odds
-                                if blp and odds > blp:
-                                    pair += " (ARB)"
-                                if oc.get('fallback', False):
-                                    fallback_list.append(pair)
-                                else:
-                                    better_list.append(pair)
-                        if better_list:
-                            fields.append(("Better Back Odds", "\n".join(better_list)))
-                            embed_colour = 0xE33A3A  # red for ARB
-                        if fallback_list and not better_list:
-                            fields.append(("Best Back Odds", "\n".join(fallback_list)))
-                            embed_colour = 0x3AA3E3  # blue for fallback only
-                    
-                    # # Add true arbitrage opportunities if any
-                    # if arb_opportunities:
-                    #     arb_list = []
-                    #     for arb in arb_opportunities:
-                    #         bookie = arb.get('bookie')
-                    #         odds = arb.get('odds')
-                    #         lay_odds = arb.get('lay_odds')
-                    #         if bookie and odds and lay_odds:
-                    #             arb_list.append(f"{bookie} @ {odds} (lay @ {lay_odds})")
-                    #     if arb_list:
-                    #         fields.append(("ARBITRAGE OPPORTUNITIES", "\n".join(arb_list)))
-                    #         embed_colour = 0xFF0000  # bright red for true arb
-                    # Send main liquidity alert if channels are configured
-                    if _channel_list():
-                        send_discord_embed(title, desc, fields, colour=embed_colour)
-                    
-                    # Send separate arbitrage message if configured
-                    if arb_opportunities and DISCORD_ARB_CHANNEL_ID:
-                        # Calculate max OddsChecker odds for title
-                        max_oc_odds = max(arb['odds'] for arb in arb_opportunities) if arb_opportunities else 0
-                        rating_pct = (max_oc_odds / blp * 100) if blp and max_oc_odds > 0 else 0
-                        arb_title = f"{pname} ({label}) - {max_oc_odds}/{blp} ({rating_pct:.1f}%)"
-                        arb_fields = [
-                            ("Back Sites", "\n".join([f"{arb['bookie']} @ {arb['odds']:.2f}" for arb in arb_opportunities])),
-                            ("BFEX Link", f"[Open Market](https://www.betfair.com/exchange/plus/football/market/{mid})"),
-                        ]
-                        if match_slug:
-                            arb_fields.append(("OC Link", f"[View OC](https://www.oddschecker.com/football/{match_slug})"))
-                        send_discord_embed(arb_title, desc, arb_fields, colour=0xFFB80C, channel_ids=[DISCORD_ARB_CHANNEL_ID])
-                    
-                    alerted[k] = True
-                    save_state(alerted)
-                elif DEBUG_MODE:
-                    pname = runner_name.get((mid, r.selection_id), str(r.selection_id))
-                    print(f"[DEBUG] Filtered (below threshold): {mid} | {pname} | £{int(lay_size)} < £{int(threshold)}", flush=True)
-
-        # Purge alerts older than 12 hours
-        if poll_count % 10 == 0:
-            now = datetime.now(timezone.utc)
-            to_del = [k for k in list(alerted.keys())
-                      if k.split(":",1)[0] in kickoff and kickoff[k.split(":",1)[0]] < now - timedelta(hours=12)]
-            for k in to_del:
-                alerted.pop(k, None)
-            if to_del:
-                save_state(alerted)
-
-        time.sleep(POLL_SECONDS)
+            _evaluate_books(books, alerted, poll_count, runner_name, comp_name, event_name, kickoff, market_label, event_id)
+
+        if stream is None:
+            time.sleep(POLL_SECONDS)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Vectorized liquidity scan over a sweep of Betfair market books.
+
+All runners of all books are packed into runners x levels arrays (lay price
+and size) plus best back/lay columns. Threshold crossing and near-threshold
+diagnostics are then computed in one NumPy pass, and only the runners that
+cross a threshold (or the diagnostic floor) are turned back into Python
+objects for whale.py's alert code.
+
+The default is a single-pass Python loop that likewise only materializes
+crossing/near runners: with ladders arriving as Python objects, packing them
+into arrays costs more than the NumPy arithmetic saves (see
+scripts/bench_whale_ladders.py). Set WHALE_VECTOR_SCAN=1 to use the NumPy
+path, e.g. once ladders are kept in arrays upstream.
+
+numpy is optional (not in requirements.txt): without it the Python path is
+always used, whatever WHALE_VECTOR_SCAN says.
+"""
+
+import os
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def vector_scan_enabled():
+    """WHALE_VECTOR_SCAN, read per call so a .env loaded after import still applies."""
+    return os.getenv("WHALE_VECTOR_SCAN", "0").strip().lower() in ("1", "true", "yes")
+
+
+# lay_levels: [(price, size), ...] for the first N lay levels
+LadderHit = namedtuple("LadderHit", "market_id runner lay_size best_back best_lay lay_levels")
+
+
+class PackedLadders:
+    """Runner ladders of one sweep packed into arrays."""
+
+    def __init__(self, books, levels):
+        self.levels = max(1, int(levels))
+        self.refs = []       # (market_id, runner) per row
+        market_rows = []
+        lay_price, lay_size = [], []   # flat, row-major
+        back_price, back_size = [], []
+        nan = float("nan")
+        pad_price = [nan] * self.levels
+        pad_size = [0.0] * self.levels
+        levels = self.levels
+        for mb in books or []:
+            mid = mb.market_id
+            for r in mb.runners or []:
+                ex = getattr(r, "ex", None)
+                lays = (ex.available_to_lay or [])[:levels] if ex else []
+                backs = ex.available_to_back if ex else None
+                for l in lays:
+                    lay_price.append(l.price)
+                    lay_size.append(l.size)
+                n = len(lays)
+                if n < levels:
+                    lay_price.extend(pad_price[n:])
+                    lay_size.extend(pad_size[n:])
+                if backs:
+                    back_price.append(backs[0].price)
+                    back_size.append(backs[0].size)
+                else:
+                    back_price.append(nan)
+                    back_size.append(nan)
+                self.refs.append((mid, r))
+                market_rows.append(mid)
+        shape = (len(self.refs), levels)
+        self.market_rows = market_rows
+        self.lay_price = np.fromiter(lay_price, dtype=np.float64, count=len(lay_price)).reshape(shape)
+        self.lay_size = np.fromiter(lay_size, dtype=np.float64, count=len(lay_size)).reshape(shape)
+        self.back_price = np.fromiter(back_price, dtype=np.float64, count=len(back_price))
+        self.back_size = np.fromiter(back_size, dtype=np.float64, count=len(back_size))
+
+    def __len__(self):
+        return len(self.refs)
+
+
+def _row_thresholds(books, thresholds):
+    """Per-runner threshold column, built per market rather than per runner."""
+    per_market = np.array([thresholds.get(mb.market_id, float("inf")) for mb in books], dtype=np.float64)
+    counts = np.array([len(mb.runners or []) for mb in books], dtype=np.int64)
+    return np.repeat(per_market, counts)
+
+
+def _pair(price, size):
+    if price != price:  # NaN -> missing level
+        return (None, None)
+    return (float(price), float(size))
+
+
+def scan_ladders(books, levels, thresholds, near_pct=0.0, near_min=0.0, vectorized=None):
+    """Find runners whose summed top-`levels` lay size crosses their market threshold.
+
+    Args:
+        books: market books (objects with market_id and runners[].ex ladders)
+        levels: number of lay levels to sum
+        thresholds: dict market_id -> threshold (GBP)
+        near_pct: if > 0, also report runners at or above threshold * near_pct
+        near_min: absolute floor for near-threshold reporting
+        vectorized: force the NumPy (True) or Python (False) path; defaults to
+            WHALE_VECTOR_SCAN
+
+    Returns:
+        (crossing, near): lists of LadderHit; `near` is empty when near_pct <= 0
+        and includes crossing runners otherwise.
+    """
+    if vectorized is None:
+        vectorized = vector_scan_enabled()
+    if not vectorized or np is None:
+        return _scan_ladders_py(books, levels, thresholds, near_pct, near_min)
+    packed = PackedLadders(books, levels)
+    if not len(packed):
+        return [], []
+    thr = _row_thresholds(books, thresholds)
+    lay_sum = packed.lay_size.sum(axis=1)
+    crossing_idx = np.flatnonzero(lay_sum >= thr)
+    near_idx = np.empty(0, dtype=np.int64)
+    if near_pct > 0:
+        near_idx = np.flatnonzero(lay_sum >= np.maximum(near_min, thr * near_pct))
+
+    def _hit(i):
+        mid, r = packed.refs[i]
+        row_p, row_s = packed.lay_price[i], packed.lay_size[i]
+        lay_levels = [(float(row_p[j]), float(row_s[j])) for j in range(packed.levels) if row_p[j] == row_p[j]]
+        return LadderHit(
+            market_id=mid,
+            runner=r,
+            lay_size=float(lay_sum[i]),
+            best_back=_pair(packed.back_price[i], packed.back_size[i]),
+            best_lay=_pair(row_p[0], row_s[0]),
+            lay_levels=lay_levels,
+        )
+
+    return [_hit(i) for i in crossing_idx], [_hit(i) for i in near_idx]
+
+
+def _scan_ladders_py(books, levels, thresholds, near_pct=0.0, near_min=0.0):
+    crossing, near = [], []
+    for mb in books or []:
+        mid = mb.market_id
+        threshold = thresholds.get(mid, float("inf"))
+        near_floor = max(near_min, threshold * near_pct) if near_pct > 0 else None
+        for r in mb.runners or []:
+            ex = getattr(r, "ex", None)
+            lays = (ex.available_to_lay or [])[:levels] if ex else []
+            lay_size = sum(l.size for l in lays)
+            is_crossing = lay_size >= threshold
+            is_near = near_floor is not None and lay_size >= near_floor
+            if not (is_crossing or is_near):
+                continue
+            backs = (ex.available_to_back or []) if ex else []
+            hit = LadderHit(
+                market_id=mid,
+                runner=r,
+                lay_size=lay_size,
+                best_back=(backs[0].price, backs[0].size) if backs else (None, None),
+                best_lay=(lays[0].price, lays[0].size) if lays else (None, None),
+                lay_levels=[(l.price, l.size) for l in lays],
+            )
+            if is_crossing:
+                crossing.append(hit)
+            if is_near:
+                near.append(hit)
+    return crossing, near
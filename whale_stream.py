@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Betfair Exchange Stream API support for whale.py.
+
+The stream delivers market change messages (MCM) for the subscribed FGS/AGS
+markets. `LadderCache` applies them to an in-memory best-offers ladder per
+runner and reports which markets changed, so whale.py can evaluate liquidity
+thresholds on each change instead of once per poll.
+
+`ReplayStreamServer` is a local stand-in for the Betfair stream endpoint that
+replays recorded change messages over plain TCP. `replay_stream()` feeds such a
+connection into a listener, which is how the ladder logic is tested offline.
+"""
+
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+try:
+    from betfairlightweight import filters
+    from betfairlightweight.streaming import BaseListener
+except ImportError:
+    filters = None
+    BaseListener = object
+
+PriceSize = namedtuple("PriceSize", "price size")
+
+# Virtualised best offers match the polling price projection (virtualise=True)
+STREAM_FIELDS = ["EX_BEST_OFFERS_DISP", "EX_LTP", "EX_MARKET_DEF"]
+
+
+class LadderCache:
+    """Incremental per-runner ladder cache built from stream change messages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # market_id -> selection_id -> {'atl': {level: (price, size)}, 'atb': {...}, 'ltp': float}
+        self._markets = {}
+        self.clk = None
+        self.initial_clk = None
+        self.publish_time = None
+
+    def _runner(self, market, selection_id):
+        runner = market.get(selection_id)
+        if runner is None:
+            runner = {"atl": {}, "atb": {}, "ltp": None}
+            market[selection_id] = runner
+        return runner
+
+    @staticmethod
+    def _apply_levels(ladder, updates):
+        for level, price, size in updates:
+            if size == 0:
+                ladder.pop(level, None)
+            else:
+                ladder[level] = (price, size)
+
+    def apply(self, message: dict) -> set:
+        """Apply one MCM message and return the set of market ids it changed."""
+        changed = set()
+        if message.get("op") != "mcm":
+            return changed
+        with self._lock:
+            if message.get("clk"):
+                self.clk = message["clk"]
+            if message.get("initialClk"):
+                self.initial_clk = message["initialClk"]
+            self.publish_time = message.get("pt", self.publish_time)
+            for mc in message.get("mc") or []:
+                mid = mc.get("id")
+                if not mid:
+                    continue
+                if mc.get("img"):
+                    self._markets[mid] = {}
+                market = self._markets.setdefault(mid, {})
+
+                mdef = mc.get("marketDefinition") or {}
+                if mdef.get("status") == "CLOSED":
+                    self._markets.pop(mid, None)
+                    changed.add(mid)
+                    continue
+                for rdef in mdef.get("runners") or []:
+                    if rdef.get("status") in ("REMOVED", "LOSER", "WINNER"):
+                        market.pop(rdef.get("id"), None)
+
+                for rc in mc.get("rc") or []:
+                    runner = self._runner(market, rc.get("id"))
+                    if rc.get("img"):
+                        runner["atl"].clear()
+                        runner["atb"].clear()
+                    self._apply_levels(runner["atl"], rc.get("bdatl") or rc.get("batl") or [])
+                    self._apply_levels(runner["atb"], rc.get("bdatb") or rc.get("batb") or [])
+                    if rc.get("ltp") is not None:
+                        runner["ltp"] = rc["ltp"]
+                changed.add(mid)
+        return changed
+
+    def retain(self, market_ids):
+        """Drop cached markets that are no longer subscribed."""
+        keep = set(market_ids)
+        with self._lock:
+            for mid in [m for m in self._markets if m not in keep]:
+                del self._markets[mid]
+
+    def market_book(self, market_id):
+        """Return a MarketBook-like object (market_id, runners[].ex.available_to_lay/back)."""
+        with self._lock:
+            market = self._markets.get(market_id)
+            if market is None:
+                return None
+            runners = []
+            for sid, r in market.items():
+                lays = [PriceSize(p, s) for _, (p, s) in sorted(r["atl"].items())]
+                backs = [PriceSize(p, s) for _, (p, s) in sorted(r["atb"].items())]
+                runners.append(SimpleNamespace(
+                    selection_id=sid,
+                    last_price_traded=r["ltp"],
+                    ex=SimpleNamespace(available_to_lay=lays, available_to_back=backs),
+                ))
+        return SimpleNamespace(market_id=market_id, runners=runners)
+
+    def market_books(self, market_ids):
+        books = []
+        for mid in market_ids:
+            mb = self.market_book(mid)
+            if mb is not None:
+                books.append(mb)
+        return books
+
+
+class LadderStreamListener(BaseListener):
+    """betfairlightweight listener that feeds raw stream data into a LadderCache.
+
+    Changed market ids are pushed to `changes` so the consumer thread can
+    evaluate them as soon as they arrive.
+    """
+
+    def __init__(self, cache: LadderCache, max_latency=None):
+        if BaseListener is not object:
+            super().__init__(max_latency=max_latency)
+        self.cache = cache
+        self.changes = queue.Queue()
+        self.last_status = None
+
+    def register_stream(self, unique_id, operation):
+        if BaseListener is not object:
+            super().register_stream(unique_id, operation)
+
+    def on_data(self, raw_data):
+        try:
+            message = json.loads(raw_data)
+        except (TypeError, ValueError):
+            return None
+        op = message.get("op")
+        if op == "mcm":
+            changed = self.cache.apply(message)
+            if changed:
+                self.changes.put((time.time(), changed))
+        elif op == "status":
+            self.last_status = message
+            if message.get("statusCode") == "FAILURE":
+                print(f"[STREAM] Status failure: {message.get('errorCode')} {message.get('errorMessage')}", flush=True)
+        return None
+
+
+class MarketStream:
+    """Owns a Betfair market stream, its listener thread and the ladder cache."""
+
+    def __init__(self, trading, top_levels=1, conflate_ms=None):
+        self.trading = trading
+        self.top_levels = max(1, min(10, int(top_levels)))
+        self.conflate_ms = conflate_ms
+        self.cache = LadderCache()
+        self.listener = LadderStreamListener(self.cache)
+        self.subscribed = set()
+        self._stream = None
+        self._thread = None
+
+    def _run(self, stream):
+        try:
+            stream.start()
+        except Exception as e:
+            print(f"[STREAM] Stream stopped: {e}", flush=True)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def update_subscription(self, market_ids):
+        """(Re)subscribe when the wanted market set changes or the stream has died."""
+        wanted = set(market_ids)
+        if wanted == self.subscribed and self.is_alive():
+            return False
+        if not wanted:
+            self.stop()
+            return False
+        if self._stream is None or not self.is_alive():
+            # Close a dead stream's socket before replacing it
+            self._stop_stream()
+            self._stream = self.trading.streaming.create_stream(listener=self.listener)
+            self._thread = None
+        self._stream.subscribe_to_markets(
+            market_filter=filters.streaming_market_filter(market_ids=sorted(wanted)),
+            market_data_filter=filters.streaming_market_data_filter(
+                fields=STREAM_FIELDS, ladder_levels=self.top_levels
+            ),
+            conflate_ms=self.conflate_ms,
+        )
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(self._stream,), name="whale-stream", daemon=True)
+            self._thread.start()
+        self.cache.retain(wanted)
+        self.subscribed = wanted
+        print(f"[STREAM] Subscribed to {len(wanted)} markets", flush=True)
+        return True
+
+    def wait_for_changes(self, timeout):
+        """Block up to `timeout` seconds for changes; return (changed ids, oldest arrival time)."""
+        try:
+            first_ts, changed = self.listener.changes.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return set(), None
+        changed = set(changed)
+        while True:
+            try:
+                _, more = self.listener.changes.get_nowait()
+            except queue.Empty:
+                break
+            changed |= more
+        return changed, first_ts
+
+    def _stop_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            except Exception:
+                pass
+        self._stream = None
+
+    def stop(self):
+        self._stop_stream()
+        self._thread = None
+        self.subscribed = set()
+
+
+# ========= LOCAL REPLAY (testing) =========
+class _ReplayHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        self.wfile.write((json.dumps({"op": "connection", "connectionId": "replay"}) + "\r\n").encode("utf-8"))
+        for msg in server.messages:
+            if server.delay:
+                time.sleep(server.delay)
+            line = msg if isinstance(msg, str) else json.dumps(msg)
+            self.wfile.write((line + "\r\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class ReplayStreamServer(socketserver.ThreadingTCPServer):
+    """Local stand-in stream server replaying recorded change messages.
+
+    Messages may be dicts or raw JSON lines (e.g. read from a recorded file);
+    each connecting client receives a connection message followed by all of
+    them, CRLF-terminated like the real stream.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, messages, host="127.0.0.1", port=0, delay=0.0):
+        super().__init__((host, port), _ReplayHandler)
+        self.messages = list(messages)
+        self.delay = delay
+        self._thread = None
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls([line.strip() for line in fh if line.strip()], **kwargs)
+
+    @property
+    def address(self):
+        return self.server_address[0], self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="replay-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def replay_stream(listener, host, port, timeout=5.0):
+    """Read CRLF-delimited messages from a replay server into `listener.on_data`.
+
+    Returns the number of messages delivered once the server closes the connection.
+    """
+    delivered = 0
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        buf = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+            while b"\r\n" in buf:
+                line, buf = buf.split(b"\r\n", 1)
+                if line:
+                    listener.on_data(line.decode("utf-8"))
+                    delivered += 1
+    return delivered